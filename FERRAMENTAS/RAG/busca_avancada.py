@@ -11,6 +11,11 @@ from datetime import datetime, timedelta
 from collections import Counter
 import math
 from pathlib import Path
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from indice_invertido import tokenizar, distancia_levenshtein, CHAVE_MINHASH
 
 class BuscaAvancada:
     """
@@ -22,11 +27,19 @@ class BuscaAvancada:
         self.stop_words = {
             'pt': {'a', 'o', 'e', 'de', 'do', 'da', 'em', 'um', 'uma', 'para', 'com', 'por', 'que', 'se', 'na', 'no', 'os', 'as', 'dos', 'das', 'ao', 'à', 'pelo', 'pela', 'pelos', 'pelas', 'este', 'esta', 'estes', 'estas', 'esse', 'essa', 'esses', 'essas', 'aquele', 'aquela', 'aqueles', 'aquelas', 'seu', 'sua', 'seus', 'suas', 'meu', 'minha', 'meus', 'minhas', 'nosso', 'nossa', 'nossos', 'nossas', 'vosso', 'vossa', 'vossos', 'vossas', 'dele', 'dela', 'deles', 'delas', 'mais', 'menos', 'muito', 'muita', 'muitos', 'muitas', 'pouco', 'pouca', 'poucos', 'poucas', 'todo', 'toda', 'todos', 'todas', 'outro', 'outra', 'outros', 'outras', 'mesmo', 'mesma', 'mesmos', 'mesmas', 'também', 'ainda', 'já', 'só', 'apenas', 'mas', 'porém', 'contudo', 'entretanto', 'todavia', 'quando', 'onde', 'como', 'porque', 'então', 'assim', 'bem', 'mal', 'sim', 'não', 'nem', 'ou', 'seja', 'estar', 'ser', 'ter', 'haver', 'fazer', 'dizer', 'dar', 'ir', 'ver', 'saber', 'poder', 'querer', 'ficar', 'vir', 'chegar', 'passar', 'levar', 'trazer', 'colocar', 'pôr', 'tirar', 'encontrar', 'achar', 'pensar', 'acreditar', 'sentir', 'ouvir', 'falar', 'contar', 'mostrar', 'seguir', 'começar', 'acabar', 'continuar', 'parar', 'deixar', 'ficar', 'tornar', 'voltar', 'sair', 'entrar', 'subir', 'descer', 'abrir', 'fechar', 'ganhar', 'perder', 'vender', 'comprar', 'pagar', 'custar', 'valer', 'servir', 'usar', 'precisar', 'gostar', 'amar', 'odiar', 'preferir', 'escolher', 'decidir', 'tentar', 'conseguir', 'permitir', 'proibir', 'mandar', 'pedir', 'perguntar', 'responder', 'explicar', 'ensinar', 'aprender', 'estudar', 'trabalhar', 'jogar', 'brincar', 'correr', 'andar', 'caminhar', 'voar', 'nadar', 'dormir', 'acordar', 'comer', 'beber', 'cozinhar', 'lavar', 'limpar', 'vestir', 'calçar', 'sentar', 'levantar', 'deitar', 'morrer', 'nascer', 'crescer', 'viver', 'morar', 'habitar', 'existir', 'acontecer', 'ocorrer', 'realizar', 'criar', 'construir', 'destruir', 'quebrar', 'consertar', 'arrumar', 'organizar', 'preparar', 'terminar', 'completar', 'iniciar', 'receber', 'enviar', 'mandar', 'chamar', 'gritar', 'sussurrar', 'cantar', 'dançar', 'rir', 'chorar', 'sorrir', 'beijar', 'abraçar', 'tocar', 'pegar', 'soltar', 'segurar', 'empurrar', 'puxar', 'carregar', 'levantar', 'baixar', 'subir', 'descer', 'entrar', 'sair', 'chegar', 'partir', 'voltar', 'retornar', 'ir', 'vir', 'ficar', 'permanecer', 'continuar', 'parar', 'cessar', 'terminar', 'acabar', 'começar', 'iniciar', 'principiar'}
         }
+        
+        # Índice invertido e BM25 mantidos pelo gerenciador
+        self.indice_documentos = self.rag_manager.indice_documentos
+        self.bm25_documentos = self.rag_manager.bm25_documentos
     
     def busca_fuzzy(self, termo: str, campo: str = 'titulo', limite: int = 10, tolerancia: int = 2) -> List[Dict[str, Any]]:
         """
         Busca com tolerância a erros de digitação (fuzzy search)
         
+        Os termos próximos são encontrados no índice de trigramas do
+        vocabulário do campo e levados aos documentos pelos postings; o custo
+        não depende do número de documentos.
+        
         Args:
             termo: Termo de busca
             campo: Campo para buscar
@@ -36,45 +49,30 @@ class BuscaAvancada:
         Returns:
             Lista de documentos encontrados com score de similaridade
         """
-        resultados = []
-        metadata = self.rag_manager.file_store._load_metadata()
+        indice = self.indice_documentos.sincronizar()
+        termo = termo.lower()
+        melhores_scores = {}
         
-        for doc_id in metadata["document_index"]:
-            doc = self.rag_manager.ler_documento(doc_id)
-            if not doc:
+        for palavra, distancia in indice.termos_similares(termo, campo, tolerancia):
+            score = 1 - (distancia / max(len(termo), len(palavra)))
+            if score <= 0:
                 continue
-            
-            # Obter texto do campo
-            texto_campo = ""
-            if campo == 'titulo':
-                texto_campo = doc.title
-            elif campo == 'conteudo':
-                texto_campo = doc.content
-            elif campo == 'fonte':
-                texto_campo = doc.source_type
-            elif campo == 'autor':
-                texto_campo = ' '.join(doc.authors)
-            
-            # Calcular distância de Levenshtein
-            palavras = texto_campo.lower().split()
-            melhor_score = 0
-            
-            for palavra in palavras:
-                distancia = self._levenshtein_distance(termo.lower(), palavra)
-                if distancia <= tolerancia:
-                    score = 1 - (distancia / max(len(termo), len(palavra)))
-                    melhor_score = max(melhor_score, score)
-            
-            if melhor_score > 0:
-                resultados.append({
-                    'id': doc.document_id,
-                    'titulo': doc.title,
-                    'fonte': doc.source_type,
-                    'preview': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                    'score': melhor_score,
-                    'url': doc.url,
-                    'tipo_busca': 'fuzzy'
-                })
+            for doc_id in indice.postings(palavra, [campo]):
+                if score > melhores_scores.get(doc_id, 0):
+                    melhores_scores[doc_id] = score
+        
+        resultados = []
+        for doc_id, score in melhores_scores.items():
+            resumo = indice.resumos[doc_id]
+            resultados.append({
+                'id': doc_id,
+                'titulo': resumo['titulo'],
+                'fonte': resumo['fonte'],
+                'preview': resumo['preview'],
+                'score': score,
+                'url': resumo['url'],
+                'tipo_busca': 'fuzzy'
+            })
         
         # Ordenar por score e limitar
         resultados.sort(key=lambda x: x['score'], reverse=True)
@@ -84,6 +82,10 @@ class BuscaAvancada:
         """
         Busca usando múltiplas palavras-chave com operadores lógicos
         
+        Avaliada sobre os postings do índice invertido (título, conteúdo e
+        resumo): o custo depende das listas de postings dos termos, não do
+        tamanho do corpus.
+        
         Args:
             palavras: Lista de palavras-chave
             operador: 'AND', 'OR' ou 'NOT'
@@ -92,101 +94,104 @@ class BuscaAvancada:
         Returns:
             Lista de documentos encontrados
         """
-        resultados = []
-        metadata = self.rag_manager.file_store._load_metadata()
+        indice = self.indice_documentos.sincronizar()
+        campos = ['titulo', 'conteudo', 'resumo']
         
         # Remover stop words
         palavras_filtradas = [p.lower() for p in palavras if p.lower() not in self.stop_words['pt']]
         
-        for doc_id in metadata["document_index"]:
-            doc = self.rag_manager.ler_documento(doc_id)
-            if not doc:
-                continue
-            
-            texto_completo = f"{doc.title} {doc.content} {doc.abstract}".lower()
-            
-            # Verificar presença das palavras
-            palavras_encontradas = []
-            for palavra in palavras_filtradas:
-                if palavra in texto_completo:
-                    palavras_encontradas.append(palavra)
-            
-            # Aplicar operador lógico
-            incluir = False
-            if operador == 'AND':
-                incluir = len(palavras_encontradas) == len(palavras_filtradas)
-            elif operador == 'OR':
-                incluir = len(palavras_encontradas) > 0
-            elif operador == 'NOT':
-                incluir = len(palavras_encontradas) == 0
-            
-            if incluir:
-                # Calcular score baseado na frequência das palavras
-                score = len(palavras_encontradas) / len(palavras_filtradas) if palavras_filtradas else 0
-                
-                resultados.append({
-                    'id': doc.document_id,
-                    'titulo': doc.title,
-                    'fonte': doc.source_type,
-                    'preview': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                    'score': score,
-                    'palavras_encontradas': palavras_encontradas,
-                    'url': doc.url,
-                    'tipo_busca': f'palavras_chave_{operador}'
-                })
+        # Documentos que contêm cada palavra (e frequência de cada termo)
+        encontrados_por_palavra = {palavra: indice.avaliar(palavra, campos) for palavra in palavras_filtradas}
+        frequencias = {
+            termo: indice.postings(termo, campos)
+            for palavra in palavras_filtradas for termo in tokenizar(palavra)
+        }
+        
+        # Aplicar operador lógico
+        conjuntos = [encontrados_por_palavra[palavra] for palavra in palavras_filtradas]
+        if operador == 'AND':
+            candidatos = set.intersection(*conjuntos) if conjuntos else indice.ids()
+        elif operador == 'OR':
+            candidatos = set().union(*conjuntos)
+        elif operador == 'NOT':
+            candidatos = indice.ids() - set().union(*conjuntos)
+        else:
+            candidatos = set()
+        
+        resultados = []
+        for doc_id in candidatos:
+            palavras_encontradas = [
+                palavra for palavra in palavras_filtradas
+                if doc_id in encontrados_por_palavra[palavra]
+            ]
+            
+            # Score baseado na fração de palavras encontradas; frequência desempata
+            score = len(palavras_encontradas) / len(palavras_filtradas) if palavras_filtradas else 0
+            frequencia = sum(
+                frequencias[termo].get(doc_id, 0)
+                for palavra in palavras_encontradas for termo in tokenizar(palavra)
+            )
+            
+            resumo = indice.resumos[doc_id]
+            resultados.append({
+                'id': doc_id,
+                'titulo': resumo['titulo'],
+                'fonte': resumo['fonte'],
+                'preview': resumo['preview'],
+                'score': score,
+                'palavras_encontradas': palavras_encontradas,
+                'url': resumo['url'],
+                'tipo_busca': f'palavras_chave_{operador}',
+                '_frequencia': frequencia
+            })
         
         # Ordenar por score
-        resultados.sort(key=lambda x: x['score'], reverse=True)
+        resultados.sort(key=lambda x: (x['score'], x['_frequencia']), reverse=True)
+        for resultado in resultados:
+            del resultado['_frequencia']
         return resultados[:limite]
     
-    def busca_por_data(self, data_inicio: Optional[datetime] = None, data_fim: Optional[datetime] = None, limite: int = 10) -> List[Dict[str, Any]]:
+    def busca_por_data(self, data_inicio: Optional[datetime] = None, data_fim: Optional[datetime] = None,
+                       limite: int = 10, campo_data: str = 'data_coleta') -> List[Dict[str, Any]]:
         """
         Busca documentos por intervalo de datas
         
+        Usa o índice ordenado da data: só os documentos do intervalo (até o
+        limite, do mais recente para o mais antigo) são lidos.
+        
         Args:
             data_inicio: Data de início (opcional)
             data_fim: Data de fim (opcional)
             limite: Número máximo de resultados
+            campo_data: 'data_coleta' ou 'data_publicacao'
             
         Returns:
             Lista de documentos no intervalo de datas
         """
-        resultados = []
-        metadata = self.rag_manager.file_store._load_metadata()
+        indice = self.indice_documentos.sincronizar()
         
-        for doc_id in metadata["document_index"]:
-            doc = self.rag_manager.ler_documento(doc_id)
-            if not doc or not doc.collection_timestamp:
-                continue
-            
-            data_doc = doc.collection_timestamp
-            
-            # Verificar se está no intervalo
-            incluir = True
-            if data_inicio and data_doc < data_inicio:
-                incluir = False
-            if data_fim and data_doc > data_fim:
-                incluir = False
-            
-            if incluir:
-                resultados.append({
-                    'id': doc.document_id,
-                    'titulo': doc.title,
-                    'fonte': doc.source_type,
-                    'data_coleta': data_doc.isoformat(),
-                    'preview': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                    'url': doc.url,
-                    'tipo_busca': 'por_data'
-                })
-        
-        # Ordenar por data (mais recente primeiro)
-        resultados.sort(key=lambda x: x['data_coleta'], reverse=True)
-        return resultados[:limite]
+        resultados = []
+        for doc_id, _ in self.rag_manager.buscar_por_intervalo(campo_data, data_inicio, data_fim, limite, decrescente=True):
+            resumo = indice.resumos[doc_id]
+            resultados.append({
+                'id': doc_id,
+                'titulo': resumo['titulo'],
+                'fonte': resumo['fonte'],
+                campo_data: resumo[campo_data].isoformat(),
+                'preview': resumo['preview'],
+                'url': resumo['url'],
+                'tipo_busca': 'por_data'
+            })
+        
+        return resultados
     
     def busca_por_tamanho(self, tamanho_min: int = 0, tamanho_max: Optional[int] = None, limite: int = 10) -> List[Dict[str, Any]]:
         """
         Busca documentos por tamanho do conteúdo
         
+        Usa o índice ordenado de tamanho: só os documentos do intervalo (até
+        o limite, do maior para o menor) são lidos.
+        
         Args:
             tamanho_min: Tamanho mínimo em caracteres
             tamanho_max: Tamanho máximo em caracteres (opcional)
@@ -195,40 +200,33 @@ class BuscaAvancada:
         Returns:
             Lista de documentos no intervalo de tamanho
         """
-        resultados = []
-        metadata = self.rag_manager.file_store._load_metadata()
+        indice = self.indice_documentos.sincronizar()
         
-        for doc_id in metadata["document_index"]:
-            doc = self.rag_manager.ler_documento(doc_id)
-            if not doc:
-                continue
-            
-            tamanho = len(doc.content)
-            
-            # Verificar se está no intervalo
-            incluir = tamanho >= tamanho_min
-            if tamanho_max and tamanho > tamanho_max:
-                incluir = False
-            
-            if incluir:
-                resultados.append({
-                    'id': doc.document_id,
-                    'titulo': doc.title,
-                    'fonte': doc.source_type,
-                    'tamanho': tamanho,
-                    'preview': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                    'url': doc.url,
-                    'tipo_busca': 'por_tamanho'
-                })
-        
-        # Ordenar por tamanho (maior primeiro)
-        resultados.sort(key=lambda x: x['tamanho'], reverse=True)
-        return resultados[:limite]
+        resultados = []
+        for doc_id, _ in self.rag_manager.buscar_por_intervalo('tamanho', tamanho_min, tamanho_max or None, limite, decrescente=True):
+            resumo = indice.resumos[doc_id]
+            resultados.append({
+                'id': doc_id,
+                'titulo': resumo['titulo'],
+                'fonte': resumo['fonte'],
+                'tamanho': resumo['tamanho'],
+                'preview': resumo['preview'],
+                'url': resumo['url'],
+                'tipo_busca': 'por_tamanho'
+            })
+        
+        return resultados
     
     def busca_combinada(self, filtros: Dict[str, Any], limite: int = 10) -> List[Dict[str, Any]]:
         """
         Busca combinando múltiplos filtros
         
+        Os filtros textuais (termo e palavras-chave) são resolvidos no índice
+        invertido e os intervalos de data e tamanho nos índices ordenados; a
+        fonte é verificada apenas nos candidatos, a partir dos resumos
+        guardados no índice. Com termo, o score é o BM25 do termo em título
+        e conteúdo.
+        
         Args:
             filtros: Dicionário com filtros a aplicar
                 - termo: termo de busca textual
@@ -241,76 +239,71 @@ class BuscaAvancada:
         Returns:
             Lista de documentos que atendem todos os filtros
         """
-        resultados = []
-        metadata = self.rag_manager.file_store._load_metadata()
-        
-        for doc_id in metadata["document_index"]:
-            doc = self.rag_manager.ler_documento(doc_id)
-            if not doc:
+        indice = self.indice_documentos.sincronizar()
+        campos = ['titulo', 'conteudo']
+        candidatos = None
+        
+        # Filtro por termo
+        termo = filtros.get('termo')
+        if termo:
+            termo = termo.lower()
+            termos = tokenizar(termo)
+            candidatos = indice.avaliar(termo, campos)
+            
+            if not (len(termos) == 1 and termos[0] == termo):
+                # Expressão com vários termos: confirmar a sequência exata nos candidatos
+                confirmados = set()
+                for doc_id in candidatos:
+                    doc = self.rag_manager.ler_documento(doc_id)
+                    if doc and termo in f"{doc.title} {doc.content}".lower():
+                        confirmados.add(doc_id)
+                candidatos = confirmados
+        
+        # Filtro por palavras-chave (todas obrigatórias)
+        if filtros.get('palavras_chave'):
+            com_palavras = indice.avaliar(('AND', list(filtros['palavras_chave'])), campos)
+            candidatos = com_palavras if candidatos is None else candidatos & com_palavras
+        
+        # Intervalos de data e tamanho pelos índices ordenados
+        intervalos = [
+            ('data_coleta', filtros.get('data_inicio'), filtros.get('data_fim')),
+            ('tamanho', filtros.get('tamanho_min'), filtros.get('tamanho_max') or None)
+        ]
+        for campo, minimo, maximo in intervalos:
+            if minimo is None and maximo is None:
                 continue
-            
-            # Aplicar todos os filtros
-            incluir = True
-            score = 1.0
-            
-            # Filtro por termo
-            if 'termo' in filtros and filtros['termo']:
-                termo = filtros['termo'].lower()
-                texto_completo = f"{doc.title} {doc.content}".lower()
-                if termo not in texto_completo:
-                    incluir = False
-                else:
-                    # Calcular score baseado na frequência
-                    freq = texto_completo.count(termo)
-                    score *= min(1.0, freq / 10)  # Normalizar frequência
+            no_intervalo = set(doc_id for doc_id, _ in self.rag_manager.buscar_por_intervalo(campo, minimo, maximo))
+            candidatos = no_intervalo if candidatos is None else candidatos & no_intervalo
+        
+        if candidatos is None:
+            candidatos = indice.ids()
+        
+        scores = self.bm25_documentos.pontuar(termo, campos, candidatos) if termo else {}
+        
+        resultados = []
+        for doc_id in candidatos:
+            resumo = indice.resumos[doc_id]
+            score = scores.get(doc_id, 0.0) if termo else 1.0
             
             # Filtro por fonte
             if 'fontes' in filtros and filtros['fontes']:
-                if doc.source_type not in filtros['fontes']:
-                    incluir = False
-            
-            # Filtro por data
-            if incluir and doc.collection_timestamp:
-                if 'data_inicio' in filtros and filtros['data_inicio']:
-                    if doc.collection_timestamp < filtros['data_inicio']:
-                        incluir = False
-                if 'data_fim' in filtros and filtros['data_fim']:
-                    if doc.collection_timestamp > filtros['data_fim']:
-                        incluir = False
-            
-            # Filtro por tamanho
-            if incluir:
-                tamanho = len(doc.content)
-                if 'tamanho_min' in filtros and tamanho < filtros['tamanho_min']:
-                    incluir = False
-                if 'tamanho_max' in filtros and filtros['tamanho_max'] and tamanho > filtros['tamanho_max']:
-                    incluir = False
-            
-            # Filtro por palavras-chave
-            if incluir and 'palavras_chave' in filtros and filtros['palavras_chave']:
-                texto_completo = f"{doc.title} {doc.content}".lower()
-                palavras_encontradas = 0
-                for palavra in filtros['palavras_chave']:
-                    if palavra.lower() in texto_completo:
-                        palavras_encontradas += 1
-                
-                if palavras_encontradas < len(filtros['palavras_chave']):
-                    incluir = False
-                else:
-                    score *= palavras_encontradas / len(filtros['palavras_chave'])
-            
-            if incluir:
-                resultados.append({
-                    'id': doc.document_id,
-                    'titulo': doc.title,
-                    'fonte': doc.source_type,
-                    'tamanho': len(doc.content),
-                    'data_coleta': doc.collection_timestamp.isoformat() if doc.collection_timestamp else None,
-                    'preview': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                    'score': score,
-                    'url': doc.url,
-                    'tipo_busca': 'combinada'
-                })
+                if resumo['fonte'] not in filtros['fontes']:
+                    continue
+            
+            data_coleta = resumo['data_coleta']
+            tamanho = resumo['tamanho']
+            
+            resultados.append({
+                'id': doc_id,
+                'titulo': resumo['titulo'],
+                'fonte': resumo['fonte'],
+                'tamanho': tamanho,
+                'data_coleta': data_coleta.isoformat() if data_coleta else None,
+                'preview': resumo['preview'],
+                'score': score,
+                'url': resumo['url'],
+                'tipo_busca': 'combinada'
+            })
         
         # Ordenar por score
         resultados.sort(key=lambda x: x['score'], reverse=True)
@@ -320,6 +313,10 @@ class BuscaAvancada:
         """
         Encontra documentos similares baseado no conteúdo
         
+        Usa a assinatura MinHash calculada quando o documento foi gravado e
+        o índice LSH: só os documentos que caem em algum balde da referência
+        são comparados (Jaccard estimado sobre pares de palavras).
+        
         Args:
             doc_id: ID do documento de referência
             limite: Número máximo de resultados
@@ -327,111 +324,76 @@ class BuscaAvancada:
         Returns:
             Lista de documentos similares
         """
-        doc_referencia = self.rag_manager.ler_documento(doc_id)
-        if not doc_referencia:
+        indice = self.indice_documentos.sincronizar()
+        resumo_ref = indice.resumos.get(doc_id)
+        if not resumo_ref:
             return []
         
-        # Extrair palavras-chave do documento de referência
-        palavras_ref = self._extrair_palavras_chave(doc_referencia.content)
+        similares = indice.indice_lsh().similares(
+            resumo_ref[CHAVE_MINHASH], limite, minimo=0.1, excluir=doc_id  # Threshold mínimo
+        )
         
         resultados = []
-        metadata = self.rag_manager.file_store._load_metadata()
-        
-        for outro_doc_id in metadata["document_index"]:
-            if outro_doc_id == doc_id:  # Pular o próprio documento
-                continue
-                
-            doc = self.rag_manager.ler_documento(outro_doc_id)
-            if not doc:
-                continue
-            
-            # Extrair palavras-chave do documento atual
-            palavras_doc = self._extrair_palavras_chave(doc.content)
-            
-            # Calcular similaridade usando Jaccard
-            similaridade = self._jaccard_similarity(palavras_ref, palavras_doc)
-            
-            if similaridade > 0.1:  # Threshold mínimo
-                resultados.append({
-                    'id': doc.document_id,
-                    'titulo': doc.title,
-                    'fonte': doc.source_type,
-                    'similaridade': similaridade,
-                    'preview': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                    'url': doc.url,
-                    'tipo_busca': 'similar_conteudo'
-                })
-        
-        # Ordenar por similaridade
-        resultados.sort(key=lambda x: x['similaridade'], reverse=True)
-        return resultados[:limite]
+        for outro_doc_id, similaridade in similares:
+            resumo = indice.resumos[outro_doc_id]
+            resultados.append({
+                'id': outro_doc_id,
+                'titulo': resumo['titulo'],
+                'fonte': resumo['fonte'],
+                'similaridade': similaridade,
+                'preview': resumo['preview'],
+                'url': resumo['url'],
+                'tipo_busca': 'similar_conteudo'
+            })
+        
+        return resultados
     
     def estatisticas_busca(self) -> Dict[str, Any]:
         """
         Gera estatísticas úteis para buscas
         
+        Lidas dos agregados mantidos pelo índice invertido a cada gravação e
+        exclusão: o custo não depende do tamanho do corpus. As palavras mais
+        comuns contam documentos que contêm a palavra (sem stop words).
+        
         Returns:
             Dicionário com estatísticas do corpus
         """
-        metadata = self.rag_manager.file_store._load_metadata()
+        indice = self.indice_documentos.sincronizar()
+        estatisticas = indice.estatisticas('conteudo')
+        stop_words = self.stop_words['pt']
         
-        # Contadores
-        fontes = Counter()
-        tamanhos = []
-        palavras_mais_comuns = Counter()
-        total_docs = 0
-        
-        for doc_id in metadata["document_index"]:
-            doc = self.rag_manager.ler_documento(doc_id)
-            if not doc:
-                continue
-            
-            total_docs += 1
-            fontes[doc.source_type] += 1
-            tamanhos.append(len(doc.content))
-            
-            # Extrair palavras para estatísticas
-            palavras = self._extrair_palavras_chave(doc.content, limite=None)
-            palavras_mais_comuns.update(palavras)
-        
-        # Calcular estatísticas
-        tamanho_medio = sum(tamanhos) / len(tamanhos) if tamanhos else 0
-        tamanho_min = min(tamanhos) if tamanhos else 0
-        tamanho_max = max(tamanhos) if tamanhos else 0
+        tamanho_min, tamanho_max = estatisticas.tamanhos.extremos()
+        vocabulario = indice.termos('conteudo')
+        stop_words_no_vocabulario = sum(
+            1 for palavra in stop_words
+            if len(palavra) >= estatisticas.tamanho_minimo_termo and palavra in vocabulario
+        )
         
         return {
-            'total_documentos': total_docs,
-            'fontes_disponiveis': dict(fontes),
-            'tamanho_medio_caracteres': int(tamanho_medio),
-            'tamanho_min_caracteres': tamanho_min,
-            'tamanho_max_caracteres': tamanho_max,
-            'palavras_mais_comuns': dict(palavras_mais_comuns.most_common(20)),
-            'total_palavras_unicas': len(palavras_mais_comuns)
+            'total_documentos': estatisticas.total,
+            'fontes_disponiveis': dict(estatisticas.fontes),
+            'tamanho_medio_caracteres': int(estatisticas.tamanhos.media),
+            'tamanho_min_caracteres': tamanho_min or 0,
+            'tamanho_max_caracteres': tamanho_max or 0,
+            'histograma_tamanhos': estatisticas.tamanhos.histograma(),
+            'palavras_mais_comuns': dict(estatisticas.termos.mais_comuns(20, stop_words)),
+            'total_palavras_unicas': estatisticas.vocabulario - stop_words_no_vocabulario
         }
     
     # ===== MÉTODOS AUXILIARES =====
     
+    def salvar_indice(self):
+        """
+        Grava o índice invertido de documentos
+        """
+        self.indice_documentos.salvar()
+    
     def _levenshtein_distance(self, s1: str, s2: str) -> int:
         """
         Calcula distância de Levenshtein entre duas strings
         """
-        if len(s1) < len(s2):
-            return self._levenshtein_distance(s2, s1)
-        
-        if len(s2) == 0:
-            return len(s1)
-        
-        previous_row = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        
-        return previous_row[-1]
+        return distancia_levenshtein(s1, s2)
     
     def _extrair_palavras_chave(self, texto: str, limite: Optional[int] = 50) -> List[str]:
         """
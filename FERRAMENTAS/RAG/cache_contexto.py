@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Cache de respostas de contexto (LRU com expiração)
+Chaves incluem a versão do armazenamento: qualquer registro ou mudança de
+regras gera chaves novas e as respostas antigas nunca são servidas
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+def normalizar_consulta(query: str) -> str:
+    """Normaliza a consulta para a chave do cache (caixa e espaços)"""
+    return ' '.join((query or '').lower().split())
+
+
+class CacheContexto:
+    """
+    Cache LRU limitado, com tempo de vida por entrada e seguro entre threads
+
+    Entradas de versões antigas não são removidas ativamente: deixam de ser
+    consultadas e saem pelo LRU ou pela expiração.
+    """
+
+    def __init__(self, capacidade: int = 256, ttl_segundos: Optional[float] = 300):
+        self.capacidade = capacidade
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+
+        self.stats = {'hits': 0, 'misses': 0, 'expiradas': 0, 'descartadas': 0}
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obter(self, chave: Hashable) -> Optional[Any]:
+        """Valor guardado para a chave (None se ausente ou expirado)"""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.stats['misses'] += 1
+                return None
+
+            expira_em, valor = entrada
+            if expira_em is not None and time.monotonic() >= expira_em:
+                del self._entradas[chave]
+                self.stats['expiradas'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._entradas.move_to_end(chave)
+            self.stats['hits'] += 1
+            return valor
+
+    def guardar(self, chave: Hashable, valor: Any):
+        expira_em = None if self.ttl_segundos is None else time.monotonic() + self.ttl_segundos
+        with self._lock:
+            self._entradas[chave] = (expira_em, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+                self.stats['descartadas'] += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, entradas=len(self._entradas), capacidade=self.capacidade)
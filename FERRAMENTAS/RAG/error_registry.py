@@ -6,11 +6,27 @@ Armazena erros de sintaxe, causas e processos de resolução
 
 import json
 import os
+import sys
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from indice_invertido import IndiceInvertido, MotorBM25, fundir_rankings, tokenizar
+
+# Peso de cada campo no score BM25 da busca de erros similares
+PESOS_CAMPOS = {
+    'error_message': 5,
+    'code_snippet': 3,
+    'cause_analysis': 3,
+    'resolution_steps': 2,
+    'tags': 2,
+    'error_type': 1
+}
+
 @dataclass
 class ErrorRecord:
     """Registro de erro com informações completas"""
@@ -31,7 +47,14 @@ class ErrorRecord:
 class ErrorRegistry:
     """Sistema de registro e busca de erros"""
     
-    def __init__(self, storage_path: str = "error_storage"):
+    def __init__(self, storage_path: str = "error_storage",
+                 embedder: Optional[Callable[[List[str]], Any]] = None):
+        """
+        Args:
+            storage_path: Diretório do errors.json
+            embedder: Função opcional textos -> embeddings (ex.: DocumentProcessor.embed_queries);
+                      quando informada, a busca funde o ranking BM25 com a similaridade coseno
+        """
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(exist_ok=True)
         
@@ -41,6 +64,15 @@ class ErrorRegistry:
         # Carregar erros existentes
         self.errors = self._load_errors()
         
+        # Índice invertido por campo (BM25), mantido junto com self.errors
+        self.indice = IndiceInvertido(list(PESOS_CAMPOS))
+        self.bm25 = MotorBM25(self.indice)
+        for error in self.errors:
+            self._indexar(error)
+        
+        self.embedder = embedder
+        self._embeddings = {}  # id do erro -> embedding normalizado
+        
         print(f"Sistema de Registro de Erros inicializado com {len(self.errors)} erros")
     
     def _load_errors(self) -> List[ErrorRecord]:
@@ -63,6 +95,41 @@ class ErrorRegistry:
         except Exception as e:
             print(f"Erro ao salvar registros: {e}")
     
+    def _indexar(self, error: ErrorRecord):
+        """Adiciona um erro ao índice invertido"""
+        self.indice.adicionar(error.id, {
+            'error_message': error.error_message,
+            'code_snippet': error.code_snippet,
+            'cause_analysis': error.cause_analysis,
+            'resolution_steps': ' '.join(error.resolution_steps),
+            'tags': ' '.join(error.tags),
+            'error_type': error.error_type
+        })
+    
+    def _texto_embedding(self, error: ErrorRecord) -> str:
+        return f"{error.error_type} {error.error_message} {error.cause_analysis}"
+    
+    def _ranking_semantico(self, query: str, limite: int) -> List[str]:
+        """IDs dos erros mais similares à query por coseno (requer embedder)"""
+        pendentes = [e for e in self.errors if e.id not in self._embeddings]
+        if pendentes:
+            vetores = np.asarray(self.embedder([self._texto_embedding(e) for e in pendentes]), dtype=np.float32)
+            vetores /= np.maximum(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12)
+            for error, vetor in zip(pendentes, vetores):
+                self._embeddings[error.id] = vetor
+        
+        ids = [e.id for e in self.errors]
+        if not ids:
+            return []
+        
+        consulta = np.asarray(self.embedder([query]), dtype=np.float32)[0]
+        consulta /= max(float(np.linalg.norm(consulta)), 1e-12)
+        similaridades = np.stack([self._embeddings[i] for i in ids]) @ consulta
+        
+        limite = min(limite, len(ids))
+        melhores = np.argpartition(-similaridades, limite - 1)[:limite]
+        return [ids[i] for i in melhores[np.argsort(-similaridades[melhores])]]
+    
     def register_error(self, 
                       error_type: str,
                       error_message: str,
@@ -96,64 +163,51 @@ class ErrorRegistry:
         )
         
         self.errors.append(error_record)
+        self._indexar(error_record)
         self._save_errors()
         
         print(f"Erro registrado: {error_id}")
         return error_id
     
     def search_similar_errors(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Busca erros similares usando busca por palavras-chave"""
-        query_lower = query.lower()
-        matches = []
+        """
+        Busca erros similares por BM25 ponderado por campo
         
-        for error in self.errors:
-            score = 0
-            matched_fields = []
-            
-            # Buscar em diferentes campos com pesos diferentes
-            if query_lower in error.error_message.lower():
-                score += 5
-                matched_fields.append("error_message")
-            
-            if query_lower in error.code_snippet.lower():
-                score += 3
-                matched_fields.append("code_snippet")
-            
-            if query_lower in error.cause_analysis.lower():
-                score += 3
-                matched_fields.append("cause_analysis")
-            
-            if any(query_lower in step.lower() for step in error.resolution_steps):
-                score += 2
-                matched_fields.append("resolution_steps")
-            
-            if any(query_lower in tag.lower() for tag in error.tags):
-                score += 2
-                matched_fields.append("tags")
-            
-            if query_lower in error.error_type.lower():
-                score += 1
-                matched_fields.append("error_type")
-            
-            # Busca por palavras individuais
-            query_words = query_lower.split()
-            for word in query_words:
-                if len(word) > 2:  # Ignorar palavras muito pequenas
-                    if word in error.error_message.lower():
-                        score += 1
-                    if word in error.cause_analysis.lower():
-                        score += 1
-            
-            if score > 0:
-                matches.append({
-                    'error_record': error,
-                    'similarity_score': score,
-                    'matched_text': f"Campos encontrados: {', '.join(matched_fields)}"
-                })
+        Cada campo (mensagem, código, causa, passos, tags, tipo) é pontuado
+        separadamente e somado com o peso de PESOS_CAMPOS. Com um embedder
+        configurado, o ranking léxico é fundido (RRF) com o semântico.
+        """
+        termos = tokenizar(query)
+        if not termos:
+            return []
+        
+        scores = {}
+        campos_encontrados = {}
+        for campo, peso in PESOS_CAMPOS.items():
+            for error_id, score in self.bm25.pontuar(termos, [campo]).items():
+                scores[error_id] = scores.get(error_id, 0.0) + peso * score
+                campos_encontrados.setdefault(error_id, []).append(campo)
+        
+        ranking = sorted(scores, key=scores.get, reverse=True)
+        if self.embedder is not None:
+            profundidade = max(top_k * 4, 20)
+            fundidos = fundir_rankings(
+                [ranking[:profundidade], self._ranking_semantico(query, profundidade)], top_k
+            )
+            ranking = [error_id for error_id, _ in fundidos]
+            scores = dict(fundidos)
+        
+        por_id = {error.id: error for error in self.errors}
+        matches = []
+        for error_id in ranking[:top_k]:
+            campos = campos_encontrados.get(error_id, [])
+            matches.append({
+                'error_record': por_id[error_id],
+                'similarity_score': round(scores[error_id], 4),
+                'matched_text': f"Campos encontrados: {', '.join(campos) or 'similaridade semântica'}"
+            })
         
-        # Ordenar por score e retornar top_k
-        matches.sort(key=lambda x: x['similarity_score'], reverse=True)
-        return matches[:top_k]
+        return matches
     
     def get_error_by_id(self, error_id: str) -> Optional[ErrorRecord]:
         """Busca erro por ID"""
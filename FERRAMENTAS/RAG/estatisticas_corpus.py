@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Estatísticas do corpus mantidas incrementalmente
+Agregados atualizados a cada inclusão e remoção, para que as consultas de
+estatísticas custem O(1) e possam ser feitas com frequência (ex: painéis)
+"""
+
+import heapq
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Faixas dos histogramas (limite inferior de cada faixa)
+LIMITES_TAMANHO = [0, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000]
+LIMITES_QUALIDADE = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+
+
+class Distribuicao:
+    """
+    Contagem, média, mínimo, máximo e histograma de uma grandeza numérica
+
+    Aceita remoções: as contagens por valor permitem recalcular mínimo e
+    máximo quando o valor extremo é removido (só nesse caso).
+    """
+
+    def __init__(self, limites: List[float]):
+        self.limites = list(limites)
+        self.total = 0
+        self.soma = 0.0
+        self._faixas = [0] * len(self.limites)
+        self._valores = Counter()
+        self._minimo = None
+        self._maximo = None
+        self._extremos_validos = True
+
+    def _faixa(self, valor: float) -> int:
+        for i in range(len(self.limites) - 1, -1, -1):
+            if valor >= self.limites[i]:
+                return i
+        return 0
+
+    def adicionar(self, valor: float):
+        self.total += 1
+        self.soma += valor
+        self._faixas[self._faixa(valor)] += 1
+        self._valores[valor] += 1
+        if self._extremos_validos:
+            self._minimo = valor if self._minimo is None else min(self._minimo, valor)
+            self._maximo = valor if self._maximo is None else max(self._maximo, valor)
+
+    def remover(self, valor: float):
+        if self._valores.get(valor, 0) <= 0:
+            return
+        self.total -= 1
+        self.soma -= valor
+        self._faixas[self._faixa(valor)] -= 1
+        self._valores[valor] -= 1
+        if not self._valores[valor]:
+            del self._valores[valor]
+            if valor == self._minimo or valor == self._maximo:
+                self._extremos_validos = False
+
+    def limpar(self):
+        self.__init__(self.limites)
+
+    @property
+    def media(self) -> float:
+        return self.soma / self.total if self.total else 0.0
+
+    def extremos(self) -> Tuple[Optional[float], Optional[float]]:
+        """(mínimo, máximo), recalculados só depois da remoção de um extremo"""
+        if not self._extremos_validos:
+            self._minimo = min(self._valores) if self._valores else None
+            self._maximo = max(self._valores) if self._valores else None
+            self._extremos_validos = True
+        return self._minimo, self._maximo
+
+    def histograma(self) -> Dict[str, int]:
+        """Contagem por faixa, com rótulos 'inicio-fim' (a última faixa é 'inicio+')"""
+        resultado = {}
+        for i, inicio in enumerate(self.limites):
+            rotulo = f"{inicio}+" if i == len(self.limites) - 1 else f"{inicio}-{self.limites[i + 1]}"
+            resultado[rotulo] = self._faixas[i]
+        return resultado
+
+    def resumo(self) -> Dict[str, Any]:
+        minimo, maximo = self.extremos()
+        return {
+            'total': self.total,
+            'media': self.media,
+            'min': minimo if minimo is not None else 0,
+            'max': maximo if maximo is not None else 0,
+            'histograma': self.histograma()
+        }
+
+
+class TermosFrequentes:
+    """
+    Heavy hitters: os termos de maior contagem, sem ordenar o vocabulário
+
+    Recebe a contagem atual de um termo a cada alteração e mantém uma tabela
+    de candidatos. Quando a tabela passa de 2x a capacidade, fica só com os
+    `capacidade` maiores e a maior contagem descartada vira o corte de
+    entrada (custo amortizado O(log capacidade) por atualização). Remoções
+    podem deixar de fora termos que passariam a estar entre os maiores até
+    a próxima alteração deles, então o resultado é aproximado.
+    """
+
+    def __init__(self, capacidade: int = 500):
+        self.capacidade = capacidade
+        self._candidatos = {}  # termo -> contagem
+        self._corte = 0  # Contagem mínima (exclusiva) para entrar na tabela
+
+    def atualizar(self, termo: str, contagem: int):
+        """Informa a contagem atual de um termo"""
+        if termo in self._candidatos:
+            if contagem > 0:
+                self._candidatos[termo] = contagem
+                return
+            del self._candidatos[termo]
+            if len(self._candidatos) < self.capacidade:
+                self._corte = 0
+            return
+
+        if contagem <= self._corte:
+            return
+        self._candidatos[termo] = contagem
+        if len(self._candidatos) > 2 * self.capacidade:
+            self._podar()
+
+    def _podar(self):
+        ordenados = sorted(self._candidatos.items(), key=lambda item: item[1], reverse=True)
+        self._corte = ordenados[self.capacidade][1]
+        self._candidatos = dict(ordenados[:self.capacidade])
+
+    def mais_comuns(self, limite: int = 20, ignorar: Iterable[str] = ()) -> List[Tuple[str, int]]:
+        ignorar = set(ignorar)
+        termos = [item for item in self._candidatos.items() if item[0] not in ignorar]
+        return heapq.nlargest(limite, termos, key=lambda item: item[1])
+
+    def limpar(self):
+        self._candidatos = {}
+        self._corte = 0
+
+
+class EstatisticasCorpus:
+    """
+    Agregados de um corpus: fontes, tamanhos, qualidade e termos frequentes
+
+    Atualizado pelo IndiceInvertido a cada item incluído/removido (a partir
+    do resumo do item) e a cada mudança na frequência de documento de um
+    termo do campo de termos.
+    """
+
+    def __init__(self, tamanho_minimo_termo: int = 3):
+        self.tamanho_minimo_termo = tamanho_minimo_termo
+        self.total = 0
+        self.fontes = Counter()
+        self.tamanhos = Distribuicao(LIMITES_TAMANHO)
+        self.qualidade = Distribuicao(LIMITES_QUALIDADE)
+        self.termos = TermosFrequentes()
+        self.vocabulario = 0  # Termos distintos com tamanho >= tamanho_minimo_termo
+
+    def item_adicionado(self, resumo: Dict[str, Any]):
+        self.total += 1
+        self._aplicar(resumo, self.fontes.update, self.tamanhos.adicionar, self.qualidade.adicionar)
+
+    def item_removido(self, resumo: Dict[str, Any]):
+        self.total -= 1
+        self._aplicar(resumo, self.fontes.subtract, self.tamanhos.remover, self.qualidade.remover)
+        fonte = resumo.get('fonte')
+        if fonte is not None and self.fontes.get(fonte, 0) <= 0:
+            del self.fontes[fonte]
+
+    @staticmethod
+    def _aplicar(resumo: Dict[str, Any], fontes, tamanhos, qualidade):
+        if resumo.get('fonte') is not None:
+            fontes([resumo['fonte']])
+        if resumo.get('tamanho') is not None:
+            tamanhos(resumo['tamanho'])
+        if resumo.get('qualidade') is not None:
+            qualidade(resumo['qualidade'])
+
+    def termo_alterado(self, termo: str, frequencia: int, novo: bool = False, removido: bool = False):
+        """Nova frequência de documento de um termo (novo/removido do vocabulário)"""
+        if len(termo) < self.tamanho_minimo_termo:
+            return
+        if novo:
+            self.vocabulario += 1
+        elif removido:
+            self.vocabulario -= 1
+        self.termos.atualizar(termo, frequencia)
+
+    def resumo(self, limite_termos: int = 20, ignorar: Iterable[str] = ()) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'fontes': dict(self.fontes),
+            'tamanhos': self.tamanhos.resumo(),
+            'qualidade': self.qualidade.resumo(),
+            'termos_mais_comuns': dict(self.termos.mais_comuns(limite_termos, ignorar)),
+            'vocabulario': self.vocabulario
+        }
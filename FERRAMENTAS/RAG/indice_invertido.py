@@ -0,0 +1,868 @@
+#!/usr/bin/env python3
+"""
+Índice invertido persistente para o Sistema RAG
+Postings por campo com frequência de termos, avaliação booleana AND/OR/NOT,
+busca aproximada no vocabulário (trigramas), ranqueamento BM25 e
+detecção de documentos quase duplicados (MinHash + LSH)
+"""
+
+import heapq
+import math
+import os
+import pickle
+import re
+import zlib
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Set, Union, Tuple
+from collections import Counter
+
+import numpy as np
+
+from estatisticas_corpus import EstatisticasCorpus
+from indice_ordenado import IndiceOrdenado, valor_ordenavel
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Consulta booleana: termo (str) ou (operador, [subconsultas])
+Consulta = Union[str, Tuple[str, List[Any]]]
+
+# Chave do resumo com a assinatura MinHash do item (bytes de um array uint32)
+CHAVE_MINHASH = 'minhash'
+
+
+def tokenizar(texto: str) -> List[str]:
+    """
+    Divide um texto em termos normalizados (minúsculas, apenas caracteres de palavra)
+    """
+    if not texto:
+        return []
+    return _TOKEN_RE.findall(texto.lower())
+
+
+def distancia_levenshtein(s1: str, s2: str, maximo: Optional[int] = None) -> int:
+    """
+    Distância de Levenshtein entre duas strings
+
+    Args:
+        maximo: Se informado, o cálculo para assim que a distância passa
+            deste valor e retorna maximo + 1
+
+    Returns:
+        Número mínimo de inserções, remoções e substituições
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+
+    if maximo is not None and len(s1) - len(s2) > maximo:
+        return maximo + 1
+    if not s2:
+        return len(s1)
+
+    linha_anterior = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        linha_atual = [i + 1]
+        for j, c2 in enumerate(s2):
+            linha_atual.append(min(
+                linha_anterior[j + 1] + 1,
+                linha_atual[j] + 1,
+                linha_anterior[j] + (c1 != c2)
+            ))
+        if maximo is not None and min(linha_atual) > maximo:
+            return maximo + 1
+        linha_anterior = linha_atual
+
+    return linha_anterior[-1]
+
+
+class IndiceTrigramas:
+    """
+    Índice de n-gramas de caracteres sobre um vocabulário (termos distintos)
+
+    Encontra os termos a até k edições de uma consulta sem comparar com todo
+    o vocabulário: cada edição altera no máximo N n-gramas, então um termo
+    dentro da tolerância compartilha pelo menos |n-gramas da consulta| - N*k
+    n-gramas com ela. Só os termos que atingem esse mínimo (e cujo tamanho
+    difere em no máximo k) têm a distância de Levenshtein calculada.
+    """
+
+    N = 3
+
+    def __init__(self, termos: Iterable[str] = ()):
+        self._gramas = {}  # n-grama -> {termos}
+        self._por_tamanho = {}  # tamanho -> {termos}
+        for termo in termos:
+            self.adicionar(termo)
+
+    def __len__(self) -> int:
+        return sum(len(termos) for termos in self._por_tamanho.values())
+
+    @classmethod
+    def gramas(cls, termo: str) -> Set[str]:
+        """n-gramas distintos do termo (com marcadores de início e fim)"""
+        marcado = '$' * (cls.N - 1) + termo + '$' * (cls.N - 1)
+        return {marcado[i:i + cls.N] for i in range(len(marcado) - cls.N + 1)}
+
+    def adicionar(self, termo: str):
+        for grama in self.gramas(termo):
+            self._gramas.setdefault(grama, set()).add(termo)
+        self._por_tamanho.setdefault(len(termo), set()).add(termo)
+
+    def remover(self, termo: str):
+        for grama in self.gramas(termo):
+            termos = self._gramas.get(grama)
+            if termos is not None:
+                termos.discard(termo)
+                if not termos:
+                    del self._gramas[grama]
+        termos = self._por_tamanho.get(len(termo))
+        if termos is not None:
+            termos.discard(termo)
+            if not termos:
+                del self._por_tamanho[len(termo)]
+
+    def similares(self, consulta: str, tolerancia: int) -> List[Tuple[str, int]]:
+        """
+        Termos a até `tolerancia` edições da consulta
+
+        Returns:
+            Lista de (termo, distância) em ordem crescente de distância
+        """
+        gramas = self.gramas(consulta)
+        minimo = len(gramas) - self.N * tolerancia
+        tamanhos = range(max(len(consulta) - tolerancia, 0), len(consulta) + tolerancia + 1)
+
+        if minimo <= 0:
+            # Consulta curta demais para podar por n-gramas: só o filtro de tamanho
+            candidatos = [termo for tamanho in tamanhos for termo in self._por_tamanho.get(tamanho, ())]
+        else:
+            contagem = Counter()
+            for grama in gramas:
+                contagem.update(self._gramas.get(grama, ()))
+            candidatos = [
+                termo for termo, comuns in contagem.items()
+                if comuns >= minimo and abs(len(termo) - len(consulta)) <= tolerancia
+            ]
+
+        resultado = []
+        for termo in candidatos:
+            distancia = distancia_levenshtein(consulta, termo, tolerancia)
+            if distancia <= tolerancia:
+                resultado.append((termo, distancia))
+
+        resultado.sort(key=lambda item: item[1])
+        return resultado
+
+
+def shingles(texto: str, tamanho: int = 2) -> Set[str]:
+    """
+    Sequências de `tamanho` termos consecutivos do texto (conjunto)
+
+    Textos com menos termos que `tamanho` viram um único shingle.
+    """
+    termos = tokenizar(texto)
+    if len(termos) <= tamanho:
+        return {' '.join(termos)} if termos else set()
+    return {' '.join(termos[i:i + tamanho]) for i in range(len(termos) - tamanho + 1)}
+
+
+class MinHash:
+    """
+    Assinaturas MinHash: estimam a similaridade de Jaccard entre conjuntos
+
+    Cada posição da assinatura é o menor valor de uma permutação
+    h(x) = (a*x + b) mod p sobre os hashes (CRC32, estáveis entre processos)
+    dos elementos. A fração de posições iguais entre duas assinaturas estima
+    o Jaccard dos conjuntos. A semente fixa garante assinaturas comparáveis
+    entre execuções.
+    """
+
+    PRIMO = (1 << 61) - 1
+    MAXIMO = (1 << 32) - 1
+
+    def __init__(self, num_permutacoes: int = 128, semente: int = 1):
+        self.num_permutacoes = num_permutacoes
+        gerador = np.random.RandomState(semente)
+        self._a = gerador.randint(1, self.MAXIMO, size=num_permutacoes, dtype=np.uint64)
+        self._b = gerador.randint(0, self.MAXIMO, size=num_permutacoes, dtype=np.uint64)
+
+    def assinatura(self, elementos: Iterable[str]) -> np.ndarray:
+        """Assinatura (uint32) de um conjunto de strings"""
+        hashes = np.fromiter(
+            (zlib.crc32(elemento.encode('utf-8')) for elemento in set(elementos)), dtype=np.uint64
+        )
+        if not len(hashes):
+            return np.full(self.num_permutacoes, self.MAXIMO, dtype=np.uint32)
+
+        # a, x < 2^32: a*x + b cabe em uint64
+        valores = (np.outer(hashes, self._a) + self._b) % np.uint64(self.PRIMO)
+        return (valores & np.uint64(self.MAXIMO)).min(axis=0).astype(np.uint32)
+
+    def assinatura_texto(self, texto: str) -> bytes:
+        """Assinatura dos shingles de um texto, serializada para o resumo do índice"""
+        return self.assinatura(shingles(texto)).tobytes()
+
+    @staticmethod
+    def similaridade(a: Union[bytes, np.ndarray], b: Union[bytes, np.ndarray]) -> float:
+        """Jaccard estimado entre duas assinaturas"""
+        a = np.frombuffer(a, dtype=np.uint32) if isinstance(a, bytes) else a
+        b = np.frombuffer(b, dtype=np.uint32) if isinstance(b, bytes) else b
+        return float(np.count_nonzero(a == b)) / len(a)
+
+
+class IndiceLSH:
+    """
+    Locality-Sensitive Hashing sobre assinaturas MinHash
+
+    A assinatura é dividida em `bandas` faixas de `linhas` valores; itens
+    com alguma faixa idêntica caem no mesmo balde e viram candidatos. Com
+    128 permutações em 32 bandas de 4 linhas, pares com Jaccard acima de
+    ~0.4 são quase sempre candidatos e pares abaixo de ~0.15 raramente são.
+    Consultas custam o tamanho dos baldes tocados, não o tamanho do corpus.
+    """
+
+    def __init__(self, bandas: int = 32, linhas: int = 4):
+        self.bandas = bandas
+        self.linhas = linhas
+        self._baldes = [{} for _ in range(bandas)]  # banda -> faixa -> {ids}
+        self._assinaturas = {}  # id -> assinatura (bytes)
+
+    def __len__(self) -> int:
+        return len(self._assinaturas)
+
+    def _faixas(self, assinatura: bytes) -> List[bytes]:
+        largura = self.linhas * 4  # bytes por faixa (uint32)
+        return [assinatura[i * largura:(i + 1) * largura] for i in range(self.bandas)]
+
+    def adicionar(self, item_id: str, assinatura: bytes):
+        if item_id in self._assinaturas:
+            self.remover(item_id)
+        for baldes, faixa in zip(self._baldes, self._faixas(assinatura)):
+            baldes.setdefault(faixa, set()).add(item_id)
+        self._assinaturas[item_id] = assinatura
+
+    def remover(self, item_id: str):
+        assinatura = self._assinaturas.pop(item_id, None)
+        if assinatura is None:
+            return
+        for baldes, faixa in zip(self._baldes, self._faixas(assinatura)):
+            ids = baldes.get(faixa)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del baldes[faixa]
+
+    def assinatura(self, item_id: str) -> Optional[bytes]:
+        return self._assinaturas.get(item_id)
+
+    def candidatos(self, assinatura: bytes) -> Set[str]:
+        """IDs que compartilham ao menos uma faixa com a assinatura"""
+        resultado = set()
+        for baldes, faixa in zip(self._baldes, self._faixas(assinatura)):
+            resultado |= baldes.get(faixa, set())
+        return resultado
+
+    def similares(self, assinatura: bytes, limite: int = 10, minimo: float = 0.0,
+                  excluir: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Candidatos ordenados pelo Jaccard estimado
+
+        Returns:
+            Lista de (ID, similaridade) com similaridade >= minimo
+        """
+        resultado = []
+        for item_id in self.candidatos(assinatura):
+            if item_id == excluir:
+                continue
+            similaridade = MinHash.similaridade(assinatura, self._assinaturas[item_id])
+            if similaridade >= minimo:
+                resultado.append((item_id, similaridade))
+        return heapq.nlargest(limite, resultado, key=lambda item: item[1])
+
+
+class IndiceInvertido:
+    """
+    Índice invertido com postings por campo: campo -> termo -> {id: frequência}
+
+    Guarda também os termos de cada item (para remoção incremental), o número
+    de termos por campo (para ranqueamento) e um resumo opcional de cada item,
+    usado para montar resultados sem carregar o objeto original.
+    """
+
+    VERSAO = 4
+
+    def __init__(self, campos: List[str]):
+        self.campos = list(campos)
+        self._postings = {campo: {} for campo in self.campos}  # campo -> termo -> {id: tf}
+        self._termos_item = {}  # id -> {campo: [termos distintos]}
+        self._tamanhos = {campo: {} for campo in self.campos}  # campo -> id -> número de termos
+        self._total_termos = {campo: 0 for campo in self.campos}
+        self.resumos = {}  # id -> resumo do item
+        self.versao = 0  # Incrementada a cada alteração (invalida caches derivados)
+        self._trigramas = {}  # campo -> IndiceTrigramas (criado na primeira busca aproximada)
+        self._lsh = None  # IndiceLSH das assinaturas dos resumos (criado na primeira consulta)
+        self._estatisticas = None  # EstatisticasCorpus (criadas na primeira consulta)
+        self._campo_estatisticas = None
+        self._ordenados = {}  # chave do resumo -> IndiceOrdenado (criado na primeira consulta)
+
+    def __len__(self) -> int:
+        return len(self._termos_item)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._termos_item
+
+    def ids(self) -> Set[str]:
+        """IDs de todos os itens indexados"""
+        return set(self._termos_item)
+
+    # ===== ATUALIZAÇÃO =====
+
+    def adicionar(self, item_id: str, textos: Dict[str, str], resumo: Optional[Dict[str, Any]] = None):
+        """
+        Indexa (ou reindexa) um item
+
+        Args:
+            item_id: ID do item
+            textos: Texto de cada campo indexado
+            resumo: Dados do item guardados junto ao índice (opcional)
+        """
+        if item_id in self._termos_item:
+            self.remover(item_id)
+
+        termos_item = {}
+        for campo in self.campos:
+            tokens = tokenizar(textos.get(campo, ''))
+            frequencias = Counter(tokens)
+            postings = self._postings[campo]
+            trigramas = self._trigramas.get(campo)
+            estatisticas = self._estatisticas if campo == self._campo_estatisticas else None
+            for termo, tf in frequencias.items():
+                lista = postings.get(termo)
+                novo = lista is None
+                if novo:
+                    lista = postings[termo] = {}
+                    if trigramas is not None:
+                        trigramas.adicionar(termo)
+                lista[item_id] = tf
+                if estatisticas is not None:
+                    estatisticas.termo_alterado(termo, len(lista), novo=novo)
+            termos_item[campo] = list(frequencias)
+            self._tamanhos[campo][item_id] = len(tokens)
+            self._total_termos[campo] += len(tokens)
+
+        self._termos_item[item_id] = termos_item
+        if self._estatisticas is not None:
+            self._estatisticas.item_adicionado(resumo or {})
+        if resumo is not None:
+            self.resumos[item_id] = resumo
+            if self._lsh is not None and CHAVE_MINHASH in resumo:
+                self._lsh.adicionar(item_id, resumo[CHAVE_MINHASH])
+            for chave, ordenado in self._ordenados.items():
+                valor = valor_ordenavel(resumo.get(chave))
+                if valor is not None:
+                    ordenado.adicionar(item_id, valor)
+        self.versao += 1
+
+    def remover(self, item_id: str) -> bool:
+        """
+        Remove um item do índice (custo proporcional aos termos do item)
+        """
+        termos_item = self._termos_item.pop(item_id, None)
+        if termos_item is None:
+            return False
+
+        if self._estatisticas is not None:
+            self._estatisticas.item_removido(self.resumos.get(item_id, {}))
+
+        for campo, termos in termos_item.items():
+            postings = self._postings[campo]
+            trigramas = self._trigramas.get(campo)
+            estatisticas = self._estatisticas if campo == self._campo_estatisticas else None
+            for termo in termos:
+                lista = postings.get(termo)
+                if lista is None:
+                    continue
+                lista.pop(item_id, None)
+                if not lista:
+                    del postings[termo]
+                    if trigramas is not None:
+                        trigramas.remover(termo)
+                if estatisticas is not None:
+                    estatisticas.termo_alterado(termo, len(lista), removido=not lista)
+            self._total_termos[campo] -= self._tamanhos[campo].pop(item_id, 0)
+
+        self.resumos.pop(item_id, None)
+        if self._lsh is not None:
+            self._lsh.remover(item_id)
+        for ordenado in self._ordenados.values():
+            ordenado.remover(item_id)
+        self.versao += 1
+        return True
+
+    def limpar(self):
+        """Remove todos os itens"""
+        versao = self.versao
+        self.__init__(self.campos)
+        self.versao = versao + 1
+
+    # ===== CONSULTA =====
+
+    def _campos(self, campos: Optional[Iterable[str]]) -> List[str]:
+        return self.campos if campos is None else [campo for campo in campos if campo in self._postings]
+
+    def postings(self, termo: str, campos: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Frequência do termo em cada item, somada entre os campos
+        """
+        termo = termo.lower()
+        campos = self._campos(campos)
+        if len(campos) == 1:
+            return self._postings[campos[0]].get(termo, {})
+
+        resultado = {}
+        for campo in campos:
+            for item_id, tf in self._postings[campo].get(termo, {}).items():
+                resultado[item_id] = resultado.get(item_id, 0) + tf
+        return resultado
+
+    def frequencia_documento(self, termo: str, campos: Optional[Iterable[str]] = None) -> int:
+        """Número de itens que contêm o termo"""
+        return len(self.postings(termo, campos))
+
+    def termos(self, campo: str) -> Iterable[str]:
+        """Vocabulário de um campo"""
+        return self._postings.get(campo, {}).keys()
+
+    def termos_similares(self, termo: str, campo: str, tolerancia: int) -> List[Tuple[str, int]]:
+        """
+        Termos do vocabulário de um campo a até `tolerancia` edições
+
+        O índice de trigramas do campo é montado na primeira chamada e depois
+        mantido junto com os postings.
+
+        Returns:
+            Lista de (termo, distância) em ordem crescente de distância
+        """
+        if campo not in self._postings:
+            return []
+        trigramas = self._trigramas.get(campo)
+        if trigramas is None:
+            trigramas = self._trigramas[campo] = IndiceTrigramas(self._postings[campo])
+        return trigramas.similares(termo.lower(), tolerancia)
+
+    def indice_lsh(self) -> IndiceLSH:
+        """
+        Índice LSH das assinaturas MinHash guardadas nos resumos
+
+        Montado na primeira chamada e depois mantido junto com os itens.
+        """
+        if self._lsh is None:
+            self._lsh = IndiceLSH()
+            for item_id, resumo in self.resumos.items():
+                if CHAVE_MINHASH in resumo:
+                    self._lsh.adicionar(item_id, resumo[CHAVE_MINHASH])
+        return self._lsh
+
+    def indice_ordenado(self, chave: str) -> IndiceOrdenado:
+        """
+        Índice secundário ordenado por um valor numérico ou data dos resumos
+
+        Montado na primeira chamada e depois mantido a cada inclusão/remoção.
+        Itens sem valor (ou com valor não numérico) ficam de fora.
+        """
+        ordenado = self._ordenados.get(chave)
+        if ordenado is None:
+            itens = []
+            for item_id, resumo in self.resumos.items():
+                valor = valor_ordenavel(resumo.get(chave))
+                if valor is not None:
+                    itens.append((item_id, valor))
+            ordenado = self._ordenados[chave] = IndiceOrdenado(itens)
+        return ordenado
+
+    def estatisticas(self, campo_termos: str) -> EstatisticasCorpus:
+        """
+        Agregados do corpus indexado (fontes, tamanhos e qualidade dos
+        resumos; termos frequentes por frequência de documento no campo)
+
+        Montados na primeira chamada (ou ao trocar de campo) e depois
+        mantidos a cada inclusão/remoção: consultas seguintes custam O(1).
+        """
+        if self._estatisticas is None or self._campo_estatisticas != campo_termos:
+            estatisticas = EstatisticasCorpus()
+            for item_id in self._termos_item:
+                estatisticas.item_adicionado(self.resumos.get(item_id, {}))
+            for termo, lista in self._postings.get(campo_termos, {}).items():
+                estatisticas.termo_alterado(termo, len(lista), novo=True)
+            self._estatisticas = estatisticas
+            self._campo_estatisticas = campo_termos
+        return self._estatisticas
+
+    def tamanho(self, item_id: str, campos: Optional[Iterable[str]] = None) -> int:
+        """Número de termos do item nos campos"""
+        return sum(self._tamanhos[campo].get(item_id, 0) for campo in self._campos(campos))
+
+    def tamanho_medio(self, campos: Optional[Iterable[str]] = None) -> float:
+        """Número médio de termos por item nos campos"""
+        if not self._termos_item:
+            return 0.0
+        return sum(self._total_termos[campo] for campo in self._campos(campos)) / len(self._termos_item)
+
+    def avaliar(self, consulta: Consulta, campos: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        Avalia uma consulta booleana
+
+        Args:
+            consulta: Termo (str) ou tupla (operador, [subconsultas]) com
+                operador 'AND', 'OR' ou 'NOT'. Dentro de um AND, os filhos NOT
+                são subtraídos dos demais; um NOT isolado é o complemento da
+                união dos filhos.
+            campos: Campos consultados (todos se None)
+
+        Returns:
+            Conjunto de IDs que satisfazem a consulta
+        """
+        campos = self._campos(campos)
+
+        if isinstance(consulta, str):
+            termos = tokenizar(consulta)
+            if not termos:
+                return set()
+            if len(termos) == 1:
+                return set(self.postings(termos[0], campos))
+            # Vários termos em uma string são tratados como AND
+            consulta = ('AND', termos)
+
+        operador, filhos = consulta
+        operador = operador.upper()
+
+        if operador == 'OR':
+            resultado = set()
+            for filho in filhos:
+                resultado |= self.avaliar(filho, campos)
+            return resultado
+
+        if operador == 'NOT':
+            excluidos = set()
+            for filho in filhos:
+                excluidos |= self.avaliar(filho, campos)
+            return self.ids() - excluidos
+
+        if operador != 'AND':
+            raise ValueError(f"Operador inválido: {operador}")
+
+        positivos = [filho for filho in filhos if not self._eh_not(filho)]
+        negativos = [filho for filho in filhos if self._eh_not(filho)]
+
+        if positivos:
+            # Interseção começando pela menor lista de postings
+            conjuntos = sorted((self.avaliar(filho, campos) for filho in positivos), key=len)
+            resultado = conjuntos[0]
+            for conjunto in conjuntos[1:]:
+                if not resultado:
+                    break
+                resultado = resultado & conjunto
+        else:
+            resultado = self.ids()
+
+        for filho in negativos:
+            if not resultado:
+                break
+            for neto in filho[1]:
+                resultado = resultado - self.avaliar(neto, campos)
+
+        return resultado
+
+    @staticmethod
+    def _eh_not(consulta: Consulta) -> bool:
+        return not isinstance(consulta, str) and consulta[0].upper() == 'NOT'
+
+    # ===== PERSISTÊNCIA =====
+
+    def salvar(self, caminho: Union[str, Path], extra: Optional[Dict[str, Any]] = None):
+        """
+        Grava o índice (escrita atômica)
+
+        Args:
+            caminho: Arquivo de destino
+            extra: Dados adicionais gravados junto (ex: estado de sincronização)
+        """
+        caminho = Path(caminho)
+        estado = {
+            'versao': self.VERSAO,
+            'campos': self.campos,
+            'postings': self._postings,
+            'termos_item': self._termos_item,
+            'tamanhos': self._tamanhos,
+            'total_termos': self._total_termos,
+            'resumos': self.resumos,
+            'extra': extra or {}
+        }
+        temporario = caminho.with_name(caminho.name + '.tmp')
+        with open(temporario, 'wb') as f:
+            pickle.dump(estado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, caminho)
+
+    def carregar(self, caminho: Union[str, Path]) -> Optional[Dict[str, Any]]:
+        """
+        Carrega o índice gravado
+
+        Returns:
+            Dados adicionais gravados com o índice, ou None se o arquivo não
+            existir ou for incompatível
+        """
+        caminho = Path(caminho)
+        if not caminho.exists():
+            return None
+
+        try:
+            with open(caminho, 'rb') as f:
+                estado = pickle.load(f)
+        except Exception as e:
+            print(f"Erro ao carregar índice invertido {caminho}: {e}")
+            return None
+
+        if estado.get('versao') != self.VERSAO or estado.get('campos') != self.campos:
+            return None
+
+        self._postings = estado['postings']
+        self._termos_item = estado['termos_item']
+        self._tamanhos = estado['tamanhos']
+        self._total_termos = estado['total_termos']
+        self.resumos = estado['resumos']
+        self._trigramas = {}
+        self._lsh = None
+        self._estatisticas = None
+        self._ordenados = {}
+        self.versao += 1
+        return estado['extra']
+
+
+class MotorBM25:
+    """
+    Ranqueamento BM25 sobre um IndiceInvertido
+
+    Usa as frequências dos postings e os tamanhos (em termos) já mantidos
+    pelo índice. A tabela de IDF e o tamanho médio são calculados sob demanda
+    e reaproveitados até a próxima alteração do índice; a seleção dos k
+    melhores usa heap.
+    """
+
+    def __init__(self, indice: IndiceInvertido, k1: float = 1.5, b: float = 0.75):
+        self.indice = indice
+        self.k1 = k1
+        self.b = b
+        self._versao = None
+        self._idf = {}  # (campos, termo) -> idf
+        self._tamanho_medio = {}  # campos -> tamanho médio
+
+    def _validar_cache(self):
+        if self._versao != self.indice.versao:
+            self._idf.clear()
+            self._tamanho_medio.clear()
+            self._versao = self.indice.versao
+
+    def idf(self, termo: str, campos: Tuple[str, ...]) -> float:
+        """IDF do termo nos campos (variante sempre positiva)"""
+        chave = (campos, termo)
+        valor = self._idf.get(chave)
+        if valor is None:
+            total = len(self.indice)
+            df = self.indice.frequencia_documento(termo, campos)
+            valor = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            self._idf[chave] = valor
+        return valor
+
+    def pontuar(self, consulta: Union[str, List[str]], campos: Optional[Iterable[str]] = None,
+                candidatos: Optional[Set[str]] = None) -> Dict[str, float]:
+        """
+        Score BM25 de cada item que contém algum termo da consulta
+
+        Args:
+            consulta: Texto da consulta ou termos já tokenizados (tokenizar)
+            campos: Campos considerados (todos se None)
+            candidatos: Restringe a pontuação a estes IDs (opcional)
+
+        Returns:
+            Dicionário ID -> score
+        """
+        self._validar_cache()
+        campos = tuple(self.indice._campos(campos))
+        tamanho_medio = self._tamanho_medio.get(campos)
+        if tamanho_medio is None:
+            tamanho_medio = self._tamanho_medio[campos] = self.indice.tamanho_medio(campos) or 1.0
+
+        k1 = self.k1
+        b = self.b
+        tamanhos = [self.indice._tamanhos[campo] for campo in campos]
+        scores = {}
+
+        termos = tokenizar(consulta) if isinstance(consulta, str) else consulta
+        for termo in dict.fromkeys(termos):
+            postings = self.indice.postings(termo, campos)
+            if not postings:
+                continue
+            idf = self.idf(termo, campos)
+            for item_id, tf in postings.items():
+                if candidatos is not None and item_id not in candidatos:
+                    continue
+                tamanho = sum(t.get(item_id, 0) for t in tamanhos)
+                norma = k1 * (1 - b + b * tamanho / tamanho_medio)
+                scores[item_id] = scores.get(item_id, 0.0) + idf * tf * (k1 + 1) / (tf + norma)
+
+        return scores
+
+    def buscar(self, consulta: Union[str, List[str]], limite: int = 10, campos: Optional[Iterable[str]] = None,
+               candidatos: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Os k itens mais relevantes para a consulta
+
+        Returns:
+            Lista de (ID, score) em ordem decrescente de score
+        """
+        scores = self.pontuar(consulta, campos, candidatos)
+        return heapq.nlargest(limite, scores.items(), key=lambda item: item[1])
+
+
+class IndiceArmazenado:
+    """
+    Mantém um IndiceInvertido sincronizado com os objetos de um FileStore
+
+    Alterações feitas pelo próprio processo chegam pelo observador do
+    FileStore (sem reler o objeto gravado). Alterações de outros processos são
+    detectadas pela versão do FileStore e reconciliadas comparando as
+    localizações indexadas com as do índice do FileStore: só itens novos,
+    removidos ou com localização diferente são relidos. A localização inclui
+    o checksum do objeto gravado, então sobrescritas também são detectadas
+    (exceto em entradas antigas do backend 'files', que guardam só o nome
+    do arquivo).
+    """
+
+    def __init__(self, file_store, operacao: str, campos: List[str], extrair,
+                 caminho: Union[str, Path], salvar_a_cada: int = 200):
+        """
+        Args:
+            file_store: FileStore observado
+            operacao: 'documents' ou 'chunks'
+            campos: Campos indexados
+            extrair: Função objeto -> (textos por campo, resumo)
+            caminho: Arquivo de persistência do índice
+            salvar_a_cada: Alterações acumuladas que disparam a gravação
+        """
+        self.file_store = file_store
+        self.operacao = operacao
+        self.extrair = extrair
+        self.caminho = Path(caminho)
+        self.salvar_a_cada = salvar_a_cada
+
+        self.indice = IndiceInvertido(campos)
+        extra = self.indice.carregar(self.caminho)
+        self._localizacoes = extra.get('localizacoes', {}) if extra else {}
+        self._versao = None  # Versão do FileStore já refletida no índice
+        self._pendentes = 0  # Alterações ainda não gravadas
+
+        file_store.add_listener(self._ao_alterar)
+
+    def _chave_metadata(self) -> str:
+        return 'chunk_index' if self.operacao == 'chunks' else 'document_index'
+
+    def _indexar(self, item_id: str, obj: Any):
+        textos, resumo = self.extrair(obj)
+        self.indice.adicionar(item_id, textos, resumo)
+
+    def _ao_alterar(self, operacao: str, entradas: Dict[str, Any], objetos: Dict[str, Any]):
+        """Observador do FileStore: aplica as alterações deste processo"""
+        if operacao != self.operacao:
+            return
+
+        for item_id, localizacao in entradas.items():
+            if localizacao is None:
+                self.indice.remover(item_id)
+                self._localizacoes.pop(item_id, None)
+            elif item_id in objetos:
+                self._indexar(item_id, objetos[item_id])
+                self._localizacoes[item_id] = localizacao
+
+        # Só avança a versão se o índice já estava em dia antes desta alteração
+        if self._versao == self.file_store.version - 1:
+            self._versao = self.file_store.version
+        self._registrar(len(entradas))
+
+    def sincronizar(self) -> IndiceInvertido:
+        """
+        Reconcilia o índice com o FileStore (se houve alterações) e o retorna
+        """
+        metadata = self.file_store._load_metadata()
+        if self._versao == self.file_store.version:
+            return self.indice
+
+        atuais = metadata[self._chave_metadata()]
+        alteracoes = 0
+
+        for item_id in [item_id for item_id in self._localizacoes if item_id not in atuais]:
+            self.indice.remover(item_id)
+            del self._localizacoes[item_id]
+            alteracoes += 1
+
+        carregar = self.file_store.load_chunk if self.operacao == 'chunks' else self.file_store.load_document
+        for item_id, localizacao in atuais.items():
+            if self._localizacoes.get(item_id) == localizacao and item_id in self.indice:
+                continue
+            obj = carregar(item_id)
+            if obj is None:
+                continue
+            self._indexar(item_id, obj)
+            self._localizacoes[item_id] = localizacao
+            alteracoes += 1
+
+        self._versao = self.file_store.version
+        if alteracoes:
+            print(f"Índice de {self.operacao} sincronizado: {alteracoes} alterações")
+            self._registrar(alteracoes)
+        return self.indice
+
+    def _registrar(self, alteracoes: int):
+        self._pendentes += alteracoes
+        if self._pendentes >= self.salvar_a_cada:
+            self.salvar()
+
+    def salvar(self):
+        """Grava o índice e as localizações indexadas"""
+        try:
+            self.indice.salvar(self.caminho, {'localizacoes': dict(self._localizacoes)})
+            self._pendentes = 0
+        except Exception as e:
+            print(f"Erro ao salvar índice de {self.operacao}: {e}")
+
+    def reconstruir(self) -> IndiceInvertido:
+        """Descarta o índice e indexa novamente todos os itens"""
+        self.indice.limpar()
+        self._localizacoes = {}
+        self._versao = None
+        self.sincronizar()
+        self.salvar()
+        return self.indice
+
+
+def fundir_rankings(rankings: List[List[str]], limite: Optional[int] = None, k: int = 60,
+                    pesos: Optional[List[float]] = None) -> List[Tuple[str, float]]:
+    """
+    Funde rankings pelo Reciprocal Rank Fusion: score = soma de peso / (k + posição)
+
+    Args:
+        rankings: Listas de IDs, cada uma em ordem de relevância
+        limite: Número máximo de resultados (todos se None)
+        k: Constante de suavização do RRF
+        pesos: Peso de cada ranking (1.0 para todos se None)
+
+    Returns:
+        Lista de (ID, score fundido) em ordem decrescente de score
+    """
+    pesos = pesos or [1.0] * len(rankings)
+    scores = {}
+    for ranking, peso in zip(rankings, pesos):
+        for posicao, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + peso / (k + posicao)
+
+    if limite is None:
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return heapq.nlargest(limite, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Índice secundário ordenado para consultas por intervalo
+Chaves numéricas em um array compacto, mantido em ordem, com busca binária
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+def valor_ordenavel(valor: Any) -> Optional[float]:
+    """
+    Converte um valor de resumo em chave numérica (datas viram timestamp)
+
+    Returns:
+        A chave, ou None se o valor não puder ser indexado
+    """
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, datetime):
+        return valor.timestamp()
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    return None
+
+
+class IndiceOrdenado:
+    """
+    Pares (chave, ID) ordenados pela chave
+
+    As chaves ficam em um array('d') e os IDs em uma lista paralela; uma
+    consulta por intervalo são duas buscas binárias mais a leitura apenas
+    dos itens do intervalo. Inclusões e remoções custam uma busca binária e
+    um deslocamento do array (memmove).
+    """
+
+    def __init__(self, itens: Iterable[Tuple[str, float]] = ()):
+        ordenados = sorted(itens, key=lambda item: item[1])
+        self._chaves = array('d', (chave for _, chave in ordenados))
+        self._ids = [item_id for item_id, _ in ordenados]
+        self._valores = {item_id: chave for item_id, chave in ordenados}  # id -> chave
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._valores
+
+    def adicionar(self, item_id: str, chave: float):
+        if item_id in self._valores:
+            self.remover(item_id)
+        posicao = bisect_right(self._chaves, chave)
+        self._chaves.insert(posicao, chave)
+        self._ids.insert(posicao, item_id)
+        self._valores[item_id] = chave
+
+    def remover(self, item_id: str) -> bool:
+        chave = self._valores.pop(item_id, None)
+        if chave is None:
+            return False
+        inicio = bisect_left(self._chaves, chave)
+        fim = bisect_right(self._chaves, chave, inicio)
+        posicao = self._ids.index(item_id, inicio, fim)
+        del self._chaves[posicao]
+        del self._ids[posicao]
+        return True
+
+    def _limites(self, minimo: Optional[float], maximo: Optional[float]) -> Tuple[int, int]:
+        inicio = 0 if minimo is None else bisect_left(self._chaves, minimo)
+        fim = len(self._chaves) if maximo is None else bisect_right(self._chaves, maximo)
+        return inicio, max(inicio, fim)
+
+    def intervalo(self, minimo: Optional[float] = None, maximo: Optional[float] = None,
+                  limite: Optional[int] = None, decrescente: bool = False) -> List[Tuple[str, float]]:
+        """
+        Itens com minimo <= chave <= maximo (limites opcionais e inclusivos)
+
+        Args:
+            limite: Número máximo de itens (todos se None)
+            decrescente: Começa pela maior chave
+
+        Returns:
+            Lista de (ID, chave) na ordem pedida
+        """
+        inicio, fim = self._limites(minimo, maximo)
+        if limite is not None:
+            if decrescente:
+                inicio = max(inicio, fim - limite)
+            else:
+                fim = min(fim, inicio + limite)
+
+        itens = list(zip(self._ids[inicio:fim], self._chaves[inicio:fim]))
+        if decrescente:
+            itens.reverse()
+        return itens
+
+    def ids(self, minimo: Optional[float] = None, maximo: Optional[float] = None) -> List[str]:
+        """IDs com chave no intervalo, em ordem crescente de chave"""
+        inicio, fim = self._limites(minimo, maximo)
+        return self._ids[inicio:fim]
+
+    def contar(self, minimo: Optional[float] = None, maximo: Optional[float] = None) -> int:
+        """Número de itens no intervalo (sem percorrê-los)"""
+        inicio, fim = self._limites(minimo, maximo)
+        return fim - inicio
+
+    def chave(self, item_id: str) -> Optional[float]:
+        return self._valores.get(item_id)
@@ -6,9 +6,11 @@ Unifica busca de contexto entre MCP e RAG
 Conforme RELATORIO_INTEGRACAO_RAG_MCP_REGRAS.md
 """
 
+import copy
 import json
 import sys
 import os
+import threading
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from datetime import datetime
@@ -17,6 +19,8 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(str(Path(__file__).parent.parent / "GERENCIADOR_REGRAS"))
 
+from cache_contexto import CacheContexto, normalizar_consulta
+
 class IntegradorMCPRAG:
     """
     Integrador entre MCP e RAG para transmissão unificada de contexto
@@ -27,11 +31,23 @@ class IntegradorMCPRAG:
     - Buscar contexto relevante no RAG
     - Combinar dados de múltiplas fontes
     - Formatar resposta estruturada
+    
+    Respostas de buscar_contexto_unificado ficam em cache (LRU com
+    expiração) por consulta normalizada, sessão e versão; a versão muda a
+    cada registro no RAG e a cada recarga das regras.
+    
+    O RAG (modelo, índice FAISS e chunks) não é seguro entre threads: uma
+    recarga limpa e reconstrói o estado no lugar. Buscas, registros e
+    recargas passam por um mesmo lock; acertos no cache não o usam.
     """
     
-    def __init__(self):
+    def __init__(self, cache_capacidade: int = 256, cache_ttl_segundos: Optional[float] = 300):
         self.rag = None
         self.gerenciador_regras = None
+        self._regras_mtime = None
+        self._versao_regras = 0
+        self.cache = CacheContexto(cache_capacidade, cache_ttl_segundos)
+        self._lock = threading.RLock()  # Serializa o acesso ao RAG e às regras
         self._inicializar_componentes()
     
     def _inicializar_componentes(self):
@@ -42,12 +58,72 @@ class IntegradorMCPRAG:
             self.rag = RAGElis()
             
             # Inicializar Gerenciador de Regras
-            from gerenciador_simples import GerenciadorRegras
-            self.gerenciador_regras = GerenciadorRegras()
+            self._carregar_gerenciador_regras()
             
         except Exception as e:
             print(f"Aviso: Erro ao inicializar componentes: {e}")
     
+    def _carregar_gerenciador_regras(self):
+        """(Re)carrega o Gerenciador de Regras a partir do JSON"""
+        from gerenciador_simples import GerenciadorRegras
+        self.gerenciador_regras = GerenciadorRegras()
+        self._regras_mtime = self._mtime_regras()
+        self._versao_regras += 1
+    
+    @property
+    def versao(self) -> int:
+        """Versão combinada de RAG e regras (cresce a cada alteração de qualquer um)"""
+        return self._versao_regras + (self.rag.versao if self.rag else 0)
+    
+    def _mtime_regras(self) -> Optional[int]:
+        """mtime do arquivo JSON de regras (None se indisponível)"""
+        try:
+            return self.gerenciador_regras.arquivo_regras.stat().st_mtime_ns
+        except Exception:
+            return None
+    
+    def recarregar(self):
+        """Força recarga do armazenamento RAG e das regras JSON"""
+        with self._lock:
+            if self.rag:
+                self.rag.recarregar()
+            if self.gerenciador_regras:
+                self._carregar_gerenciador_regras()
+    
+    def recarregar_se_alterado(self) -> bool:
+        """
+        Recarrega componentes cujos arquivos mudaram no disco
+        
+        Custa apenas alguns stat() quando nada mudou.
+        
+        Returns:
+            bool: True se algum componente foi recarregado
+        """
+        recarregado = False
+        
+        with self._lock:
+            if self.rag:
+                try:
+                    recarregado = self.rag.recarregar_se_alterado()
+                except Exception as e:
+                    print(f"Aviso: Erro ao recarregar RAG: {e}")
+            
+            if self.gerenciador_regras and self._mtime_regras() != self._regras_mtime:
+                try:
+                    self._carregar_gerenciador_regras()
+                    recarregado = True
+                except Exception as e:
+                    print(f"Aviso: Erro ao recarregar regras: {e}")
+        
+        return recarregado
+    
+    def aquecer(self):
+        """Primeira inferência do modelo (inicialização preguiçosa do backend)"""
+        if self.rag is None:
+            raise RuntimeError("RAG não inicializado")
+        with self._lock:
+            self.rag.document_processor.embed_query("aquecimento")
+    
     def migrar_regras_json_para_rag(self) -> Dict[str, Any]:
         """
         Migra regras do JSON para o RAG
@@ -65,34 +141,37 @@ class IntegradorMCPRAG:
             # Obter regras do JSON
             regras_json = self.gerenciador_regras.regras
             
-            migradas = 0
             erros = []
+            regras = []
             
             for i, regra in enumerate(regras_json):
                 try:
                     if isinstance(regra, dict):
                         # Formato refatorado
-                        self.rag.registrar_regra(
-                            titulo=regra.get('titulo', f"Regra {i+1}"),
-                            descricao=regra.get('descricao', ''),
-                            categoria=regra.get('categoria', 'geral'),
-                            aplicacao=regra.get('aplicacao', ''),
-                            validacao=regra.get('validacao', '')
-                        )
+                        regras.append({
+                            'titulo': regra.get('titulo', f"Regra {i+1}"),
+                            'descricao': regra.get('descricao', ''),
+                            'categoria': regra.get('categoria', 'geral'),
+                            'aplicacao': regra.get('aplicacao', ''),
+                            'validacao': regra.get('validacao', '')
+                        })
                     else:
                         # Formato texto simples
-                        self.rag.registrar_regra(
-                            titulo=f"Regra {i+1}",
-                            descricao=str(regra),
-                            categoria='geral',
-                            aplicacao='',
-                            validacao=''
-                        )
-                    migradas += 1
+                        regras.append({
+                            'titulo': f"Regra {i+1}",
+                            'descricao': str(regra),
+                            'categoria': 'geral'
+                        })
                     
                 except Exception as e:
                     erros.append(f"Erro na regra {i+1}: {str(e)}")
             
+            # Registrar todas as regras com uma única geração de embeddings
+            with self._lock:
+                migradas = len(self.rag.registrar_regras_em_lote(regras))
+            if regras and not migradas:
+                erros.append("Falha ao registrar regras no RAG")
+            
             return {
                 'status': 'sucesso',
                 'regras_migradas': migradas,
@@ -116,8 +195,16 @@ class IntegradorMCPRAG:
             session_id: ID da sessão atual
             
         Returns:
-            Dict com contexto estruturado
+            Dict com contexto estruturado (cópia: pode ser alterado por quem chamou)
         """
+        chave = (normalizar_consulta(query), session_id, self.versao)
+        em_cache = self.cache.obter(chave)
+        if em_cache is not None:
+            # Cópia profunda: o contexto guardado não é exposto a alterações
+            contexto = copy.deepcopy(em_cache)
+            contexto.update(query=query, timestamp=datetime.now().isoformat())
+            return contexto
+        
         try:
             contexto = {
                 'timestamp': datetime.now().isoformat(),
@@ -132,20 +219,25 @@ class IntegradorMCPRAG:
                 }
             }
             
-            # 1. Buscar regras (prioridade: RAG, fallback: JSON)
-            contexto['regras'] = self._buscar_regras(query)
-            
-            # 2. Buscar histórico da sessão
-            if session_id:
-                contexto['historico_sessao'] = self._buscar_historico_sessao(session_id)
-            
-            # 3. Buscar soluções relevantes
-            if query:
-                contexto['solucoes_relevantes'] = self._buscar_solucoes_relevantes(query)
-            
-            # 4. Adicionar estatísticas
-            contexto['metadados']['estatisticas'] = self._obter_estatisticas()
+            with self._lock:
+                # Uma única passada no RAG para regras, histórico e soluções
+                resultados_rag = self._buscar_no_rag(query, session_id)
+                
+                # 1. Buscar regras (prioridade: RAG, fallback: JSON)
+                contexto['regras'] = self._buscar_regras(resultados_rag)
+                
+                # 2. Buscar histórico da sessão
+                if session_id:
+                    contexto['historico_sessao'] = self._buscar_historico_sessao(resultados_rag)
+                
+                # 3. Buscar soluções relevantes
+                if query:
+                    contexto['solucoes_relevantes'] = self._buscar_solucoes_relevantes(resultados_rag)
+                
+                # 4. Adicionar estatísticas
+                contexto['metadados']['estatisticas'] = self._obter_estatisticas()
             
+            self.cache.guardar(chave, copy.deepcopy(contexto))
             return contexto
             
         except Exception as e:
@@ -155,21 +247,37 @@ class IntegradorMCPRAG:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def _buscar_regras(self, query: str = "") -> List[Dict[str, Any]]:
-        """Busca regras no RAG ou fallback para JSON"""
+    def _buscar_no_rag(self, query: str, session_id: str) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """Executa a busca unificada no RAG (None se RAG indisponível ou falhou)"""
+        if not self.rag or not (query or session_id):
+            return None
+        
         try:
-            if self.rag:
-                # Tentar buscar no RAG primeiro
-                if query:
-                    regras_rag = self.rag.buscar_regras(query, limite=10)
-                    if regras_rag:
-                        return [{
-                            'fonte': 'RAG',
-                            'titulo': regra.get('titulo', ''),
-                            'descricao': regra.get('descricao', ''),
-                            'categoria': regra.get('categoria', ''),
-                            'score': regra.get('score', 0)
-                        } for regra in regras_rag]
+            return self.rag.buscar_contexto(
+                query,
+                sessao_id=session_id or None,
+                limite_regras=10,
+                limite_historico=5,
+                limite_solucoes=3
+            )
+        except Exception as e:
+            print(f"Aviso: Erro na busca unificada do RAG: {e}")
+            return None
+    
+    def _buscar_regras(self, resultados_rag: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Regras encontradas no RAG ou fallback para JSON"""
+        try:
+            if resultados_rag:
+                # Tentar regras do RAG primeiro
+                regras_rag = resultados_rag.get('regras', [])
+                if regras_rag:
+                    return [{
+                        'fonte': 'RAG',
+                        'titulo': regra.get('titulo', ''),
+                        'descricao': regra.get('descricao', ''),
+                        'categoria': regra.get('categoria', ''),
+                        'score': regra.get('score', 0)
+                    } for regra in regras_rag]
             
             # Fallback para JSON
             if self.gerenciador_regras:
@@ -185,13 +293,13 @@ class IntegradorMCPRAG:
         except Exception as e:
             return [{'erro': f'Erro ao buscar regras: {str(e)}'}]
     
-    def _buscar_historico_sessao(self, session_id: str) -> List[Dict[str, Any]]:
-        """Busca histórico da sessão no RAG"""
+    def _buscar_historico_sessao(self, resultados_rag: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Histórico da sessão encontrado no RAG"""
         try:
             if not self.rag:
                 return [{'erro': 'RAG não disponível'}]
             
-            historico = self.rag.buscar_historico_sessao(session_id, limite=5)
+            historico = (resultados_rag or {}).get('historico_sessao', [])
             
             return [{
                 'acao': item.get('acao', ''),
@@ -203,13 +311,13 @@ class IntegradorMCPRAG:
         except Exception as e:
             return [{'erro': f'Erro ao buscar histórico: {str(e)}'}]
     
-    def _buscar_solucoes_relevantes(self, query: str) -> List[Dict[str, Any]]:
-        """Busca soluções relevantes no RAG"""
+    def _buscar_solucoes_relevantes(self, resultados_rag: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Soluções relevantes encontradas no RAG"""
         try:
             if not self.rag:
                 return [{'erro': 'RAG não disponível'}]
             
-            solucoes = self.rag.buscar_solucoes(query, limite=3)
+            solucoes = (resultados_rag or {}).get('solucoes', [])
             
             return [{
                 'erro': item.get('erro', ''),
@@ -267,6 +375,47 @@ class IntegradorMCPRAG:
                 'timestamp': datetime.now().isoformat()
             }
 
+# Instância global mantida durante a vida do processo (modelo e índice carregados uma vez)
+_integrador_global = None
+_integrador_lock = threading.Lock()
+
+def obter_integrador(forcar_recarga: bool = False) -> IntegradorMCPRAG:
+    """
+    Retorna o integrador compartilhado, criando-o na primeira chamada
+    
+    Chamadas seguintes reutilizam modelo de embeddings e índice FAISS já
+    carregados; o armazenamento só é relido se os arquivos mudaram no disco.
+    A recarga usa o lock do integrador (espera as buscas em andamento), fora
+    do lock global, para não bloquear quem só consulta a versão.
+    
+    Args:
+        forcar_recarga: Recarrega índice e regras mesmo sem mudanças no disco
+        
+    Returns:
+        IntegradorMCPRAG pronto para uso
+    """
+    global _integrador_global
+    
+    with _integrador_lock:
+        if _integrador_global is None:
+            _integrador_global = IntegradorMCPRAG()
+            return _integrador_global
+        integrador = _integrador_global
+    
+    if forcar_recarga:
+        integrador.recarregar()
+    else:
+        integrador.recarregar_se_alterado()
+    
+    return integrador
+
+def descartar_integrador():
+    """Descarta o integrador compartilhado (a próxima chamada cria um novo)"""
+    global _integrador_global
+    
+    with _integrador_lock:
+        _integrador_global = None
+
 # Função de conveniência para uso direto
 def obter_contexto_integrado(query: str = "", session_id: str = "") -> Dict[str, Any]:
     """
@@ -279,7 +428,7 @@ def obter_contexto_integrado(query: str = "", session_id: str = "") -> Dict[str,
     Returns:
         Dict com contexto estruturado
     """
-    integrador = IntegradorMCPRAG()
+    integrador = obter_integrador()
     return integrador.buscar_contexto_unificado(query, session_id)
 
 if __name__ == "__main__":
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Medição de tempo por etapa (embed, search, format...)
+Quem chama ativa a coleta na thread atual; o código instrumentado só marca
+as etapas e, sem coleta ativa, o custo é uma consulta a uma variável local
+da thread
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+_local = threading.local()
+
+
+@contextmanager
+def coletar_etapas() -> Iterator[Dict[str, float]]:
+    """
+    Coleta as durações (segundos) das etapas executadas nesta thread
+
+    Etapas repetidas são somadas. Coletas podem ser aninhadas: a interna
+    não aparece na externa.
+    """
+    anterior = getattr(_local, 'etapas', None)
+    etapas = {}
+    _local.etapas = etapas
+    try:
+        yield etapas
+    finally:
+        _local.etapas = anterior
+
+
+@contextmanager
+def etapa(nome: str) -> Iterator[None]:
+    """Marca um trecho como etapa `nome` da coleta ativa (se houver)"""
+    etapas = getattr(_local, 'etapas', None)
+    if etapas is None:
+        yield
+        return
+
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        etapas[nome] = etapas.get(nome, 0.0) + time.perf_counter() - inicio
@@ -6,6 +6,7 @@ Modelos de dados para documentos e chunks do sistema RAG
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+import sys
 import numpy as np
 
 @dataclass
@@ -73,53 +74,124 @@ class RawDocument:
             'word_count': self.word_count
         }
 
-@dataclass
+def _intern(value):
+    """Compartilha strings repetidas (IDs de documento, tipos de fonte)"""
+    return sys.intern(value) if type(value) is str else value
+
 class ProcessedChunk:
-    """Chunk processado de um documento"""
-    
-    # Campos obrigatorios
-    text: str
-    embedding: np.ndarray
-    document_id: str
-    chunk_index: int
-    
-    # Campos opcionais
-    chunk_id: str = ""
-    source_type: str = ""
-    document_title: str = ""
-    
-    # Metadados de processamento
-    processing_timestamp: datetime = field(default_factory=datetime.now)
-    chunk_size: int = 0
-    overlap_size: int = 0
-    
-    # Metricas de qualidade
-    quality_score: float = 0.0
-    embedding_norm: float = 0.0
-    
-    # Contexto
-    previous_chunk_id: str = ""
-    next_chunk_id: str = ""
-    
-    # Metadados adicionais
-    metadata: Dict[str, Any] = field(default_factory=dict)
+    """Chunk processado de um documento
+    
+    Classe com __slots__ (sem __dict__ por instancia): com centenas de
+    milhares de chunks em memoria o custo por objeto domina o consumo.
+    O timestamp e guardado como float, o embedding costuma ser uma view de
+    uma matriz compartilhada (lote de embeddings ou arquivo mapeado) e
+    chunks de um mesmo documento compartilham o dicionario de metadados.
+    """
+    
+    __slots__ = (
+        'text', 'embedding', 'document_id', 'chunk_index',
+        '_chunk_id', 'source_type', 'document_title',
+        '_timestamp', 'chunk_size', 'overlap_size',
+        'quality_score', 'embedding_norm',
+        'previous_chunk_id', 'next_chunk_id',
+        'metadata'
+    )
     
-    def __post_init__(self):
-        """Processamento pos-inicializacao"""
-        if not self.chunk_id:
-            self.chunk_id = f"{self.document_id}_chunk_{self.chunk_index}"
+    def __init__(self, text: str, embedding: np.ndarray, document_id: str, chunk_index: int,
+                 chunk_id: str = "", source_type: str = "", document_title: str = "",
+                 processing_timestamp: Optional[datetime] = None, chunk_size: int = 0,
+                 overlap_size: int = 0, quality_score: float = 0.0, embedding_norm: float = 0.0,
+                 previous_chunk_id: str = "", next_chunk_id: str = "",
+                 metadata: Optional[Dict[str, Any]] = None):
+        # Campos obrigatorios
+        self.text = text
+        self.embedding = embedding
+        self.document_id = _intern(document_id)
+        self.chunk_index = chunk_index
         
-        if self.chunk_size == 0:
-            self.chunk_size = len(self.text)
-            
+        # Campos opcionais (strings repetidas entre chunks sao compartilhadas)
+        self._chunk_id = chunk_id  # Vazio = derivado de document_id/chunk_index
+        self.source_type = _intern(source_type)
+        self.document_title = document_title
+        
+        # Metadados de processamento
+        self.processing_timestamp = processing_timestamp or datetime.now()
+        self.chunk_size = chunk_size or len(text)
+        self.overlap_size = overlap_size
+        
+        # Metricas de qualidade
+        self.quality_score = quality_score
+        self.embedding_norm = embedding_norm
         if self.embedding_norm == 0.0 and self.embedding is not None:
             self.embedding_norm = float(np.linalg.norm(self.embedding))
+        
+        # Contexto
+        self.previous_chunk_id = previous_chunk_id
+        self.next_chunk_id = next_chunk_id
+        
+        # Metadados adicionais
+        self.metadata = metadata if metadata is not None else {}
+    
+    @property
+    def chunk_id(self) -> str:
+        """ID do chunk (por padrao, <document_id>_chunk_<chunk_index>)"""
+        return self._chunk_id or f"{self.document_id}_chunk_{self.chunk_index}"
+    
+    @chunk_id.setter
+    def chunk_id(self, value: str):
+        self._chunk_id = value
+    
+    @property
+    def processing_timestamp(self) -> datetime:
+        """Momento do processamento"""
+        return datetime.fromtimestamp(self._timestamp)
+    
+    @processing_timestamp.setter
+    def processing_timestamp(self, value: datetime):
+        self._timestamp = value.timestamp()
+    
+    def __repr__(self) -> str:
+        return (f"ProcessedChunk(chunk_id={self.chunk_id!r}, document_id={self.document_id!r}, "
+                f"chunk_index={self.chunk_index}, source_type={self.source_type!r}, "
+                f"chunk_size={self.chunk_size})")
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    def __setstate__(self, state):
+        # Pickles antigos (dataclass) guardam processing_timestamp como datetime em __dict__
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        for name, value in state.items():
+            if name == 'processing_timestamp':
+                self.processing_timestamp = value
+            elif name == 'chunk_id':
+                self._chunk_id = value
+            else:
+                setattr(self, name, value)
+        for name, default in (('previous_chunk_id', ''), ('next_chunk_id', ''), ('metadata', {})):
+            if not hasattr(self, name):
+                setattr(self, name, default)
     
     @property
     def word_count(self) -> int:
         """Numero de palavras no chunk"""
         return len(self.text.split())
     
+    @property
+    def content(self) -> str:
+        """Alias de text (mesma nomenclatura de RawDocument)"""
+        return self.text
+    
+    @content.setter
+    def content(self, value: str):
+        self.text = value
+    
+    @property
+    def source_metadata(self) -> Dict[str, Any]:
+        """Metadados de origem do documento (copiados no processamento)"""
+        return self.metadata.get('source_metadata', {})
+    
     def calculate_similarity(self, other_embedding: np.ndarray) -> float:
         """Calcula similaridade coseno com outro embedding"""
         if self.embedding is None or other_embedding is None:
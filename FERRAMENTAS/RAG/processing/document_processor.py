@@ -4,6 +4,7 @@ Processador de documentos com chunking e embeddings
 """
 
 import numpy as np
+from datetime import datetime
 from sentence_transformers import SentenceTransformer
 from typing import List, Dict, Any, Optional, Tuple
 import re
@@ -13,6 +14,10 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.document import RawDocument, ProcessedChunk
+from processing.embedding_cache import EmbeddingCache
+
+# Diretorio padrao do cache de embeddings, compartilhado por RAGElis e pipelines
+DEFAULT_EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'embedding_cache')
 
 # Download necessario do NLTK
 try:
@@ -52,8 +57,14 @@ class DocumentProcessor:
         print(f"Carregando modelo de embeddings: {self.embedding_model_name}")
         self.embedding_model = SentenceTransformer(self.embedding_model_name, device=self.device)
         
-        # Cache de embeddings
-        self.embedding_cache = {}
+        # Cache de embeddings (persistente por padrao; None = apenas memoria)
+        cache_dir = self.config.get('embedding_cache_dir', DEFAULT_EMBEDDING_CACHE_DIR)
+        self.embedding_cache = EmbeddingCache(
+            cache_dir,
+            self.embedding_model_name,
+            max_bytes=self.config.get('embedding_cache_max_mb', 512) * 1024 * 1024,
+            memory_items=self.config.get('embedding_cache_memory_items', 10000)
+        )
         
     def clean_text(self, text: str) -> str:
         """Limpa e normaliza texto"""
@@ -200,21 +211,21 @@ class DocumentProcessor:
         if not texts:
             return np.array([])
             
-        # Verificar cache
+        # Verificar cache (chave estavel: hash do conteudo + modelo)
         cached_embeddings = []
-        texts_to_process = []
+        texts_to_process = {}  # chave -> (texto, posicoes)
+        keys = [self.embedding_cache.key(text) for text in texts]
+        cached = self.embedding_cache.get_many(keys)
         
-        for text in texts:
-            text_hash = hash(text)
-            if text_hash in self.embedding_cache:
-                cached_embeddings.append(self.embedding_cache[text_hash])
-            else:
-                cached_embeddings.append(None)
-                texts_to_process.append((len(cached_embeddings) - 1, text))
+        for text, key in zip(texts, keys):
+            embedding = cached.get(key)
+            cached_embeddings.append(embedding)
+            if embedding is None:
+                texts_to_process.setdefault(key, (text, []))[1].append(len(cached_embeddings) - 1)
         
-        # Processar textos nao cacheados
+        # Processar textos nao cacheados (textos repetidos sao gerados uma vez)
         if texts_to_process:
-            batch_texts = [text for _, text in texts_to_process]
+            batch_texts = [text for text, _ in texts_to_process.values()]
             batch_embeddings = self.embedding_model.encode(
                 batch_texts,
                 batch_size=self.batch_size,
@@ -222,23 +233,34 @@ class DocumentProcessor:
             )
             
             # Atualizar cache e resultado
-            for (idx, text), embedding in zip(texts_to_process, batch_embeddings):
-                text_hash = hash(text)
-                self.embedding_cache[text_hash] = embedding
-                cached_embeddings[idx] = embedding
+            for (key, (_, positions)), embedding in zip(texts_to_process.items(), batch_embeddings):
+                self.embedding_cache.put(key, embedding)
+                for idx in positions:
+                    cached_embeddings[idx] = embedding
         
         return np.array(cached_embeddings)
     
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Gera embeddings de queries de busca em uma unica chamada ao modelo
+        
+        Diferente de process_documents, nao faz chunking nem calculo de
+        qualidade: cada query vira exatamente um embedding, mesmo se for
+        mais curta que min_text_length.
+        """
+        if not queries:
+            return np.array([])
+        
+        # Limpeza leve; se a limpeza esvaziar a query, usar o texto original
+        texts = [self.clean_text(query) or query.strip() for query in queries]
+        return self.generate_embeddings(texts)
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Gera o embedding de uma unica query de busca"""
+        return self.embed_queries([query])[0]
+    
     def process_document(self, document: RawDocument, chunking_strategy: str = 'sentence') -> List[ProcessedChunk]:
         """Processa um documento completo"""
-        # Limpar texto
-        cleaned_text = self.clean_text(document.content)
-        
-        if len(cleaned_text) < self.min_text_length:
-            return []
-        
-        # Fazer chunking
-        chunk_texts = self.chunk_text(cleaned_text, chunking_strategy)
+        cleaned_text, chunk_texts = self._split_document(document, chunking_strategy)
         
         if not chunk_texts:
             return []
@@ -246,26 +268,49 @@ class DocumentProcessor:
         # Gerar embeddings
         embeddings = self.generate_embeddings(chunk_texts)
         
-        # Criar objetos ProcessedChunk
+        return self._build_chunks(document, cleaned_text, chunk_texts, embeddings, chunking_strategy)
+    
+    def _split_document(self, document: RawDocument, chunking_strategy: str) -> Tuple[str, List[str]]:
+        """Limpa e divide um documento em textos de chunk (sem gerar embeddings)"""
+        # Limpar texto
+        cleaned_text = self.clean_text(document.content)
+        
+        if len(cleaned_text) < self.min_text_length:
+            return cleaned_text, []
+        
+        # Fazer chunking
+        return cleaned_text, self.chunk_text(cleaned_text, chunking_strategy)
+    
+    def _build_chunks(self, document: RawDocument, cleaned_text: str, chunk_texts: List[str],
+                      embeddings: np.ndarray, chunking_strategy: str) -> List[ProcessedChunk]:
+        """Cria os ProcessedChunk de um documento a partir de textos e embeddings"""
+        # Metadados e timestamp sao do documento: um unico objeto para todos os chunks
+        metadata = {
+            'chunking_strategy': chunking_strategy,
+            'original_document_length': len(document.content),
+            'cleaned_document_length': len(cleaned_text),
+            'document_language': document.language,
+            'document_quality_score': document.quality_score,
+            'source_metadata': document.source_metadata
+        }
+        timestamp = datetime.now()
+        
+        # Criar objetos ProcessedChunk (embeddings sao views das linhas da matriz)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
         processed_chunks = []
         
-        for i, (chunk_text, embedding) in enumerate(zip(chunk_texts, embeddings)):
+        for i, chunk_text in enumerate(chunk_texts):
             chunk = ProcessedChunk(
                 text=chunk_text,
-                embedding=embedding,
+                embedding=embeddings[i],
                 document_id=document.document_id,
                 chunk_index=i,
                 source_type=document.source_type,
                 document_title=document.title,
+                processing_timestamp=timestamp,
                 chunk_size=len(chunk_text),
                 overlap_size=self.chunk_overlap if i > 0 else 0,
-                metadata={
-                    'chunking_strategy': chunking_strategy,
-                    'original_document_length': len(document.content),
-                    'cleaned_document_length': len(cleaned_text),
-                    'document_language': document.language,
-                    'document_quality_score': document.quality_score
-                }
+                metadata=metadata
             )
             
             # Calcular score de qualidade do chunk
@@ -283,23 +328,45 @@ class DocumentProcessor:
         return processed_chunks
     
     def process_documents(self, documents: List[RawDocument], chunking_strategy: str = 'sentence') -> List[ProcessedChunk]:
-        """Processa lista de documentos"""
-        all_chunks = []
+        """Processa lista de documentos
         
+        Todos os documentos sao divididos primeiro e os embeddings de todos
+        os chunks sao gerados juntos, em lotes de batch_size.
+        """
         print(f"Processando {len(documents)} documentos...")
         
+        # Chunking de todos os documentos
+        split_documents = []
+        all_texts = []
         for i, document in enumerate(documents, 1):
             print(f"Processando documento {i}/{len(documents)}: {document.title[:50]}...")
             
             try:
-                chunks = self.process_document(document, chunking_strategy)
-                all_chunks.extend(chunks)
-                print(f"  Gerados {len(chunks)} chunks")
+                cleaned_text, chunk_texts = self._split_document(document, chunking_strategy)
+                split_documents.append((document, cleaned_text, len(all_texts), len(chunk_texts)))
+                all_texts.extend(chunk_texts)
+                print(f"  Gerados {len(chunk_texts)} chunks")
                 
             except Exception as e:
                 print(f"  Erro ao processar documento: {e}")
                 continue
         
+        if not all_texts:
+            print(f"\nTotal de chunks processados: 0")
+            return []
+        
+        # Embeddings de todos os chunks de uma vez
+        embeddings = self.generate_embeddings(all_texts)
+        
+        all_chunks = []
+        for document, cleaned_text, start, count in split_documents:
+            if count == 0:
+                continue
+            all_chunks.extend(self._build_chunks(
+                document, cleaned_text, all_texts[start:start + count],
+                embeddings[start:start + count], chunking_strategy
+            ))
+        
         print(f"\nTotal de chunks processados: {len(all_chunks)}")
         return all_chunks
     
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Cache de embeddings persistente, enderecado por conteudo
+Embeddings anexados a arquivos de shard append-only, com um indice lateral
+de posicoes por shard
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# Entrada do indice de um shard: sha256 da chave, offset, tamanho, crc32
+_ENTRY = struct.Struct('<32sQII')
+
+# Localizacao de um embedding: (shard, offset, tamanho, crc32)
+Location = Tuple[int, int, int, int]
+
+
+class EmbeddingCache:
+    """Cache de embeddings em disco com LRU e limite de tamanho
+
+    A chave e o SHA-256 de (nome do modelo, texto): estavel entre processos,
+    entao o mesmo diretorio pode ser compartilhado pelo servidor MCP e pelos
+    pipelines. Os embeddings sao anexados a shards (shard_NNNNNN.bin), cada
+    um com um indice (shard_NNNNNN.idx) das posicoes dos registros: poucos
+    arquivos grandes em vez de um arquivo por embedding.
+
+    Cada instancia grava apenas no shard que criou (criacao exclusiva), entao
+    processos que compartilham o diretorio nunca escrevem no mesmo arquivo;
+    os indices dos demais shards sao lidos de forma incremental quando uma
+    chave nao e encontrada. Quando o total passa de max_bytes, os shards mais
+    antigos sao removidos inteiros; um acerto na metade mais antiga regrava o
+    embedding no shard atual, o que mantem os embeddings em uso (LRU
+    aproximado). Um LRU em memoria evita ler o disco nos acertos frequentes.
+    Seguro entre threads. Com cache_dir=None o cache fica apenas em memoria.
+    """
+
+    def __init__(self, cache_dir: Optional[str], model_name: str,
+                 max_bytes: int = 512 * 1024 * 1024, memory_items: int = 10000,
+                 shard_bytes: Optional[int] = None):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        # Shards pequenos o bastante para a remocao por shard ser gradual
+        self.shard_bytes = shard_bytes or max(1024 * 1024, max_bytes // 16)
+
+        self.cache_dir = None
+        if cache_dir:
+            # Um subdiretorio por modelo facilita limpar um modelo especifico
+            self.cache_dir = Path(cache_dir) / re.sub(r'[^\w.-]+', '_', model_name)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._remove_legacy_files()
+
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()  # chave -> embedding
+        self._index = {}  # chave -> Location
+        self._index_read = {}  # shard -> bytes do indice ja lidos
+        self._shard_sizes = {}  # shard -> bytes (dados + indice)
+        self._active = None  # Shard criado por esta instancia
+        self._data_file = None
+        self._index_file = None
+
+        self.stats = {'hits': 0, 'misses': 0, 'disk_hits': 0, 'evictions': 0}
+
+        if self.cache_dir is not None:
+            self._refresh()
+
+    def key(self, text: str) -> str:
+        """Chave estavel do texto para o modelo atual"""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def _path(self, shard: int, suffix: str) -> Path:
+        return self.cache_dir / f"shard_{shard:06d}{suffix}"
+
+    def _shards(self) -> List[int]:
+        """Numeros dos shards existentes, em ordem"""
+        shards = []
+        for path in self.cache_dir.glob('shard_*.bin'):
+            number = path.stem.split('_')[-1]
+            if number.isdigit():
+                shards.append(int(number))
+        return sorted(shards)
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self.cache_dir is None:
+                return len(self._memory)
+            self._refresh()
+            return len(self._index)
+
+    # ===== LEITURA =====
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Obtem um embedding (None se ausente)"""
+        return self._get(key, refresh=True)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Obtem os embeddings disponiveis para uma lista de chaves
+
+        Os indices dos outros processos sao relidos uma vez por chamada.
+        """
+        with self._lock:
+            if self.cache_dir is not None:
+                self._refresh()
+            found = {}
+            for key in keys:
+                embedding = self._get(key, refresh=False)
+                if embedding is not None:
+                    found[key] = embedding
+            return found
+
+    def _get(self, key: str, refresh: bool) -> Optional[np.ndarray]:
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.stats['hits'] += 1
+                return embedding
+
+            if self.cache_dir is not None:
+                if refresh and key not in self._index:
+                    self._refresh()  # Gravado por outro processo?
+                embedding = self._read(key)
+                if embedding is not None:
+                    self._remember(key, embedding)
+                    self.stats['hits'] += 1
+                    self.stats['disk_hits'] += 1
+                    return embedding
+
+            self.stats['misses'] += 1
+            return None
+
+    def _read(self, key: str) -> Optional[np.ndarray]:
+        """Le um embedding do shard (registros ilegiveis sao esquecidos)"""
+        location = self._index.get(key)
+        if location is None:
+            return None
+
+        shard, offset, size, checksum = location
+        try:
+            with open(self._path(shard, '.bin'), 'rb') as f:
+                f.seek(offset)
+                data = f.read(size)
+        except OSError:
+            data = b''  # Shard removido por outro processo
+        if len(data) != size or zlib.crc32(data) != checksum:
+            del self._index[key]
+            return None
+
+        embedding = np.frombuffer(bytearray(data), dtype=np.float32)
+        if self._is_old(shard):
+            self._append(key, data)  # Mantem o embedding em uso longe da remocao
+        return embedding
+
+    def _is_old(self, shard: int) -> bool:
+        """Shard na metade mais antiga (a proxima a ser removida)"""
+        shards = sorted(self._shard_sizes)
+        return shard != self._active and shard in shards[:len(shards) // 2]
+
+    def _refresh(self):
+        """Le as entradas novas dos indices dos shards (inclusive de outros processos)"""
+        shards = self._shards()
+        gone = set(self._shard_sizes) - set(shards)
+        if gone:
+            self._forget_shards(gone)
+
+        for shard in shards:
+            index_path = self._path(shard, '.idx')
+            try:
+                with open(index_path, 'rb') as f:
+                    f.seek(self._index_read.get(shard, 0))
+                    data = f.read()
+                size = self._path(shard, '.bin').stat().st_size + index_path.stat().st_size
+            except OSError:
+                continue  # Shard recem-criado (sem indice) ou removido
+
+            complete = len(data) - len(data) % _ENTRY.size  # Entrada parcial: lida na proxima vez
+            for position in range(0, complete, _ENTRY.size):
+                digest, offset, length, checksum = _ENTRY.unpack_from(data, position)
+                key = digest.hex()
+                current = self._index.get(key)
+                if current is None or current[0] <= shard:
+                    self._index[key] = (shard, offset, length, checksum)
+            self._index_read[shard] = self._index_read.get(shard, 0) + complete
+            self._shard_sizes[shard] = size
+
+    def _forget_shards(self, shards):
+        for shard in shards:
+            self._shard_sizes.pop(shard, None)
+            self._index_read.pop(shard, None)
+        removed = [key for key, location in self._index.items() if location[0] in shards]
+        for key in removed:
+            del self._index[key]
+        return len(removed)
+
+    # ===== ESCRITA =====
+
+    def put(self, key: str, embedding: np.ndarray):
+        """Armazena um embedding"""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, embedding)
+            if self.cache_dir is None or key in self._index:
+                return
+            self._append(key, embedding.tobytes())
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """Armazena varios embeddings"""
+        for key, embedding in items.items():
+            self.put(key, embedding)
+
+    def _append(self, key: str, data: bytes):
+        """Anexa um registro ao shard desta instancia e a sua entrada no indice"""
+        try:
+            self._open_shard()
+            offset = self._data_file.tell()
+            checksum = zlib.crc32(data)
+            self._data_file.write(data)
+            self._data_file.flush()  # Dados antes da entrada do indice
+            self._index_file.write(_ENTRY.pack(bytes.fromhex(key), offset, len(data), checksum))
+            self._index_file.flush()
+        except OSError as e:
+            print(f"Erro ao gravar cache de embeddings: {e}")
+            self._close_shard()
+            return
+
+        self._index[key] = (self._active, offset, len(data), checksum)
+        self._index_read[self._active] = self._index_file.tell()
+        self._shard_sizes[self._active] = self._data_file.tell() + self._index_file.tell()
+
+        if sum(self._shard_sizes.values()) > self.max_bytes:
+            self._evict()
+
+    def _open_shard(self):
+        """Abre um shard novo se nao ha um aberto, se ele encheu ou foi removido"""
+        if (self._data_file is not None and self._data_file.tell() < self.shard_bytes
+                and self._path(self._active, '.bin').exists()):
+            return
+
+        self._close_shard()
+        shard = (self._shards() or [0])[-1] + 1
+        while True:
+            try:
+                data_file = open(self._path(shard, '.bin'), 'xb')
+                break
+            except FileExistsError:
+                shard += 1  # Criado por outro processo ao mesmo tempo
+        self._active = shard
+        self._data_file = data_file
+        self._index_file = open(self._path(shard, '.idx'), 'wb')
+        self._shard_sizes[shard] = 0
+
+    def _close_shard(self):
+        for handle in (self._data_file, self._index_file):
+            if handle is not None:
+                try:
+                    handle.close()
+                except OSError:
+                    pass
+        self._data_file = None
+        self._index_file = None
+        self._active = None
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # ===== REMOCAO =====
+
+    def _evict(self):
+        """Remove os shards mais antigos ate ficar abaixo de 90% do limite"""
+        self._refresh()
+        total = sum(self._shard_sizes.values())
+        target = self.max_bytes * 0.9
+
+        for shard in sorted(self._shard_sizes):
+            if total <= target:
+                break
+            if shard == self._active:
+                continue
+            try:
+                self._path(shard, '.bin').unlink()
+                self._path(shard, '.idx').unlink(missing_ok=True)
+            except OSError:
+                continue  # Em uso (Windows) ou ja removido
+            total -= self._shard_sizes[shard]
+            self.stats['evictions'] += self._forget_shards({shard})
+
+    def _remove_legacy_files(self):
+        """Remove o formato antigo (um .npy por embedding em subpastas)"""
+        for folder in self.cache_dir.iterdir():
+            if folder.is_dir() and len(folder.name) == 2:
+                shutil.rmtree(folder, ignore_errors=True)
+
+    def clear(self):
+        """Remove todos os embeddings (memoria e disco)"""
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir is None:
+                return
+            self._close_shard()
+            for shard in self._shards():
+                for suffix in ('.bin', '.idx'):
+                    try:
+                        self._path(shard, suffix).unlink()
+                    except OSError:
+                        pass
+            self._index.clear()
+            self._index_read.clear()
+            self._shard_sizes.clear()
+
+    def close(self):
+        """Fecha o shard aberto para escrita"""
+        with self._lock:
+            self._close_shard()
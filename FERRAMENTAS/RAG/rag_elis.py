@@ -7,16 +7,24 @@ Focado em: ERRO/SOLUÇÃO, Histórico de Sessão e Regras do Sistema
 import json
 import pickle
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, Future
 import hashlib
+import threading
 import sys
 import os
+import numpy as np
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from models.document import RawDocument, ProcessedChunk
+from models.document import RawDocument, ProcessedChunk, SearchResult
 from storage.vector_store import RAGVectorStore
 from processing.document_processor import DocumentProcessor
+from indice_invertido import IndiceInvertido, MotorBM25, fundir_rankings, tokenizar
+from medicao import etapa
+
+# Modos de busca: FAISS, BM25 ou ambos fundidos por Reciprocal Rank Fusion
+MODOS_BUSCA = ('semantico', 'lexico', 'hibrido')
 
 class RAGElis:
     """
@@ -27,14 +35,20 @@ class RAGElis:
     3. Regras do Sistema
     """
     
-    def __init__(self, base_path: str = "rag_elis_storage"):
+    def __init__(self, base_path: str = "rag_elis_storage", modo_busca: str = 'semantico'):
+        if modo_busca not in MODOS_BUSCA:
+            raise ValueError(f"Modo de busca inválido: {modo_busca}")
+        
         self.base_path = Path(base_path)
         self.base_path.mkdir(parents=True, exist_ok=True)
         
         # Inicializar componentes
         self.vector_store = RAGVectorStore({
             'storage_path': str(self.base_path),
-            'embedding_dim': 384
+            'embedding_dim': 384,
+            'wal_enabled': True,  # Registros duraveis sem regravar o indice a cada chamada
+            'checkpoint_every': 50,
+            'checkpoint_interval': 300
         })
         self.document_processor = DocumentProcessor()
         
@@ -42,6 +56,16 @@ class RAGElis:
         self.error_counter = self._load_counter('error_counter')
         self.session_counter = self._load_counter('session_counter')
         self.rule_counter = self._load_counter('rule_counter')
+        
+        # Busca léxica: um índice BM25 por source_type, derivado dos chunks do vector store.
+        # Opcional ('lexico' ou 'hibrido'): os índices são montados na primeira busca
+        self.modo_busca = modo_busca
+        self.pesos_hibridos = [1.0, 1.0]  # Pesos RRF (semântico, léxico)
+        self.profundidade_hibrida = 4  # Candidatos buscados por lado = limite * profundidade
+        self._motores_lexicos = {}  # source_type -> MotorBM25
+        self._versao_lexica = None  # Versão do vector store refletida nos índices léxicos
+        self._lock_lexico = threading.Lock()
+        self._executor_lexico = None
     
     def _load_counter(self, counter_name: str) -> int:
         """Carrega contador de um arquivo"""
@@ -63,6 +87,40 @@ class RAGElis:
         hash_obj = hashlib.md5(content.encode())
         return f"{prefix}_{hash_obj.hexdigest()[:8]}"
     
+    def _registrar_documentos_em_lote(self, documentos: List[RawDocument], contador: str) -> List[str]:
+        """
+        Processa e armazena vários documentos de uma vez
+        
+        Args:
+            documentos: Documentos já montados
+            contador: Nome do contador a incrementar ('error_counter', 'session_counter', 'rule_counter')
+            
+        Returns:
+            Lista com os IDs dos documentos armazenados
+        """
+        # Documentos repetidos no lote (mesmo ID) são processados uma vez
+        unicos = list({documento.document_id: documento for documento in reversed(documentos)}.values())
+        unicos.reverse()
+        if not unicos:
+            return []
+        
+        chunks = self.document_processor.process_documents(unicos)
+        versao_anterior = self.vector_store.version
+        if not chunks or not self.vector_store.add_chunks(chunks):
+            raise Exception("Falha ao processar documentos")
+        self._indexar_lexico_incremental(chunks, versao_anterior)
+        
+        ids_com_chunks = {chunk.document_id for chunk in chunks}
+        doc_ids = [documento.document_id for documento in unicos if documento.document_id in ids_com_chunks]
+        
+        # Incrementar contador uma vez para o lote
+        valor = getattr(self, contador) + len(doc_ids)
+        setattr(self, contador, valor)
+        self._save_counter(contador, valor)
+        
+        print(f"Registrados {len(doc_ids)} documentos em lote")
+        return doc_ids
+    
     # ===== REGISTRO DE ERRO/SOLUÇÃO =====
     
     def registrar_erro_solucao(self, erro: str, solucao: str, contexto: Dict[str, Any] = None) -> str:
@@ -78,38 +136,15 @@ class RAGElis:
             str: ID do registro criado
         """
         try:
-            # Gerar ID único
-            content_for_id = f"{erro}_{solucao}"
-            doc_id = self._generate_id("erro", content_for_id)
-            
-            # Preparar conteúdo estruturado
-            conteudo = f"ERRO: {erro}\n\nSOLUÇÃO: {solucao}"
-            
-            if contexto:
-                conteudo += "\n\nCONTEXTO:\n"
-                for chave, valor in contexto.items():
-                    conteudo += f"- {chave}: {valor}\n"
-            
-            # Criar documento
-            documento = RawDocument(
-                title=f"Erro/Solução #{self.error_counter}",
-                content=conteudo,
-                source_type="erro_solucao",
-                document_id=doc_id,
-                keywords=["erro", "solução", "debug"],
-                source_metadata={
-                    'erro': erro,
-                    'solucao': solucao,
-                    'contexto': contexto or {},
-                    'timestamp': datetime.now().isoformat(),
-                    'tipo': 'erro_solucao'
-                }
-            )
+            documento = self._montar_documento_erro(erro, solucao, contexto, self.error_counter)
+            doc_id = documento.document_id
             
             # Processar e armazenar
             chunks = self.document_processor.process_documents([documento])
             if chunks:
-                self.vector_store.add_chunks(chunks)
+                versao_anterior = self.vector_store.version
+                if self.vector_store.add_chunks(chunks):
+                    self._indexar_lexico_incremental(chunks, versao_anterior)
                 
                 # Incrementar contador
                 self.error_counter += 1
@@ -124,59 +159,101 @@ class RAGElis:
             print(f"Erro ao registrar erro/solução: {e}")
             return ""
     
-    def buscar_solucoes(self, erro_query: str, limite: int = 5) -> List[Dict[str, Any]]:
+    def registrar_erros_em_lote(self, registros: List[Dict[str, Any]]) -> List[str]:
+        """
+        Registra vários pares ERRO/SOLUÇÃO com uma única geração de embeddings
+        
+        Args:
+            registros: Lista de dicionários com 'erro', 'solucao' e 'contexto' (opcional)
+            
+        Returns:
+            Lista com os IDs dos registros criados
+        """
+        try:
+            documentos = [
+                self._montar_documento_erro(
+                    registro.get('erro', ''),
+                    registro.get('solucao', ''),
+                    registro.get('contexto'),
+                    self.error_counter + i
+                )
+                for i, registro in enumerate(registros)
+            ]
+            return self._registrar_documentos_em_lote(documentos, 'error_counter')
+            
+        except Exception as e:
+            print(f"Erro ao registrar erros/soluções em lote: {e}")
+            return []
+    
+    def _montar_documento_erro(self, erro: str, solucao: str, contexto: Dict[str, Any] = None,
+                               numero: int = 0) -> RawDocument:
+        """Monta o documento de um par ERRO/SOLUÇÃO"""
+        # Gerar ID único
+        content_for_id = f"{erro}_{solucao}"
+        doc_id = self._generate_id("erro", content_for_id)
+        
+        # Preparar conteúdo estruturado
+        conteudo = f"ERRO: {erro}\n\nSOLUÇÃO: {solucao}"
+        
+        if contexto:
+            conteudo += "\n\nCONTEXTO:\n"
+            for chave, valor in contexto.items():
+                conteudo += f"- {chave}: {valor}\n"
+        
+        return RawDocument(
+            title=f"Erro/Solução #{numero}",
+            content=conteudo,
+            source_type="erro_solucao",
+            document_id=doc_id,
+            keywords=["erro", "solução", "debug"],
+            source_metadata={
+                'erro': erro,
+                'solucao': solucao,
+                'contexto': contexto or {},
+                'timestamp': datetime.now().isoformat(),
+                'tipo': 'erro_solucao'
+            }
+        )
+    
+    def buscar_solucoes(self, erro_query: str, limite: int = 5, modo: str = None) -> List[Dict[str, Any]]:
         """
         Busca soluções para um erro específico
         
         Args:
             erro_query: Descrição do erro para buscar
             limite: Número máximo de resultados
+            modo: 'semantico', 'lexico' ou 'hibrido' (padrão: self.modo_busca)
             
         Returns:
             Lista de soluções encontradas
         """
         try:
-            # Processar query
-            query_doc = RawDocument(
-                title="Query",
-                content=erro_query,
-                source_type="query",
-                document_id="temp_query"
-            )
-            
-            query_chunks = self.document_processor.process_documents([query_doc])
-            if not query_chunks or not query_chunks[0].embedding:
-                return []
-            
-            # Buscar no vector store
-            resultados = self.vector_store.search(
-                query_chunks[0].embedding,
-                top_k=limite,
-                filters={'source_type': 'erro_solucao'}
+            resultados = self._buscar_por_tipo(
+                erro_query, {'source_type': 'erro_solucao'}, limite, modo or self.modo_busca
             )
             
             # Formatar resultados
-            solucoes = []
-            for resultado in resultados:
-                chunk = resultado.chunk
-                metadata = chunk.source_metadata
-                
-                solucoes.append({
-                    'id': chunk.document_id,
-                    'erro': metadata.get('erro', ''),
-                    'solucao': metadata.get('solucao', ''),
-                    'contexto': metadata.get('contexto', {}),
-                    'timestamp': metadata.get('timestamp', ''),
-                    'score': resultado.score,
-                    'conteudo_completo': chunk.content
-                })
-            
-            return solucoes
+            return [self._formatar_solucao(resultado) for resultado in resultados]
             
         except Exception as e:
             print(f"Erro ao buscar soluções: {e}")
             return []
     
+    def _formatar_solucao(self, resultado) -> Dict[str, Any]:
+        """Converte SearchResult de erro/solução no formato de resposta"""
+        chunk = resultado.chunk
+        metadata = chunk.source_metadata
+        
+        return {
+            'id': chunk.document_id,
+            'erro': metadata.get('erro', ''),
+            'solucao': metadata.get('solucao', ''),
+            'contexto': metadata.get('contexto', {}),
+            'timestamp': metadata.get('timestamp', ''),
+            'score': resultado.score,
+            'conteudo_completo': chunk.content
+        }
+    
     # ===== HISTÓRICO DE SESSÃO =====
     
     def registrar_sessao(self, sessao_id: str, acao: str, detalhes: Dict[str, Any] = None) -> str:
@@ -192,38 +269,15 @@ class RAGElis:
             str: ID do registro criado
         """
         try:
-            # Gerar ID único
-            content_for_id = f"{sessao_id}_{acao}_{datetime.now().isoformat()}"
-            doc_id = self._generate_id("sessao", content_for_id)
-            
-            # Preparar conteúdo
-            conteudo = f"SESSÃO: {sessao_id}\n\nAÇÃO: {acao}\n\nTIMESTAMP: {datetime.now().isoformat()}"
-            
-            if detalhes:
-                conteudo += "\n\nDETALHES:\n"
-                for chave, valor in detalhes.items():
-                    conteudo += f"- {chave}: {valor}\n"
-            
-            # Criar documento
-            documento = RawDocument(
-                title=f"Sessão {sessao_id} - {acao}",
-                content=conteudo,
-                source_type="historico_sessao",
-                document_id=doc_id,
-                keywords=["sessão", "histórico", acao],
-                source_metadata={
-                    'sessao_id': sessao_id,
-                    'acao': acao,
-                    'detalhes': detalhes or {},
-                    'timestamp': datetime.now().isoformat(),
-                    'tipo': 'historico_sessao'
-                }
-            )
+            documento = self._montar_documento_sessao(sessao_id, acao, detalhes, self.session_counter)
+            doc_id = documento.document_id
             
             # Processar e armazenar
             chunks = self.document_processor.process_documents([documento])
             if chunks:
-                self.vector_store.add_chunks(chunks)
+                versao_anterior = self.vector_store.version
+                if self.vector_store.add_chunks(chunks):
+                    self._indexar_lexico_incremental(chunks, versao_anterior)
                 
                 # Incrementar contador
                 self.session_counter += 1
@@ -238,6 +292,68 @@ class RAGElis:
             print(f"Erro ao registrar sessão: {e}")
             return ""
     
+    def registrar_sessoes_em_lote(self, registros: List[Dict[str, Any]]) -> List[str]:
+        """
+        Registra várias ações de sessão com uma única geração de embeddings
+        
+        Args:
+            registros: Lista de dicionários com 'sessao_id', 'acao' e 'detalhes' (opcional)
+            
+        Returns:
+            Lista com os IDs dos registros criados
+        """
+        try:
+            documentos = [
+                self._montar_documento_sessao(
+                    registro.get('sessao_id', ''),
+                    registro.get('acao', ''),
+                    registro.get('detalhes'),
+                    self.session_counter + i
+                )
+                for i, registro in enumerate(registros)
+            ]
+            return self._registrar_documentos_em_lote(documentos, 'session_counter')
+            
+        except Exception as e:
+            print(f"Erro ao registrar sessões em lote: {e}")
+            return []
+    
+    def _montar_documento_sessao(self, sessao_id: str, acao: str, detalhes: Dict[str, Any] = None,
+                                 numero: int = 0) -> RawDocument:
+        """Monta o documento de uma ação de sessão
+        
+        O número (session_counter) diferencia ações idênticas registradas no
+        mesmo instante, avulsas ou em lote.
+        """
+        timestamp = datetime.now().isoformat()
+        
+        # Gerar ID único
+        content_for_id = f"{sessao_id}_{acao}_{timestamp}_{numero}"
+        doc_id = self._generate_id("sessao", content_for_id)
+        
+        # Preparar conteúdo
+        conteudo = f"SESSÃO: {sessao_id}\n\nAÇÃO: {acao}\n\nTIMESTAMP: {timestamp}"
+        
+        if detalhes:
+            conteudo += "\n\nDETALHES:\n"
+            for chave, valor in detalhes.items():
+                conteudo += f"- {chave}: {valor}\n"
+        
+        return RawDocument(
+            title=f"Sessão {sessao_id} - {acao}",
+            content=conteudo,
+            source_type="historico_sessao",
+            document_id=doc_id,
+            keywords=["sessão", "histórico", acao],
+            source_metadata={
+                'sessao_id': sessao_id,
+                'acao': acao,
+                'detalhes': detalhes or {},
+                'timestamp': timestamp,
+                'tipo': 'historico_sessao'
+            }
+        )
+    
     def buscar_historico_sessao(self, sessao_id: str = None, acao: str = None, limite: int = 10) -> List[Dict[str, Any]]:
         """
         Busca no histórico de sessões
@@ -252,69 +368,68 @@ class RAGElis:
         """
         try:
             # Construir query
-            query_parts = []
-            if sessao_id:
-                query_parts.append(f"sessão {sessao_id}")
-            if acao:
-                query_parts.append(f"ação {acao}")
-            
-            if not query_parts:
-                query_parts.append("histórico sessão")
-            
-            query_text = " ".join(query_parts)
+            query_text = self._montar_query_historico(sessao_id, acao)
             
-            # Processar query
-            query_doc = RawDocument(
-                title="Query",
-                content=query_text,
-                source_type="query",
-                document_id="temp_query"
-            )
-            
-            query_chunks = self.document_processor.process_documents([query_doc])
-            if not query_chunks or not query_chunks[0].embedding:
-                return []
+            # Gerar embedding da query
+            query_embedding = self.document_processor.embed_query(query_text)
             
             # Buscar no vector store
             resultados = self.vector_store.search(
-                query_chunks[0].embedding,
+                query_embedding,
                 top_k=limite,
                 filters={'source_type': 'historico_sessao'}
             )
             
             # Formatar resultados
-            historico = []
-            for resultado in resultados:
-                chunk = resultado.chunk
-                metadata = chunk.source_metadata
-                
-                # Filtrar por sessão se especificado
-                if sessao_id and metadata.get('sessao_id') != sessao_id:
-                    continue
-                
-                # Filtrar por ação se especificado
-                if acao and metadata.get('acao') != acao:
-                    continue
-                
-                historico.append({
-                    'id': chunk.document_id,
-                    'sessao_id': metadata.get('sessao_id', ''),
-                    'acao': metadata.get('acao', ''),
-                    'detalhes': metadata.get('detalhes', {}),
-                    'timestamp': metadata.get('timestamp', ''),
-                    'score': resultado.score,
-                    'conteudo_completo': chunk.content
-                })
-            
-            # Ordenar por timestamp (mais recente primeiro)
-            historico.sort(key=lambda x: x['timestamp'], reverse=True)
-            
-            return historico
+            return self._formatar_historico(resultados, sessao_id, acao)
             
         except Exception as e:
             print(f"Erro ao buscar histórico: {e}")
             return []
     
+    def _montar_query_historico(self, sessao_id: str = None, acao: str = None) -> str:
+        """Monta o texto de busca usado para o histórico de sessão"""
+        query_parts = []
+        if sessao_id:
+            query_parts.append(f"sessão {sessao_id}")
+        if acao:
+            query_parts.append(f"ação {acao}")
+        
+        if not query_parts:
+            query_parts.append("histórico sessão")
+        
+        return " ".join(query_parts)
+    
+    def _formatar_historico(self, resultados, sessao_id: str = None, acao: str = None) -> List[Dict[str, Any]]:
+        """Filtra por sessão/ação e formata resultados do histórico (mais recente primeiro)"""
+        historico = []
+        for resultado in resultados:
+            chunk = resultado.chunk
+            metadata = chunk.source_metadata
+            
+            # Filtrar por sessão se especificado
+            if sessao_id and metadata.get('sessao_id') != sessao_id:
+                continue
+            
+            # Filtrar por ação se especificado
+            if acao and metadata.get('acao') != acao:
+                continue
+            
+            historico.append({
+                'id': chunk.document_id,
+                'sessao_id': metadata.get('sessao_id', ''),
+                'acao': metadata.get('acao', ''),
+                'detalhes': metadata.get('detalhes', {}),
+                'timestamp': metadata.get('timestamp', ''),
+                'score': resultado.score,
+                'conteudo_completo': chunk.content
+            })
+        
+        # Ordenar por timestamp (mais recente primeiro)
+        historico.sort(key=lambda x: x['timestamp'], reverse=True)
+        
+        return historico
+    
     # ===== REGRAS DO SISTEMA =====
     
     def registrar_regra(self, titulo: str, descricao: str, categoria: str = "geral", 
@@ -333,41 +448,15 @@ class RAGElis:
             str: ID da regra criada
         """
         try:
-            # Gerar ID único
-            content_for_id = f"{titulo}_{categoria}"
-            doc_id = self._generate_id("regra", content_for_id)
-            
-            # Preparar conteúdo estruturado
-            conteudo = f"REGRA: {titulo}\n\nCATEGORIA: {categoria}\n\nDESCRIÇÃO: {descricao}"
-            
-            if aplicacao:
-                conteudo += f"\n\nAPLICAÇÃO: {aplicacao}"
-            
-            if validacao:
-                conteudo += f"\n\nVALIDAÇÃO: {validacao}"
-            
-            # Criar documento
-            documento = RawDocument(
-                title=f"Regra: {titulo}",
-                content=conteudo,
-                source_type="regra_sistema",
-                document_id=doc_id,
-                keywords=["regra", categoria, "sistema"],
-                source_metadata={
-                    'titulo': titulo,
-                    'descricao': descricao,
-                    'categoria': categoria,
-                    'aplicacao': aplicacao,
-                    'validacao': validacao,
-                    'timestamp': datetime.now().isoformat(),
-                    'tipo': 'regra_sistema'
-                }
-            )
+            documento = self._montar_documento_regra(titulo, descricao, categoria, aplicacao, validacao)
+            doc_id = documento.document_id
             
             # Processar e armazenar
             chunks = self.document_processor.process_documents([documento])
             if chunks:
-                self.vector_store.add_chunks(chunks)
+                versao_anterior = self.vector_store.version
+                if self.vector_store.add_chunks(chunks):
+                    self._indexar_lexico_incremental(chunks, versao_anterior)
                 
                 # Incrementar contador
                 self.rule_counter += 1
@@ -382,7 +471,73 @@ class RAGElis:
             print(f"Erro ao registrar regra: {e}")
             return ""
     
-    def buscar_regras(self, query: str, categoria: str = None, limite: int = 5) -> List[Dict[str, Any]]:
+    def registrar_regras_em_lote(self, regras: List[Dict[str, Any]]) -> List[str]:
+        """
+        Registra várias regras com uma única geração de embeddings
+        
+        Todas as regras são divididas em chunks, os embeddings são gerados
+        em lotes (batch_size do DocumentProcessor) e o índice recebe uma
+        única inserção.
+        
+        Args:
+            regras: Lista de dicionários com 'titulo', 'descricao' e, opcionalmente,
+                'categoria', 'aplicacao' e 'validacao'
+            
+        Returns:
+            Lista com os IDs das regras criadas
+        """
+        try:
+            documentos = [
+                self._montar_documento_regra(
+                    regra.get('titulo', f"Regra {i+1}"),
+                    regra.get('descricao', ''),
+                    regra.get('categoria', 'geral'),
+                    regra.get('aplicacao', ''),
+                    regra.get('validacao', '')
+                )
+                for i, regra in enumerate(regras)
+            ]
+            return self._registrar_documentos_em_lote(documentos, 'rule_counter')
+            
+        except Exception as e:
+            print(f"Erro ao registrar regras em lote: {e}")
+            return []
+    
+    def _montar_documento_regra(self, titulo: str, descricao: str, categoria: str = "geral",
+                                aplicacao: str = "", validacao: str = "") -> RawDocument:
+        """Monta o documento de uma regra do sistema"""
+        # Gerar ID único
+        content_for_id = f"{titulo}_{categoria}"
+        doc_id = self._generate_id("regra", content_for_id)
+        
+        # Preparar conteúdo estruturado
+        conteudo = f"REGRA: {titulo}\n\nCATEGORIA: {categoria}\n\nDESCRIÇÃO: {descricao}"
+        
+        if aplicacao:
+            conteudo += f"\n\nAPLICAÇÃO: {aplicacao}"
+        
+        if validacao:
+            conteudo += f"\n\nVALIDAÇÃO: {validacao}"
+        
+        return RawDocument(
+            title=f"Regra: {titulo}",
+            content=conteudo,
+            source_type="regra_sistema",
+            document_id=doc_id,
+            keywords=["regra", categoria, "sistema"],
+            source_metadata={
+                'titulo': titulo,
+                'descricao': descricao,
+                'categoria': categoria,
+                'aplicacao': aplicacao,
+                'validacao': validacao,
+                'timestamp': datetime.now().isoformat(),
+                'tipo': 'regra_sistema'
+            }
+        )
+    
+    def buscar_regras(self, query: str, categoria: str = None, limite: int = 5,
+                      modo: str = None) -> List[Dict[str, Any]]:
         """
         Busca regras do sistema
         
@@ -390,58 +545,279 @@ class RAGElis:
             query: Termo de busca
             categoria: Categoria específica (opcional)
             limite: Número máximo de resultados
+            modo: 'semantico', 'lexico' ou 'hibrido' (padrão: self.modo_busca)
             
         Returns:
             Lista de regras encontradas
         """
         try:
-            # Processar query
-            query_doc = RawDocument(
-                title="Query",
-                content=query,
-                source_type="query",
-                document_id="temp_query"
-            )
-            
-            query_chunks = self.document_processor.process_documents([query_doc])
-            if not query_chunks or not query_chunks[0].embedding:
-                return []
-            
-            # Buscar no vector store
             filtros = {'source_type': 'regra_sistema'}
             if categoria:
                 filtros['categoria'] = categoria
             
-            resultados = self.vector_store.search(
-                query_chunks[0].embedding,
-                top_k=limite,
-                filters=filtros
-            )
+            resultados = self._buscar_por_tipo(query, filtros, limite, modo or self.modo_busca)
             
             # Formatar resultados
-            regras = []
-            for resultado in resultados:
-                chunk = resultado.chunk
-                metadata = chunk.source_metadata
-                
-                regras.append({
-                    'id': chunk.document_id,
-                    'titulo': metadata.get('titulo', ''),
-                    'descricao': metadata.get('descricao', ''),
-                    'categoria': metadata.get('categoria', ''),
-                    'aplicacao': metadata.get('aplicacao', ''),
-                    'validacao': metadata.get('validacao', ''),
-                    'timestamp': metadata.get('timestamp', ''),
-                    'score': resultado.score,
-                    'conteudo_completo': chunk.content
-                })
-            
-            return regras
+            return [self._formatar_regra(resultado) for resultado in resultados]
             
         except Exception as e:
             print(f"Erro ao buscar regras: {e}")
             return []
     
+    def _formatar_regra(self, resultado) -> Dict[str, Any]:
+        """Converte SearchResult de regra no formato de resposta"""
+        chunk = resultado.chunk
+        metadata = chunk.source_metadata
+        
+        return {
+            'id': chunk.document_id,
+            'titulo': metadata.get('titulo', ''),
+            'descricao': metadata.get('descricao', ''),
+            'categoria': metadata.get('categoria', ''),
+            'aplicacao': metadata.get('aplicacao', ''),
+            'validacao': metadata.get('validacao', ''),
+            'timestamp': metadata.get('timestamp', ''),
+            'score': resultado.score,
+            'conteudo_completo': chunk.content
+        }
+    
+    # ===== BUSCA UNIFICADA =====
+    
+    def buscar_contexto(self, query: str = "", sessao_id: str = None,
+                        limite_regras: int = 5, limite_historico: int = 10,
+                        limite_solucoes: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Busca regras, histórico de sessão e soluções em uma única passada
+        
+        As queries são codificadas em uma única chamada ao modelo e o índice
+        FAISS é consultado uma vez, com os resultados separados por tipo.
+        Regras e soluções usam a query; o histórico só é buscado com sessao_id.
+        
+        Args:
+            query: Texto de busca para regras e soluções
+            sessao_id: ID da sessão para o histórico (opcional)
+            limite_regras: Máximo de regras
+            limite_historico: Máximo de registros de histórico
+            limite_solucoes: Máximo de soluções
+            
+        Returns:
+            Dict com listas 'regras', 'historico_sessao' e 'solucoes'
+        """
+        contexto = {'regras': [], 'historico_sessao': [], 'solucoes': []}
+        
+        try:
+            textos = []
+            top_k_por_tipo = {}
+            linha_por_tipo = {}
+            busca_lexica = None
+            limites = {'regra_sistema': limite_regras, 'erro_solucao': limite_solucoes}
+            
+            if query:
+                textos.append(query)
+                linha_por_tipo['regra_sistema'] = 0
+                linha_por_tipo['erro_solucao'] = 0
+                
+                if self.modo_busca == 'semantico':
+                    top_k_por_tipo.update(limites)
+                else:
+                    # BM25 roda em paralelo com a codificação da query e a busca FAISS
+                    profundidades = {tipo: self._profundidade(limite) for tipo, limite in limites.items()}
+                    busca_lexica = self._iniciar_busca_lexica(tokenizar(query), profundidades)
+                    if self.modo_busca == 'hibrido':
+                        top_k_por_tipo.update(profundidades)
+            
+            if sessao_id:
+                textos.append(self._montar_query_historico(sessao_id))
+                top_k_por_tipo['historico_sessao'] = limite_historico
+                linha_por_tipo['historico_sessao'] = len(textos) - 1
+            
+            if not textos:
+                return contexto
+            
+            resultados = {}
+            if top_k_por_tipo:
+                # Uma única chamada ao modelo para todas as queries
+                with etapa('embed'):
+                    embeddings = self.document_processor.embed_queries(textos)
+                
+                # Uma única busca FAISS, separada por source_type
+                with etapa('search'):
+                    resultados = self.vector_store.search_by_source_type(
+                        embeddings, top_k_por_tipo, linha_por_tipo
+                    )
+            
+            if busca_lexica is not None:
+                with etapa('search'):
+                    lexicos = busca_lexica.result()
+                    for tipo, limite in limites.items():
+                        resultados[tipo] = self._fundir_resultados(
+                            query, resultados.get(tipo, []), lexicos[tipo], limite,
+                            embeddings[linha_por_tipo[tipo]] if self.modo_busca == 'hibrido' else None
+                        )
+            
+            with etapa('format'):
+                contexto['regras'] = [self._formatar_regra(r) for r in resultados.get('regra_sistema', [])]
+                contexto['solucoes'] = [self._formatar_solucao(r) for r in resultados.get('erro_solucao', [])]
+                contexto['historico_sessao'] = self._formatar_historico(
+                    resultados.get('historico_sessao', []), sessao_id
+                )
+            
+            return contexto
+            
+        except Exception as e:
+            print(f"Erro na busca unificada: {e}")
+            return contexto
+    
+    # ===== BUSCA LÉXICA E HÍBRIDA =====
+    
+    def _buscar_por_tipo(self, query: str, filtros: Dict[str, Any], limite: int,
+                         modo: str) -> List[SearchResult]:
+        """
+        Busca de um tipo de registro no modo pedido
+        
+        No modo híbrido o BM25 roda em uma thread enquanto a query é
+        codificada e o FAISS é consultado; os dois rankings são fundidos
+        por RRF.
+        """
+        if modo not in MODOS_BUSCA:
+            raise ValueError(f"Modo de busca inválido: {modo}")
+        
+        if modo == 'semantico':
+            query_embedding = self.document_processor.embed_query(query)
+            return self.vector_store.search(query_embedding, top_k=limite, filters=filtros)
+        
+        tipo = filtros['source_type']
+        profundidade = self._profundidade(limite)
+        busca_lexica = self._iniciar_busca_lexica(tokenizar(query), {tipo: profundidade})
+        
+        semanticos = []
+        query_embedding = None
+        if modo == 'hibrido':
+            query_embedding = self.document_processor.embed_query(query)
+            semanticos = self.vector_store.search(query_embedding, top_k=profundidade, filters=filtros)
+        
+        return self._fundir_resultados(query, semanticos, busca_lexica.result()[tipo], limite, query_embedding)
+    
+    def _profundidade(self, limite: int) -> int:
+        """Candidatos buscados em cada lado antes da fusão"""
+        return max(limite * self.profundidade_hibrida, 20)
+    
+    def _iniciar_busca_lexica(self, termos: List[str], limites_por_tipo: Dict[str, int]) -> Future:
+        """
+        Dispara a busca BM25 em segundo plano
+        
+        Returns:
+            Future com dicionário source_type -> lista de (chunk_id, score)
+        """
+        self._sincronizar_indice_lexico()
+        if self._executor_lexico is None:
+            self._executor_lexico = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rag-elis-bm25')
+        
+        def buscar():
+            with self._lock_lexico:
+                resultados = {}
+                for tipo, limite in limites_por_tipo.items():
+                    motor = self._motores_lexicos.get(tipo)
+                    resultados[tipo] = motor.buscar(termos, limite) if motor and termos else []
+                return resultados
+        
+        return self._executor_lexico.submit(buscar)
+    
+    def _fundir_resultados(self, query: str, semanticos: List[SearchResult],
+                           lexicos: List[Tuple[str, float]], limite: int,
+                           query_embedding: Optional[np.ndarray] = None) -> List[SearchResult]:
+        """
+        Funde os rankings semântico e léxico (RRF) em uma lista de SearchResult
+        
+        A ordem é a do RRF (em search_metadata['score_rrf']); o score continua
+        sendo a similaridade de cosseno com a query. Com query_embedding, os
+        chunks encontrados só pelo BM25 recebem o cosseno calculado aqui e
+        passam pelo mesmo similarity_threshold da busca semântica; sem ele
+        (modo léxico), o score é o do BM25.
+        """
+        por_id = {resultado.chunk.chunk_id: resultado for resultado in semanticos}
+        scores_lexicos = dict(lexicos)
+        
+        fundidos = fundir_rankings(
+            [list(por_id), [chunk_id for chunk_id, _ in lexicos]],
+            pesos=self.pesos_hibridos
+        )
+        
+        if query_embedding is not None:
+            query_embedding = np.asarray(query_embedding, dtype='float32').ravel()
+            query_embedding = query_embedding / (np.linalg.norm(query_embedding) or 1.0)
+        
+        resultados = []
+        for chunk_id, score_rrf in fundidos:
+            if len(resultados) >= limite:
+                break
+            
+            semantico = por_id.get(chunk_id)
+            chunk = semantico.chunk if semantico else self.vector_store.get_chunk_by_id(chunk_id)
+            if chunk is None:
+                continue
+            
+            if semantico:
+                score = semantico.score
+            elif query_embedding is not None:
+                score = self._similaridade(query_embedding, chunk)
+                if score < self.vector_store.similarity_threshold:
+                    continue
+            else:
+                score = scores_lexicos[chunk_id]
+            
+            resultados.append(SearchResult(
+                chunk=chunk,
+                score=score,
+                query=query,
+                rank=len(resultados) + 1,
+                search_type='hybrid' if semanticos else 'keyword',
+                search_metadata={
+                    'score_rrf': score_rrf,
+                    'score_semantico': semantico.score if semantico else None,
+                    'score_lexico': scores_lexicos.get(chunk_id)
+                }
+            ))
+        
+        return resultados
+    
+    @staticmethod
+    def _similaridade(query_embedding: np.ndarray, chunk: ProcessedChunk) -> float:
+        """Cosseno entre a query (já normalizada) e o embedding do chunk"""
+        if chunk.embedding is None:
+            return 0.0
+        embedding = np.asarray(chunk.embedding, dtype='float32').ravel()
+        norma = np.linalg.norm(embedding)
+        return float(np.dot(query_embedding, embedding) / norma) if norma else 0.0
+    
+    def _indexar_lexico(self, chunk: ProcessedChunk):
+        """Adiciona um chunk ao índice BM25 do seu source_type"""
+        motor = self._motores_lexicos.get(chunk.source_type)
+        if motor is None:
+            motor = self._motores_lexicos[chunk.source_type] = MotorBM25(IndiceInvertido(['conteudo']))
+        motor.indice.adicionar(chunk.chunk_id, {'conteudo': chunk.content})
+    
+    def _indexar_lexico_incremental(self, chunks: List[ProcessedChunk], versao_anterior: int):
+        """Indexa chunks recém-adicionados se os índices léxicos estavam em dia"""
+        with self._lock_lexico:
+            if self._versao_lexica != versao_anterior:
+                return  # Será reconstruído na próxima busca
+            for chunk in chunks:
+                self._indexar_lexico(chunk)
+            self._versao_lexica = self.vector_store.version
+    
+    def _sincronizar_indice_lexico(self):
+        """Reconstrói os índices BM25 se o vector store mudou (recarga, remoção, limpeza)"""
+        with self._lock_lexico:
+            if self._versao_lexica == self.vector_store.version:
+                return
+            
+            self._motores_lexicos = {}
+            for chunk in self.vector_store.iter_chunks():
+                if chunk is not None:
+                    self._indexar_lexico(chunk)
+            self._versao_lexica = self.vector_store.version
+    
     def migrar_regras_existentes(self, arquivo_regras: str) -> int:
         """
         Migra regras existentes de um arquivo para o RAG
@@ -471,7 +847,7 @@ class RAGElis:
                 # Tratar como uma única regra
                 regras_texto = [conteudo]
             
-            migradas = 0
+            regras = []
             for i, regra_texto in enumerate(regras_texto):
                 regra_texto = regra_texto.strip()
                 if not regra_texto:
@@ -482,9 +858,10 @@ class RAGElis:
                 titulo = linhas[0].strip() if linhas else f"Regra {i+1}"
                 descricao = '\n'.join(linhas[1:]).strip() if len(linhas) > 1 else regra_texto
                 
-                # Registrar regra
-                if self.registrar_regra(titulo, descricao, "migrada"):
-                    migradas += 1
+                regras.append({'titulo': titulo, 'descricao': descricao, 'categoria': "migrada"})
+            
+            # Registrar todas as regras de uma vez
+            migradas = len(self.registrar_regras_em_lote(regras))
             
             print(f"Migradas {migradas} regras de {arquivo_regras}")
             return migradas
@@ -508,13 +885,12 @@ class RAGElis:
             # Contar por tipo
             tipos = {'erro_solucao': 0, 'historico_sessao': 0, 'regra_sistema': 0}
             
-            for chunk in self.vector_store.chunks:
-                source_type = chunk.source_type
+            for source_type, total in stats_vector.get('source_distribution', {}).items():
                 if source_type in tipos:
-                    tipos[source_type] += 1
+                    tipos[source_type] = total
             
             return {
-                'total_registros': len(self.vector_store.chunks),
+                'total_registros': self.vector_store.chunk_count,
                 'por_tipo': tipos,
                 'contadores': {
                     'erro_counter': self.error_counter,
@@ -556,9 +932,65 @@ class RAGElis:
             print(f"Erro ao limpar sistema: {e}")
             return False
     
+    @property
+    def versao(self) -> int:
+        """
+        Versão do armazenamento: cresce a cada registro, remoção ou recarga
+
+        Permite a quem guarda resultados de busca detectar que ficaram velhos.
+        """
+        return self.vector_store.version
+
+    def recarregar(self) -> bool:
+        """
+        Recarrega índice, chunks e contadores do disco
+        
+        O modelo de embeddings já carregado é mantido.
+        
+        Returns:
+            bool: True se o índice foi carregado
+        """
+        carregado = self.vector_store.reload()
+        self._recarregar_contadores()
+        return carregado
+    
+    def recarregar_se_alterado(self) -> bool:
+        """
+        Recarrega o armazenamento apenas se os arquivos mudaram no disco
+        
+        Returns:
+            bool: True se houve recarga
+        """
+        if self.vector_store.reload_if_changed():
+            self._recarregar_contadores()
+            return True
+        return False
+    
+    def _recarregar_contadores(self):
+        """Relê os contadores persistidos"""
+        self.error_counter = self._load_counter('error_counter')
+        self.session_counter = self._load_counter('session_counter')
+        self.rule_counter = self._load_counter('rule_counter')
+    
+    def salvar(self) -> bool:
+        """
+        Força um checkpoint: grava índice e chunks e esvazia o log de escrita
+        
+        Os registros já são duráveis pelo log; o checkpoint apenas limita o
+        tamanho do log e o tempo de recuperação na próxima carga.
+        
+        Returns:
+            bool: True se o checkpoint foi gravado
+        """
+        return self.vector_store.checkpoint()
+    
     def fechar(self):
         """
         Fecha o sistema RAG ELIS
         """
+        self.salvar()
+        if self._executor_lexico is not None:
+            self._executor_lexico.shutdown(wait=True)
+            self._executor_lexico = None
         self.vector_store.close()
         print("Sistema RAG ELIS fechado")
\ No newline at end of file
@@ -18,15 +18,43 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.document import RawDocument, ProcessedChunk, SearchResult
 from storage.file_store import FileStore
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from indice_invertido import IndiceArmazenado, MotorBM25, MinHash, CHAVE_MINHASH
+from indice_ordenado import valor_ordenavel
+
+# Campos dos índices invertidos
+CAMPOS_DOCUMENTO = ['titulo', 'conteudo', 'resumo', 'autor', 'fonte']
+CAMPOS_CHUNK = ['conteudo']
+# Valores dos resumos de documentos com índice ordenado (consultas por intervalo)
+CAMPOS_ORDENADOS = ['data_coleta', 'data_publicacao', 'tamanho', 'qualidade']
+
 class RAGFileManager:
     """
     Gerenciador CRUD completo para sistema RAG baseado em arquivos
     Fornece operações intuitivas: Create, Read, Update, Delete, Search
     """
     
-    def __init__(self, base_path: str = "rag_storage"):
+    def __init__(self, base_path: str = "rag_storage", config: Optional[Dict[str, Any]] = None):
         self.base_path = Path(base_path)
-        self.file_store = FileStore(base_path)
+        self.config = config or {}
+        self.file_store = FileStore(base_path, config)
+        
+        # Assinaturas MinHash calculadas na gravação de cada documento
+        self.minhash = MinHash()
+        # Similaridade a partir da qual criar_documento considera o conteúdo duplicado (None desativa)
+        self.limiar_duplicados = self.config.get('limiar_duplicados')
+        
+        # Índices invertidos atualizados a cada gravação/exclusão no FileStore
+        self.indice_documentos = IndiceArmazenado(
+            self.file_store, 'documents', CAMPOS_DOCUMENTO, self._extrair_documento,
+            self.file_store.base_path / "indice_documentos.pkl"
+        )
+        self.indice_chunks = IndiceArmazenado(
+            self.file_store, 'chunks', CAMPOS_CHUNK, self._extrair_chunk,
+            self.file_store.base_path / "indice_chunks.pkl"
+        )
+        self.bm25_documentos = MotorBM25(self.indice_documentos.indice)
+        self.bm25_chunks = MotorBM25(self.indice_chunks.indice)
         
     # ===== OPERAÇÕES CREATE (Criar) =====
     
@@ -43,6 +71,12 @@ class RAGFileManager:
         Returns:
             str: ID do documento criado
         """
+        if self.limiar_duplicados is not None:
+            duplicados = self.encontrar_duplicados(conteudo, self.limiar_duplicados, limite=1)
+            if duplicados:
+                print(f"Documento duplicado de {duplicados[0][0]} (similaridade {duplicados[0][1]:.2f}): {titulo}")
+                return duplicados[0][0]
+        
         # Gerar ID único
         doc_id = f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{hash(titulo) % 10000}"
         
@@ -290,20 +324,8 @@ class RAGFileManager:
                 chunks_excluidos = self.excluir_chunks_por_documento(doc_id)
                 print(f"Chunks excluídos: {chunks_excluidos}")
             
-            # Excluir arquivo do documento
-            metadata = self.file_store._load_metadata()
-            filename = metadata["document_index"].get(doc_id)
-            
-            if filename:
-                filepath = self.file_store.docs_dir / filename
-                if filepath.exists():
-                    filepath.unlink()
-                
-                # Atualizar metadata
-                del metadata["document_index"][doc_id]
-                metadata["total_documents"] = len(metadata["document_index"])
-                self.file_store._save_metadata(metadata)
-                
+            # Excluir arquivo do documento (índice atualizado via journal)
+            if self.file_store.delete_document(doc_id):
                 print(f"Documento excluído: {doc_id}")
                 return True
             else:
@@ -325,20 +347,8 @@ class RAGFileManager:
             bool: True se excluído com sucesso
         """
         try:
-            # Excluir arquivo do chunk
-            metadata = self.file_store._load_metadata()
-            filename = metadata["chunk_index"].get(chunk_id)
-            
-            if filename:
-                filepath = self.file_store.chunks_dir / filename
-                if filepath.exists():
-                    filepath.unlink()
-                
-                # Atualizar metadata
-                del metadata["chunk_index"][chunk_id]
-                metadata["total_chunks"] = len(metadata["chunk_index"])
-                self.file_store._save_metadata(metadata)
-                
+            # Excluir arquivo do chunk (índice atualizado via journal)
+            if self.file_store.delete_chunk(chunk_id):
                 print(f"Chunk excluído: {chunk_id}")
                 return True
             else:
@@ -368,19 +378,14 @@ class RAGFileManager:
             if chunk and chunk.document_id == doc_id:
                 chunks_para_excluir.append(chunk_id)
         
-        # Excluir chunks
-        excluidos = 0
-        for chunk_id in chunks_para_excluir:
-            if self.excluir_chunk(chunk_id):
-                excluidos += 1
-        
-        return excluidos
+        # Excluir chunks (uma única entrada no journal)
+        return self.file_store.delete_chunks(chunks_para_excluir)
     
     # ===== OPERAÇÕES SEARCH (Buscar) =====
     
     def buscar_documentos(self, termo: str, campo: str = 'titulo', limite: int = 10) -> List[Dict[str, Any]]:
         """
-        Busca documentos por termo em campo específico
+        Busca documentos por termo em campo específico, ranqueados por BM25
         
         Args:
             termo: Termo de busca
@@ -390,47 +395,27 @@ class RAGFileManager:
         Returns:
             Lista de documentos encontrados
         """
-        resultados = []
-        metadata = self.file_store._load_metadata()
+        indice = self.indice_documentos.sincronizar()
+        if campo not in CAMPOS_DOCUMENTO:
+            return []
         
-        count = 0
-        for doc_id in metadata["document_index"]:
-            if count >= limite:
-                break
-                
-            doc = self.ler_documento(doc_id)
-            if not doc:
-                continue
-            
-            # Verificar se o termo está no campo especificado
-            encontrado = False
-            termo_lower = termo.lower()
-            
-            if campo == 'titulo' and termo_lower in doc.title.lower():
-                encontrado = True
-            elif campo == 'conteudo' and termo_lower in doc.content.lower():
-                encontrado = True
-            elif campo == 'fonte' and termo_lower in doc.source_type.lower():
-                encontrado = True
-            elif campo == 'autor' and any(termo_lower in autor.lower() for autor in doc.authors):
-                encontrado = True
-            
-            if encontrado:
-                resultados.append({
-                    'id': doc.document_id,
-                    'titulo': doc.title,
-                    'fonte': doc.source_type,
-                    'preview': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                    'score': 1.0,  # Score simples para busca textual
-                    'url': doc.url
-                })
-                count += 1
+        resultados = []
+        for doc_id, score in self.bm25_documentos.buscar(termo, limite, [campo]):
+            resumo = indice.resumos[doc_id]
+            resultados.append({
+                'id': doc_id,
+                'titulo': resumo['titulo'],
+                'fonte': resumo['fonte'],
+                'preview': resumo['preview'],
+                'score': score,
+                'url': resumo['url']
+            })
         
         return resultados
     
     def buscar_chunks(self, termo: str, limite: int = 10) -> List[Dict[str, Any]]:
         """
-        Busca chunks por termo no conteúdo
+        Busca chunks por termo no conteúdo, ranqueados por BM25
         
         Args:
             termo: Termo de busca
@@ -439,29 +424,22 @@ class RAGFileManager:
         Returns:
             Lista de chunks encontrados
         """
+        self.indice_chunks.sincronizar()
         resultados = []
-        metadata = self.file_store._load_metadata()
         
-        count = 0
-        termo_lower = termo.lower()
-        
-        for chunk_id in metadata["chunk_index"]:
-            if count >= limite:
-                break
-                
+        # Apenas os k melhores são carregados do armazenamento
+        for chunk_id, score in self.bm25_chunks.buscar(termo, limite):
             chunk = self.ler_chunk(chunk_id)
             if not chunk:
                 continue
             
-            if termo_lower in chunk.content.lower():
-                resultados.append({
-                    'id': chunk.chunk_id,
-                    'documento_id': chunk.document_id,
-                    'conteudo': chunk.content,
-                    'score': 1.0,
-                    'indice': chunk.chunk_index
-                })
-                count += 1
+            resultados.append({
+                'id': chunk.chunk_id,
+                'documento_id': chunk.document_id,
+                'conteudo': chunk.content,
+                'score': score,
+                'indice': chunk.chunk_index
+            })
         
         return resultados
     
@@ -476,62 +454,62 @@ class RAGFileManager:
         """
         stats = self.file_store.get_statistics()
         
-        # Adicionar estatísticas por fonte
-        fontes = {}
-        metadata = self.file_store._load_metadata()
-        
-        for doc_id in metadata["document_index"]:
-            doc = self.ler_documento(doc_id)
-            if doc:
-                fonte = doc.source_type
-                if fonte not in fontes:
-                    fontes[fonte] = 0
-                fontes[fonte] += 1
+        # Agregados mantidos pelos índices a cada gravação/exclusão (sem varrer o corpus)
+        documentos = self.indice_documentos.sincronizar().estatisticas('conteudo')
+        chunks = self.indice_chunks.sincronizar().estatisticas('conteudo')
         
-        stats['documentos_por_fonte'] = fontes
+        stats['documentos_por_fonte'] = dict(documentos.fontes)
+        stats['tamanho_documentos'] = documentos.tamanhos.resumo()
+        stats['chunks_por_fonte'] = dict(chunks.fontes)
+        stats['tamanho_chunks'] = chunks.tamanhos.resumo()
+        stats['qualidade_chunks'] = chunks.qualidade.resumo()
         return stats
     
-    def verificar_integridade(self) -> Dict[str, Any]:
+    def verificar_integridade(self, incremental: bool = False, processos: Optional[int] = None,
+                              progresso=None) -> Dict[str, Any]:
         """
         Verifica integridade dos dados armazenados
         
+        Os objetos são conferidos pelos checksums gravados junto com eles
+        (sem desserializar), em paralelo; chunks órfãos são detectados pelo
+        índice de chunks.
+        
+        Args:
+            incremental: Verifica só o que mudou desde a última verificação
+            processos: Número de processos (padrão: número de CPUs)
+            progresso: Função progresso(verificados, total) chamada durante a verificação
+            
         Returns:
             Relatório de integridade
         """
+        verificacao = self.file_store.verify_integrity(processos, incremental, progresso)
+        documentos = verificacao['documents']
+        chunks = verificacao['chunks']
+        
         relatorio = {
-            'documentos_ok': 0,
-            'documentos_erro': 0,
-            'chunks_ok': 0,
-            'chunks_erro': 0,
+            # Itens pulados no modo incremental já foram verificados sem erro
+            'documentos_ok': documentos['ok'] + documentos['skipped'],
+            'documentos_erro': len(documentos['errors']),
+            'chunks_ok': chunks['ok'] + chunks['skipped'],
+            'chunks_erro': len(chunks['errors']),
             'chunks_orfaos': 0,
+            'verificados': verificacao['checked'],
+            'ignorados': verificacao['skipped'],
+            'tempo_segundos': verificacao['elapsed_seconds'],
             'erros': []
         }
         
-        metadata = self.file_store._load_metadata()
-        
-        # Verificar documentos
-        for doc_id in metadata["document_index"]:
-            doc = self.ler_documento(doc_id)
-            if doc:
-                relatorio['documentos_ok'] += 1
-            else:
-                relatorio['documentos_erro'] += 1
-                relatorio['erros'].append(f"Documento não carregável: {doc_id}")
+        for doc_id, erro in documentos['errors']:
+            relatorio['erros'].append(f"Documento não carregável: {doc_id} ({erro})")
+        for chunk_id, erro in chunks['errors']:
+            relatorio['erros'].append(f"Chunk não carregável: {chunk_id} ({erro})")
         
-        # Verificar chunks
-        docs_existentes = set(metadata["document_index"].keys())
-        
-        for chunk_id in metadata["chunk_index"]:
-            chunk = self.ler_chunk(chunk_id)
-            if chunk:
-                relatorio['chunks_ok'] += 1
-                # Verificar se documento pai existe
-                if chunk.document_id not in docs_existentes:
-                    relatorio['chunks_orfaos'] += 1
-                    relatorio['erros'].append(f"Chunk órfão: {chunk_id} (doc: {chunk.document_id})")
-            else:
-                relatorio['chunks_erro'] += 1
-                relatorio['erros'].append(f"Chunk não carregável: {chunk_id}")
+        # Verificar se o documento pai de cada chunk existe
+        docs_existentes = set(self.file_store.list_document_ids())
+        for chunk_id, resumo in self.indice_chunks.sincronizar().resumos.items():
+            if resumo['documento_id'] not in docs_existentes:
+                relatorio['chunks_orfaos'] += 1
+                relatorio['erros'].append(f"Chunk órfão: {chunk_id} (doc: {resumo['documento_id']})")
         
         return relatorio
     
@@ -544,9 +522,92 @@ class RAGFileManager:
         """
         return self.file_store.clear_all()
     
+    def buscar_por_intervalo(self, campo: str, minimo: Any = None, maximo: Any = None,
+                             limite: Optional[int] = None, decrescente: bool = False) -> List[tuple]:
+        """
+        Documentos com um valor dentro de um intervalo, pelo índice ordenado
+        
+        Args:
+            campo: 'data_coleta', 'data_publicacao', 'tamanho' ou 'qualidade'
+            minimo: Limite inferior inclusivo (datetime para datas, opcional)
+            maximo: Limite superior inclusivo (opcional)
+            limite: Número máximo de resultados
+            decrescente: Ordena do maior para o menor valor
+            
+        Returns:
+            Lista de (ID do documento, valor) ordenada pelo valor
+        """
+        if campo not in CAMPOS_ORDENADOS:
+            raise ValueError(f"Campo sem índice ordenado: {campo}")
+        
+        indice = self.indice_documentos.sincronizar()
+        return indice.indice_ordenado(campo).intervalo(
+            valor_ordenavel(minimo), valor_ordenavel(maximo), limite, decrescente
+        )
+    
+    def encontrar_duplicados(self, conteudo: str, limiar: float = 0.8, limite: int = 5) -> List[tuple]:
+        """
+        Documentos quase idênticos a um conteúdo (MinHash + LSH)
+        
+        Args:
+            conteudo: Texto a comparar
+            limiar: Similaridade de Jaccard estimada mínima
+            limite: Número máximo de resultados
+            
+        Returns:
+            Lista de (ID do documento, similaridade) em ordem decrescente
+        """
+        indice = self.indice_documentos.sincronizar()
+        return indice.indice_lsh().similares(self.minhash.assinatura_texto(conteudo), limite, limiar)
+    
+    def salvar_indices(self):
+        """
+        Grava os índices invertidos de documentos e chunks
+        """
+        self.indice_documentos.salvar()
+        self.indice_chunks.salvar()
+    
+    def _extrair_documento(self, doc: RawDocument):
+        """
+        Textos indexados e resumo de um documento para o índice invertido
+        """
+        textos = {
+            'titulo': doc.title,
+            'conteudo': doc.content,
+            'resumo': doc.abstract,
+            'autor': ' '.join(doc.authors),
+            'fonte': doc.source_type
+        }
+        resumo = {
+            'titulo': doc.title,
+            'fonte': doc.source_type,
+            'preview': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
+            'url': doc.url,
+            'tamanho': len(doc.content),
+            'data_coleta': doc.collection_timestamp,
+            'data_publicacao': doc.publication_date,
+            'qualidade': doc.quality_score,
+            CHAVE_MINHASH: self.minhash.assinatura_texto(doc.content)
+        }
+        return textos, resumo
+    
+    def _extrair_chunk(self, chunk: ProcessedChunk):
+        """
+        Texto indexado e resumo de um chunk para o índice invertido
+        """
+        resumo = {
+            'documento_id': chunk.document_id,
+            'indice': chunk.chunk_index,
+            'fonte': chunk.source_type,
+            'tamanho': len(chunk.content),
+            'qualidade': chunk.quality_score
+        }
+        return {'conteudo': chunk.content}, resumo
+    
     def fechar(self):
         """
         Fecha o gerenciador
         """
+        self.salvar_indices()
         self.file_store.close()
         print("RAGFileManager fechado")
\ No newline at end of file
@@ -171,7 +171,7 @@ class RAGPipeline:
             
         try:
             # Gerar embedding da query
-            query_embedding = self.document_processor.generate_embeddings([query])[0]
+            query_embedding = self.document_processor.embed_query(query)
             
             # Buscar no vector store
             search_results = self.vector_store.search(query_embedding, top_k, filters)
@@ -29,7 +29,7 @@ class RAGPipelineFiles:
         self.academic_collector = AcademicSourceCollector()
         self.document_processor = DocumentProcessor()
         self.quality_filter = QualityFilter()
-        self.file_store = FileStore()
+        self.file_store = FileStore(config=self.config.get('file_store'))
         
         # Estado do pipeline
         self.raw_documents = []
@@ -89,27 +89,32 @@ class RAGPipelineFiles:
             
             # Etapa 5: Verificar duplicatas e salvar
             print("\n5. SALVANDO CHUNKS...")
-            chunks_salvos = 0
-            chunks_duplicados = 0
+            chunks_novos = list({chunk.chunk_id: chunk for chunk in new_chunks
+                                 if not self.file_store.chunk_exists(chunk.chunk_id)}.values())
+            chunks_duplicados = len(new_chunks) - len(chunks_novos)
             
-            for chunk in new_chunks:
-                if not self.file_store.chunk_exists(chunk.chunk_id):
-                    if self.file_store.save_chunk(chunk):
-                        chunks_salvos += 1
-                        self.processed_chunks.append(chunk)
-                else:
-                    chunks_duplicados += 1
+            # Gravação em lote: uma única entrada no journal do FileStore
+            chunks_salvos = self.file_store.save_chunks(chunks_novos)
+            chunks_com_erro = 0
+            if chunks_salvos < len(chunks_novos):
+                # Gravação parcial: só os chunks gravados entram na memória
+                gravados = [chunk for chunk in chunks_novos
+                            if self.file_store.chunk_exists(chunk.chunk_id)]
+                chunks_com_erro = len(chunks_novos) - len(gravados)
+                chunks_novos = gravados
+            self.processed_chunks.extend(chunks_novos)
             
             print(f"Chunks salvos: {chunks_salvos}")
             print(f"Chunks duplicados ignorados: {chunks_duplicados}")
+            if chunks_com_erro:
+                print(f"Chunks não salvos (erro de gravação): {chunks_com_erro}")
             
             # Etapa 6: Salvar documentos
             print("\n6. SALVANDO DOCUMENTOS...")
-            docs_salvos = 0
-            for doc in self.raw_documents:
-                if not self.file_store.document_exists(doc.document_id):
-                    if self.file_store.save_document(doc):
-                        docs_salvos += 1
+            docs_salvos = self.file_store.save_documents(
+                doc for doc in self.raw_documents
+                if not self.file_store.document_exists(doc.document_id)
+            )
             
             print(f"Documentos salvos: {docs_salvos}")
             
@@ -121,7 +126,8 @@ class RAGPipelineFiles:
             tempo_execucao = (fim - inicio).total_seconds()
             
             # Gerar relatório
-            relatorio = self._gerar_relatorio(tema, tempo_execucao, filter_stats, chunk_filter_stats, chunks_salvos)
+            relatorio = self._gerar_relatorio(tema, tempo_execucao, filter_stats, chunk_filter_stats,
+                                              chunks_salvos, chunks_com_erro)
             
             print("\n=== PIPELINE CONCLUIDO ===")
             print(f"Tempo de execucao: {tempo_execucao:.2f} segundos")
@@ -168,7 +174,7 @@ class RAGPipelineFiles:
         
         try:
             # Gerar embedding da query
-            query_embedding = self.document_processor.generate_embeddings([query])[0]
+            query_embedding = self.document_processor.embed_query(query)
             
             # Calcular similaridades
             resultados = []
@@ -255,7 +261,7 @@ class RAGPipelineFiles:
     
     def _gerar_relatorio(self, tema: str, tempo_execucao: float, 
                         filter_stats: Dict[str, Any], chunk_filter_stats: Dict[str, Any],
-                        chunks_salvos: int) -> Dict[str, Any]:
+                        chunks_salvos: int, chunks_com_erro: int = 0) -> Dict[str, Any]:
         """Gera relatório da execução"""
         stats = self.file_store.get_statistics()
         
@@ -264,6 +270,7 @@ class RAGPipelineFiles:
             'tempo_execucao': tempo_execucao,
             'documentos_coletados': len(self.raw_documents),
             'chunks_novos': chunks_salvos,
+            'chunks_com_erro': chunks_com_erro,
             'total_chunks': stats['total_chunks'],
             'total_documentos': stats['total_documents'],
             'filtros_documentos': filter_stats,
@@ -4,5 +4,6 @@ Sistema de armazenamento vetorial
 """
 
 from .vector_store import RAGVectorStore
+from .write_ahead_log import WriteAheadLog
 
-__all__ = ['RAGVectorStore']
\ No newline at end of file
+__all__ = ['RAGVectorStore', 'WriteAheadLog']
\ No newline at end of file
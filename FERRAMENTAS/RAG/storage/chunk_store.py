@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Armazenamento colunar de chunks
+Embeddings em .npy mapeado em memoria, texto/metadados em blob com offsets
+e uma tabela compacta com as colunas usadas em filtros
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.document import ProcessedChunk, create_processed_chunk_from_dict
+
+# Colunas de um chunk disponiveis sem decodificar texto e metadados
+ChunkSummary = namedtuple('ChunkSummary', ['chunk_id', 'document_id', 'source_type', 'quality_score', 'chunk_size'])
+
+# Bloco de linhas copiado por vez ao regravar os embeddings
+_COPY_BLOCK = 4096
+
+
+class ChunkStore:
+    """Chunks indexados pelo ID FAISS, persistidos em formato colunar
+
+    Funciona como a antiga lista self.chunks: posicao = ID, None = removido.
+    Chunks ja gravados so sao decodificados quando acessados (com cache LRU).
+    O embedding de um chunk decodificado e copiado do arquivo mapeado: chunks
+    retidos em resultados e caches nao prendem o mapeamento (no Windows, um
+    arquivo mapeado nao pode ser substituido nem removido).
+    O cache LRU e protegido por um lock: leituras concorrentes o reordenam.
+    """
+
+    TABLE_VERSION = 1
+
+    def __init__(self, storage_path: str, cache_size: int = 1024):
+        self.cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self.set_directory(storage_path)
+        self.clear()
+
+    def set_directory(self, storage_path: str):
+        """Define a pasta dos arquivos (o estado em memoria nao e alterado)"""
+        self.storage_path = Path(storage_path)
+
+        # Arquivos de persistencia (a tabela e gravada por ultimo)
+        self.embeddings_file = self.storage_path / 'chunk_embeddings.npy'
+        self.offsets_file = self.storage_path / 'chunk_offsets.npy'
+        self.ids_file = self.storage_path / 'chunk_ids.npy'
+        self.data_file = self.storage_path / 'chunk_data.bin'
+        self.table_file = self.storage_path / 'chunk_table.json'
+
+    @property
+    def files(self) -> List[Path]:
+        """Arquivos usados pelo armazenamento"""
+        return [self.embeddings_file, self.offsets_file, self.ids_file, self.data_file, self.table_file]
+
+    def clear(self):
+        """Descarta o estado em memoria (os arquivos nao sao alterados)"""
+        self._size = 0  # Numero de posicoes = proximo ID
+        self._rows = np.empty(0, dtype='int64')  # ID -> linha gravada (-1 = nao gravado/removido)
+        self._table = {}  # Colunas da tabela gravada
+        self._embeddings = None
+        self._offsets = None
+        self._data = None
+        self._pending = {}  # ID -> chunk ainda nao gravado
+        self._cache = OrderedDict()  # ID -> chunk gravado ja decodificado
+
+    def exists(self) -> bool:
+        """Verifica se ha chunks gravados no formato colunar"""
+        return self.table_file.exists()
+
+    # ===== ACESSO (interface de lista) =====
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Optional[ProcessedChunk]]:
+        for internal_id in range(self._size):
+            yield self[internal_id]
+
+    def __getitem__(self, internal_id: int) -> Optional[ProcessedChunk]:
+        if internal_id < 0:
+            internal_id += self._size
+
+        chunk = self._pending.get(internal_id)
+        if chunk is not None:
+            return chunk
+
+        row = self._row(internal_id)
+        if row < 0:
+            return None
+
+        with self._cache_lock:
+            chunk = self._cache.get(internal_id)
+            if chunk is not None:
+                self._cache.move_to_end(internal_id)
+                return chunk
+
+        chunk = self._decode(row)
+        with self._cache_lock:
+            self._cache[internal_id] = chunk
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return chunk
+
+    def __setitem__(self, internal_id: int, value: None):
+        """Remove o chunk da posicao (apenas None e aceito)"""
+        if value is not None:
+            raise ValueError("ChunkStore aceita apenas remoção (None) por posição")
+
+        self._pending.pop(internal_id, None)
+        with self._cache_lock:
+            self._cache.pop(internal_id, None)
+        if 0 <= internal_id < len(self._rows):
+            self._rows[internal_id] = -1
+
+    def append(self, chunk: Optional[ProcessedChunk]) -> int:
+        """Adiciona um chunk na proxima posicao e retorna seu ID"""
+        internal_id = self._size
+        if chunk is not None:
+            self._pending[internal_id] = chunk
+        self._size += 1
+        return internal_id
+
+    def extend(self, chunks: List[Optional[ProcessedChunk]]):
+        """Adiciona varios chunks (None reserva a posicao como removida)"""
+        for chunk in chunks:
+            self.append(chunk)
+
+    def live_ids(self) -> np.ndarray:
+        """IDs dos chunks ativos, em ordem crescente"""
+        stored = np.nonzero(self._rows >= 0)[0]
+        if not self._pending:
+            return stored.astype('int64')
+        pending = np.fromiter(self._pending, dtype='int64', count=len(self._pending))
+        return np.union1d(stored, pending).astype('int64')
+
+    def summary(self, internal_id: int) -> Optional[ChunkSummary]:
+        """Colunas de filtro de um chunk, sem decodificar texto/metadados"""
+        chunk = self._pending.get(internal_id)
+        if chunk is not None:
+            return ChunkSummary(chunk.chunk_id, chunk.document_id, chunk.source_type,
+                                float(chunk.quality_score), int(chunk.chunk_size))
+
+        row = self._row(internal_id)
+        if row < 0:
+            return None
+
+        table = self._table
+        return ChunkSummary(table['chunk_id'][row], table['document_id'][row], table['source_type'][row],
+                            table['quality_score'][row], table['chunk_size'][row])
+
+    def summaries(self) -> Iterator[Tuple[int, ChunkSummary]]:
+        """Itera (ID, ChunkSummary) dos chunks ativos"""
+        for internal_id in self.live_ids():
+            yield int(internal_id), self.summary(int(internal_id))
+
+    def _row(self, internal_id: int) -> int:
+        if 0 <= internal_id < len(self._rows):
+            return int(self._rows[internal_id])
+        return -1
+
+    def _decode(self, row: int) -> ProcessedChunk:
+        """Reconstroi um chunk gravado (embedding copiado do arquivo mapeado)"""
+        record = json.loads(self._data[self._offsets[row]:self._offsets[row + 1]].tobytes().decode('utf-8'))
+        chunk = create_processed_chunk_from_dict(record)
+        chunk.embedding = np.array(self._embeddings[row])
+        return chunk
+
+    def _encode(self, chunk: ProcessedChunk) -> bytes:
+        record = chunk.to_dict()
+        record.pop('word_count', None)
+        return json.dumps(record, ensure_ascii=False, default=str).encode('utf-8')
+
+    def _stored_embedding(self, internal_id: int) -> np.ndarray:
+        chunk = self._pending.get(internal_id)
+        if chunk is not None:
+            return chunk.embedding
+        return self._embeddings[self._rows[internal_id]]
+
+    # ===== PERSISTENCIA =====
+
+    def load(self) -> bool:
+        """Carrega a tabela e mapeia os arquivos gravados"""
+        self.clear()
+        if not self.exists():
+            return False
+
+        with open(self.table_file, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+
+        ids = np.load(self.ids_file)
+        offsets = np.load(self.offsets_file)
+        rows = len(ids)
+        if len(table['chunk_id']) != rows or len(offsets) != rows + 1:
+            raise ValueError(f"Arquivos de chunks inconsistentes em {self.storage_path}")
+
+        self._table = table
+        self._offsets = offsets
+        self._size = table.get('size', int(ids.max()) + 1 if rows else 0)
+        self._rows = np.full(self._size, -1, dtype='int64')
+        self._rows[ids] = np.arange(rows, dtype='int64')
+
+        if rows:
+            self._embeddings = np.load(self.embeddings_file, mmap_mode='r')
+        if offsets[-1] > 0:
+            self._data = np.memmap(self.data_file, dtype=np.uint8, mode='r')
+        return True
+
+    def save(self, directory: Optional[str] = None):
+        """Grava os chunks ativos (linhas existentes sao copiadas sem decodificar)
+
+        Sem `directory`, os arquivos sao escritos em temporarios e
+        substituidos ao final; a tabela e a ultima a ser substituida. Com
+        `directory`, sao escritos direto na nova pasta, que passa a ser a
+        pasta do armazenamento (os arquivos anteriores nao sao alterados).
+        """
+        ids = self.live_ids()
+        rows = len(ids)
+        dimension = self._dimension()
+        if directory is not None:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            tmp = {path: Path(directory) / path.name for path in self.files}
+        else:
+            tmp = {path: path.with_name(path.name + '.tmp') for path in self.files}
+
+        # Embeddings: copia em blocos direto do arquivo mapeado
+        embeddings = np.lib.format.open_memmap(tmp[self.embeddings_file], mode='w+',
+                                               dtype=np.float32, shape=(rows, dimension))
+        for start in range(0, rows, _COPY_BLOCK):
+            block = ids[start:start + _COPY_BLOCK]
+            embeddings[start:start + len(block)] = [self._stored_embedding(int(i)) for i in block]
+        embeddings.flush()
+        del embeddings
+
+        # Texto/metadados: blob com offsets
+        offsets = np.zeros(rows + 1, dtype='int64')
+        table = {name: [] for name in ChunkSummary._fields}
+        with open(tmp[self.data_file], 'wb') as f:
+            for position, internal_id in enumerate(ids):
+                internal_id = int(internal_id)
+                chunk = self._pending.get(internal_id)
+                if chunk is not None:
+                    data = self._encode(chunk)
+                else:
+                    row = self._rows[internal_id]
+                    data = self._data[self._offsets[row]:self._offsets[row + 1]].tobytes()
+                f.write(data)
+                offsets[position + 1] = offsets[position] + len(data)
+
+                for name, value in zip(ChunkSummary._fields, self.summary(internal_id)):
+                    table[name].append(value)
+
+        for path, values in ((self.offsets_file, offsets), (self.ids_file, ids)):
+            with open(tmp[path], 'wb') as f:
+                np.save(f, values)
+
+        table.update({'version': self.TABLE_VERSION, 'size': self._size, 'dimension': dimension})
+        with open(tmp[self.table_file], 'w', encoding='utf-8') as f:
+            json.dump(table, f, ensure_ascii=False)
+
+        # Liberar mapeamentos antes de substituir os arquivos
+        self.release()
+        if directory is not None:
+            self.set_directory(directory)
+        else:
+            for path in self.files:
+                os.replace(tmp[path], path)
+
+        self.load()
+
+    def _dimension(self) -> int:
+        if self._embeddings is not None:
+            return self._embeddings.shape[1]
+        for chunk in self._pending.values():
+            return len(chunk.embedding)
+        return 0
+
+    def release(self):
+        """Fecha os arquivos mapeados (chunks pendentes sao mantidos)"""
+        self._embeddings = None
+        self._data = None
+        with self._cache_lock:
+            self._cache.clear()
+
+    def delete_files(self):
+        """Remove os arquivos gravados"""
+        self.release()
+        for path in self.files:
+            if path.exists():
+                path.unlink()
@@ -2,201 +2,585 @@
 """
 Sistema de persistência baseado em arquivos como alternativa ao SQLite híbrido
 Usa JSON para metadados e pickle para objetos Python
+
+O índice (ID -> localização) fica em memória; alterações são anexadas a um
+journal e metadata.json só é reescrito na compactação do journal. Processos
+que compartilham a pasta serializam journal e snapshot por metadata.lock.
+
+Backends (config 'storage_backend'):
+- 'files': um pickle por objeto (chunks/chunk_<id>.pkl, documents/doc_<id>.pkl),
+  localização {'file', 'size', 'crc'} no índice (ou só o nome do arquivo,
+  em índices gravados por versões anteriores)
+- 'segments': objetos anexados a arquivos de segmento (segments/*.seg),
+  localização [segmento, offset, tamanho, crc32] no índice
+Os formatos de localização podem coexistir no índice; no backend
+'segments' a compactação migra os pickles individuais para segmentos.
+O checksum guardado na gravação permite verificar a integridade sem
+desserializar os objetos (verify_integrity).
 """
 
 import json
 import pickle
 import os
+import zlib
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable
 from datetime import datetime
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.document import RawDocument, ProcessedChunk, SearchResult
+from storage.write_ahead_log import WriteAheadLog
+from storage.segment_store import SegmentStore, lock_file
+from storage.integrity_checker import IntegrityChecker
 
 class FileStore:
     """Sistema de persistência baseado em arquivos"""
-    
-    def __init__(self, base_path: str = "file_storage"):
+
+    def __init__(self, base_path: str = "file_storage", config: Optional[Dict[str, Any]] = None):
+        self.config = config or {}
         self.base_path = Path(base_path)
         self.chunks_dir = self.base_path / "chunks"
         self.docs_dir = self.base_path / "documents"
         self.metadata_file = self.base_path / "metadata.json"
-        
+        self.journal_file = self.base_path / "metadata.journal"
+        self.lock_file = self.base_path / "metadata.lock"
+        self.segments_dir = self.base_path / "segments"
+
+        # Entradas no journal que disparam a compactação (reescrita de metadata.json)
+        self.journal_compact_every = self.config.get('journal_compact_every', 1000)
+
+        # Backend de armazenamento dos objetos ('files' ou 'segments')
+        self.storage_backend = self.config.get('storage_backend', 'files')
+        if self.storage_backend not in ('files', 'segments'):
+            raise ValueError(f"Backend de armazenamento inválido: {self.storage_backend}")
+        # Fração de bytes mortos nos segmentos que dispara a reescrita na compactação
+        self.segment_compact_ratio = self.config.get('segment_compact_ratio', 0.3)
+        # Número de segmentos que também dispara a reescrita (cada escritor cria os seus)
+        self.segment_compact_count = self.config.get('segment_compact_count', 64)
+
         # Criar diretórios
         self.chunks_dir.mkdir(parents=True, exist_ok=True)
         self.docs_dir.mkdir(parents=True, exist_ok=True)
-        
+
+        # Índice em memória
+        self._journal = WriteAheadLog(str(self.journal_file), self.config.get('journal_fsync', False))
+        self._chunk_index = {}  # chunk_id -> {arquivo, tamanho, crc} ou [segmento, offset, tamanho, crc]
+        self._document_index = {}  # doc_id -> {arquivo, tamanho, crc} ou [segmento, offset, tamanho, crc]
+        self._created_at = None
+        self._last_updated = None
+        self._signature = None
+        self.version = 0  # Incrementado a cada alteração do índice (local ou recarregada)
+        self._listeners = []
+
+        # Segmentos (sempre disponíveis para leitura, mesmo no backend 'files')
+        segment_max_bytes = self.config.get('segment_max_mb', 64) * 1024 * 1024
+        segment_fsync = self.config.get('segment_fsync', False)
+        self._segments = {
+            'chunks': SegmentStore(str(self.segments_dir), 'chunks', segment_max_bytes, segment_fsync),
+            'documents': SegmentStore(str(self.segments_dir), 'documents', segment_max_bytes, segment_fsync)
+        }
+        self._dirs = {'chunks': self.chunks_dir, 'documents': self.docs_dir}
+
         # Inicializar metadata
         self._init_metadata()
-    
+
     def _init_metadata(self):
-        """Inicializa arquivo de metadados"""
+        """Inicializa arquivo de metadados e carrega o índice"""
         if not self.metadata_file.exists():
-            metadata = {
-                "created_at": datetime.now().isoformat(),
-                "total_chunks": 0,
-                "total_documents": 0,
-                "last_updated": datetime.now().isoformat(),
-                "chunk_index": {},  # chunk_id -> arquivo
-                "document_index": {}  # doc_id -> arquivo
-            }
-            self._save_metadata(metadata)
-    
-    def _load_metadata(self) -> Dict[str, Any]:
-        """Carrega metadados do arquivo"""
+            self._chunk_index = {}
+            self._document_index = {}
+            self._created_at = datetime.now().isoformat()
+            self._write_snapshot()
+        self._load_index()
+
+    # ===== ÍNDICE EM MEMÓRIA =====
+
+    def _load_index(self):
+        """Carrega metadata.json e reaplica o journal"""
         with open(self.metadata_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    
+            metadata = json.load(f)
+
+        self._chunk_index = metadata.get("chunk_index", {})
+        self._document_index = metadata.get("document_index", {})
+        self._created_at = metadata.get("created_at", datetime.now().isoformat())
+        self._last_updated = metadata.get("last_updated")
+
+        for operation, entries in self._journal.replay():
+            index = self._chunk_index if operation == 'chunks' else self._document_index
+            self._apply(index, entries)
+
+        # Bytes vivos por segmento, para medir o espaço a recuperar na compactação
+        for operation, index in (('chunks', self._chunk_index), ('documents', self._document_index)):
+            self._segments[operation].attach(loc for loc in index.values() if isinstance(loc, list))
+
+        self._signature = self._storage_signature()
+        self.version += 1
+
+    def _storage_signature(self) -> tuple:
+        """Assinatura (mtime, tamanho) de metadata.json e do journal"""
+        signature = []
+        for file in (self.metadata_file, self.journal_file):
+            try:
+                stat = file.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _sync(self):
+        """Recarrega o índice se outro processo alterou os arquivos"""
+        if self._storage_signature() != self._signature:
+            self._journal.close()
+            self._load_index()
+
+    @contextmanager
+    def _exclusive(self):
+        """Trava entre processos para alterar o journal e o snapshot
+
+        Sem ela, um processo que grava o snapshot e esvazia o journal pode
+        descartar entradas anexadas por outro nesse intervalo.
+        """
+        with open(self.lock_file, 'a+b') as f:
+            lock_file(f.fileno(), wait=True)
+            yield
+
+    @staticmethod
+    def _apply(index: Dict[str, Any], entries: Dict[str, Any]):
+        """Aplica entradas do journal (localização = None remove a entrada)"""
+        for item_id, location in entries.items():
+            if location is None:
+                index.pop(item_id, None)
+            else:
+                index[item_id] = location
+
+    def _index(self, operation: str) -> Dict[str, Any]:
+        return self._chunk_index if operation == 'chunks' else self._document_index
+
+    @staticmethod
+    def _filename(location: Any) -> str:
+        """Nome do pickle de uma localização do backend 'files'"""
+        return location['file'] if isinstance(location, dict) else location
+
+    def _release(self, operation: str, location: Any, replacement: Any = None):
+        """Libera o espaço de uma localização que deixou de ser usada"""
+        if isinstance(location, list):
+            self._segments[operation].discard(location)
+            return
+
+        filename = self._filename(location)
+        # Sobrescrita no backend 'files' reutiliza o mesmo arquivo
+        if replacement is not None and not isinstance(replacement, list) \
+                and self._filename(replacement) == filename:
+            return
+        filepath = self._dirs[operation] / filename
+        if filepath.exists():
+            filepath.unlink()
+
+    def add_listener(self, callback):
+        """Registra um observador de alterações feitas por este processo
+
+        callback(operation, entries, objects): operation é 'chunks' ou
+        'documents', entries mapeia ID -> localização (None = removido) e
+        objects mapeia ID -> objeto gravado. Alterações de outros processos
+        não são notificadas; compare `version` para detectá-las.
+        """
+        self._listeners.append(callback)
+
+    def _record(self, operation: str, entries: Dict[str, Any], objects: Optional[Dict[str, Any]] = None):
+        """Atualiza o índice e anexa a alteração ao journal"""
+        if not entries:
+            return
+
+        with self._exclusive():
+            self._sync()
+            index = self._index(operation)
+            for item_id, location in entries.items():
+                previous = index.get(item_id)
+                if previous is not None and previous != location:
+                    self._release(operation, previous, location)
+            self._apply(index, entries)
+            self._last_updated = datetime.now().isoformat()
+
+            self._journal.append(operation, entries)
+            self._signature = self._storage_signature()
+            if len(self._journal) >= self.journal_compact_every:
+                self._compact()
+
+        self.version += 1
+        for callback in self._listeners:
+            try:
+                callback(operation, entries, objects or {})
+            except Exception as e:
+                print(f"Erro ao notificar alteração do FileStore: {e}")
+
+    def _write_snapshot(self):
+        """Grava o índice completo em metadata.json (escrita atômica)"""
+        self._last_updated = datetime.now().isoformat()
+        metadata = {
+            "created_at": self._created_at,
+            "total_chunks": len(self._chunk_index),
+            "total_documents": len(self._document_index),
+            "last_updated": self._last_updated,
+            "chunk_index": self._chunk_index,  # chunk_id -> arquivo
+            "document_index": self._document_index  # doc_id -> arquivo
+        }
+        tmp_file = self.metadata_file.with_name(self.metadata_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        os.replace(tmp_file, self.metadata_file)
+
+    def compact(self, force_segments: bool = False):
+        """Grava o índice em metadata.json e esvazia o journal
+
+        No backend 'segments', também reescreve os segmentos quando a fração
+        de bytes mortos passa de segment_compact_ratio, quando há mais de
+        segment_compact_count segmentos (ou com force_segments) e migra
+        objetos ainda gravados como pickles individuais.
+        """
+        with self._exclusive():
+            self._sync()  # Alterações de outros processos entram no snapshot
+            self._compact(force_segments)
+
+    def _compact(self, force_segments: bool = False):
+        """compact() com a trava já obtida e o índice em dia"""
+        old_segments = {}
+        legacy_files = {}
+        if self.storage_backend == 'segments':
+            for operation in ('chunks', 'documents'):
+                old_segments[operation], legacy_files[operation] = self._compact_segments(operation, force_segments)
+
+        self._write_snapshot()
+        self._journal.truncate()
+        self._signature = self._storage_signature()
+
+        # Só depois do snapshot gravado os dados antigos deixam de ser referenciados
+        for operation, segments in old_segments.items():
+            self._segments[operation].remove_segments(segments)
+        for operation, filenames in legacy_files.items():
+            for filename in filenames:
+                filepath = self._dirs[operation] / filename
+                if filepath.exists():
+                    filepath.unlink()
+
+    def _compact_segments(self, operation: str, force: bool) -> tuple:
+        """Reescreve segmentos e migra pickles de um tipo de objeto
+
+        Returns:
+            tuple: (segmentos antigos, arquivos pickle migrados) a remover
+        """
+        index = self._index(operation)
+        store = self._segments[operation]
+
+        legacy = {item_id: self._filename(loc) for item_id, loc in index.items() if not isinstance(loc, list)}
+        if legacy:
+            migrated = []
+            for item_id, filename in legacy.items():
+                obj = self._read_pickle(self._dirs[operation] / filename)
+                if obj is None:
+                    continue
+                index[item_id] = store.append_many([obj])[0]
+                migrated.append(filename)
+            print(f"FileStore: {len(migrated)} {operation} migrados para segmentos")
+            legacy = migrated
+
+        segments = []
+        if (force or store.dead_ratio > self.segment_compact_ratio
+                or len(store.segments()) > self.segment_compact_count):
+            located = {item_id: loc for item_id, loc in index.items() if isinstance(loc, list)}
+            new_index, segments = store.compact(located)
+            # Registros corrompidos ficam fora do índice
+            for item_id in located:
+                index.pop(item_id, None)
+            index.update(new_index)
+
+        return segments, legacy or []
+
+    def _load_metadata(self) -> Dict[str, Any]:
+        """Visão dos metadados a partir do índice em memória (sem ler o disco)"""
+        self._sync()
+        return {
+            "created_at": self._created_at,
+            "total_chunks": len(self._chunk_index),
+            "total_documents": len(self._document_index),
+            "last_updated": self._last_updated,
+            "chunk_index": self._chunk_index,
+            "document_index": self._document_index
+        }
+
     def _save_metadata(self, metadata: Dict[str, Any]):
-        """Salva metadados no arquivo"""
-        metadata["last_updated"] = datetime.now().isoformat()
-        with open(self.metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
-    
+        """Substitui o índice pelos metadados informados e grava um snapshot"""
+        with self._exclusive():
+            self._chunk_index = dict(metadata.get("chunk_index", {}))
+            self._document_index = dict(metadata.get("document_index", {}))
+            self._compact()
+        self.version += 1
+
+    def list_chunk_ids(self) -> List[str]:
+        """IDs de todos os chunks armazenados"""
+        self._sync()
+        return list(self._chunk_index)
+
+    def list_document_ids(self) -> List[str]:
+        """IDs de todos os documentos armazenados"""
+        self._sync()
+        return list(self._document_index)
+
+    # ===== OBJETOS =====
+
+    def _write_objects(self, operation: str, items: Dict[str, Any], prefix: str) -> Dict[str, Any]:
+        """Grava objetos no backend configurado e retorna suas localizações"""
+        if self.storage_backend == 'segments':
+            locations = self._segments[operation].append_many(items.values())
+            return dict(zip(items, locations))
+
+        entries = {}
+        for item_id, obj in items.items():
+            try:
+                # Nome do arquivo baseado no ID
+                filename = f"{prefix}_{item_id}.pkl"
+                data = self._write_pickle(self._dirs[operation] / filename, obj)
+                entries[item_id] = {'file': filename, 'size': len(data), 'crc': zlib.crc32(data)}
+            except Exception as e:
+                print(f"Erro ao salvar {item_id}: {e}")
+        return entries
+
+    def _read_object(self, operation: str, location: Any) -> Any:
+        if isinstance(location, list):
+            return self._segments[operation].read(location)
+        return self._read_pickle(self._dirs[operation] / self._filename(location))
+
+    def _read_all(self, operation: str) -> List[Any]:
+        """Lê todos os objetos de um tipo (segmentos em leitura sequencial)"""
+        self._sync()
+        objects = []
+        located = []
+        for item_id, location in self._index(operation).items():
+            if isinstance(location, list):
+                located.append((item_id, location))
+            else:
+                try:
+                    objects.append(self._read_pickle(self._dirs[operation] / self._filename(location)))
+                except Exception as e:
+                    print(f"Erro ao carregar {item_id}: {e}")
+
+        objects.extend(obj for _, obj in self._segments[operation].read_many(located))
+        return [obj for obj in objects if obj]
+
+    def _write_pickle(self, filepath: Path, obj: Any) -> bytes:
+        """Grava o objeto e retorna os bytes gravados (para o checksum)"""
+        data = pickle.dumps(obj)
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        return data
+
+    def _read_pickle(self, filepath: Path) -> Any:
+        if not filepath.exists():
+            return None
+        with open(filepath, 'rb') as f:
+            return pickle.load(f)
+
     def save_chunk(self, chunk: ProcessedChunk) -> bool:
         """Salva um chunk em arquivo"""
+        return self.save_chunks([chunk]) == 1
+
+    def save_chunks(self, chunks: Iterable[ProcessedChunk]) -> int:
+        """Salva vários chunks com uma única entrada no journal
+
+        Returns:
+            int: Número de chunks salvos
+        """
         try:
-            # Nome do arquivo baseado no chunk_id
-            filename = f"chunk_{chunk.chunk_id}.pkl"
-            filepath = self.chunks_dir / filename
-            
-            # Salvar chunk em pickle
-            with open(filepath, 'wb') as f:
-                pickle.dump(chunk, f)
-            
-            # Atualizar metadata
-            metadata = self._load_metadata()
-            metadata["chunk_index"][chunk.chunk_id] = filename
-            metadata["total_chunks"] = len(metadata["chunk_index"])
-            self._save_metadata(metadata)
-            
-            return True
-            
+            objects = {chunk.chunk_id: chunk for chunk in chunks}
+            entries = self._write_objects('chunks', objects, 'chunk')
+            self._record('chunks', entries, objects)
         except Exception as e:
-            print(f"Erro ao salvar chunk {chunk.chunk_id}: {e}")
-            return False
-    
+            print(f"Erro ao atualizar índice de chunks: {e}")
+            return 0
+        return len(entries)
+
     def load_chunk(self, chunk_id: str) -> Optional[ProcessedChunk]:
         """Carrega um chunk do arquivo"""
         try:
-            metadata = self._load_metadata()
-            filename = metadata["chunk_index"].get(chunk_id)
-            
-            if not filename:
-                return None
-            
-            filepath = self.chunks_dir / filename
-            if not filepath.exists():
+            self._sync()
+            location = self._chunk_index.get(chunk_id)
+
+            if not location:
                 return None
-            
-            with open(filepath, 'rb') as f:
-                return pickle.load(f)
-                
+
+            return self._read_object('chunks', location)
+
         except Exception as e:
             print(f"Erro ao carregar chunk {chunk_id}: {e}")
             return None
-    
+
     def load_all_chunks(self) -> List[ProcessedChunk]:
         """Carrega todos os chunks"""
-        chunks = []
-        metadata = self._load_metadata()
-        
-        for chunk_id in metadata["chunk_index"]:
-            chunk = self.load_chunk(chunk_id)
-            if chunk:
-                chunks.append(chunk)
-        
-        return chunks
-    
+        return self._read_all('chunks')
+
+    def load_all_documents(self) -> List[RawDocument]:
+        """Carrega todos os documentos"""
+        return self._read_all('documents')
+
+    def delete_chunk(self, chunk_id: str) -> bool:
+        """Remove um chunk"""
+        return self.delete_chunks([chunk_id]) == 1
+
+    def delete_chunks(self, chunk_ids: Iterable[str]) -> int:
+        """Remove vários chunks com uma única entrada no journal
+
+        Returns:
+            int: Número de chunks removidos
+        """
+        self._sync()
+        entries = {chunk_id: None for chunk_id in chunk_ids if chunk_id in self._chunk_index}
+
+        self._record('chunks', entries)
+        return len(entries)
+
+    # ===== DOCUMENTOS =====
+
     def save_document(self, document: RawDocument) -> bool:
         """Salva um documento em arquivo"""
+        return self.save_documents([document]) == 1
+
+    def save_documents(self, documents: Iterable[RawDocument]) -> int:
+        """Salva vários documentos com uma única entrada no journal
+
+        Returns:
+            int: Número de documentos salvos
+        """
         try:
-            # Nome do arquivo baseado no document_id
-            filename = f"doc_{document.document_id}.pkl"
-            filepath = self.docs_dir / filename
-            
-            # Salvar documento em pickle
-            with open(filepath, 'wb') as f:
-                pickle.dump(document, f)
-            
-            # Atualizar metadata
-            metadata = self._load_metadata()
-            metadata["document_index"][document.document_id] = filename
-            metadata["total_documents"] = len(metadata["document_index"])
-            self._save_metadata(metadata)
-            
-            return True
-            
+            objects = {doc.document_id: doc for doc in documents}
+            entries = self._write_objects('documents', objects, 'doc')
+            self._record('documents', entries, objects)
         except Exception as e:
-            print(f"Erro ao salvar documento {document.document_id}: {e}")
-            return False
-    
+            print(f"Erro ao atualizar índice de documentos: {e}")
+            return 0
+        return len(entries)
+
     def load_document(self, document_id: str) -> Optional[RawDocument]:
         """Carrega um documento do arquivo"""
         try:
-            metadata = self._load_metadata()
-            filename = metadata["document_index"].get(document_id)
-            
-            if not filename:
-                return None
-            
-            filepath = self.docs_dir / filename
-            if not filepath.exists():
+            self._sync()
+            location = self._document_index.get(document_id)
+
+            if not location:
                 return None
-            
-            with open(filepath, 'rb') as f:
-                return pickle.load(f)
-                
+
+            return self._read_object('documents', location)
+
         except Exception as e:
             print(f"Erro ao carregar documento {document_id}: {e}")
             return None
-    
+
+    def delete_document(self, document_id: str) -> bool:
+        """Remove um documento"""
+        self._sync()
+        if document_id not in self._document_index:
+            return False
+
+        self._record('documents', {document_id: None})
+        return True
+
     def chunk_exists(self, chunk_id: str) -> bool:
         """Verifica se um chunk existe"""
-        metadata = self._load_metadata()
-        return chunk_id in metadata["chunk_index"]
-    
+        self._sync()
+        return chunk_id in self._chunk_index
+
     def document_exists(self, document_id: str) -> bool:
         """Verifica se um documento existe"""
-        metadata = self._load_metadata()
-        return document_id in metadata["document_index"]
-    
+        self._sync()
+        return document_id in self._document_index
+
+    def verify_integrity(self, workers: Optional[int] = None, incremental: bool = False,
+                         progress=None) -> Dict[str, Any]:
+        """Verifica os objetos armazenados pelos checksums gravados
+
+        Args:
+            workers: Processos de verificação (padrão: número de CPUs)
+            incremental: Verifica só o que mudou desde o último checkpoint
+            progress: Função progress(verificados, total) chamada durante a verificação
+
+        Returns:
+            Relatório por tipo de objeto (ver IntegrityChecker.verify)
+        """
+        self._sync()
+        checker = IntegrityChecker(self.base_path / "integrity_checkpoint.json", workers)
+        targets = {
+            operation: {
+                'index': dict(self._index(operation)),
+                'directory': str(self._dirs[operation]),
+                'segment_path': self._segments[operation].path
+            }
+            for operation in ('chunks', 'documents')
+        }
+        for store in self._segments.values():
+            store.flush()
+        return checker.verify(targets, incremental, progress)
+
     def get_statistics(self) -> Dict[str, Any]:
         """Obtém estatísticas do armazenamento"""
         metadata = self._load_metadata()
-        
-        return {
+
+        stats = {
             "total_chunks": metadata["total_chunks"],
             "total_documents": metadata["total_documents"],
             "created_at": metadata["created_at"],
             "last_updated": metadata["last_updated"],
             "storage_path": str(self.base_path),
-            "chunks_files": len(list(self.chunks_dir.glob("*.pkl"))),
-            "docs_files": len(list(self.docs_dir.glob("*.pkl")))
+            "storage_backend": self.storage_backend,
+            "journal_entries": len(self._journal)
         }
-    
+
+        if self.storage_backend == 'segments':
+            # Contadores mantidos em memória, sem listar arquivos
+            stats["chunks_segments"] = self._segments['chunks'].statistics()
+            stats["docs_segments"] = self._segments['documents'].statistics()
+        else:
+            stats["chunks_files"] = len(list(self.chunks_dir.glob("*.pkl")))
+            stats["docs_files"] = len(list(self.docs_dir.glob("*.pkl")))
+
+        return stats
+
     def clear_all(self) -> bool:
         """Remove todos os dados"""
         try:
             # Remover todos os arquivos de chunks
             for file in self.chunks_dir.glob("*.pkl"):
                 file.unlink()
-            
+
             # Remover todos os arquivos de documentos
             for file in self.docs_dir.glob("*.pkl"):
                 file.unlink()
-            
+
+            # Remover segmentos
+            for store in self._segments.values():
+                store.clear()
+
             # Reinicializar metadata
-            self._init_metadata()
-            
+            with self._exclusive():
+                self._chunk_index = {}
+                self._document_index = {}
+                self._created_at = datetime.now().isoformat()
+                self._compact()
+            self.version += 1
+
             print("FileStore limpo com sucesso")
             return True
-            
+
         except Exception as e:
             print(f"Erro ao limpar FileStore: {e}")
             return False
-    
+
     def close(self):
-        """Método de fechamento (compatibilidade)"""
-        print("FileStore fechado")
\ No newline at end of file
+        """Grava o índice e fecha o journal"""
+        try:
+            if len(self._journal):
+                self.compact()
+            self._journal.close()
+            for store in self._segments.values():
+                store.close()
+        except Exception as e:
+            print(f"Erro ao fechar FileStore: {e}")
+        print("FileStore fechado")
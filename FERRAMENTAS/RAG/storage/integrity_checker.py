@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Verificacao de integridade do FileStore
+Confere os checksums gravados junto com cada objeto (sem desserializar),
+em paralelo, com progresso e checkpoint para execucoes incrementais
+"""
+
+import json
+import os
+import pickle
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Tarefa: (tipo, id, caminho, offset, tamanho, crc32); tamanho/crc None = so desserializar
+Task = Tuple[str, str, str, int, Optional[int], Optional[int]]
+
+
+def _verify_batch(tasks: List[Task]) -> List[Tuple[str, str, Optional[str]]]:
+    """Verifica um lote de registros (executado nos processos do pool)
+
+    Os registros chegam ordenados por (arquivo, offset): cada arquivo e
+    aberto uma vez e lido sequencialmente.
+
+    Returns:
+        Lista de (tipo, id, erro ou None)
+    """
+    results = []
+    handle = None
+    current = None
+    try:
+        for operation, item_id, path, offset, size, checksum in tasks:
+            try:
+                if path != current:
+                    if handle is not None:
+                        handle.close()
+                        handle = None
+                    current = path
+                    handle = open(path, 'rb')
+
+                handle.seek(offset)
+                if size is None:
+                    # Entrada antiga sem checksum: so resta desserializar
+                    pickle.load(handle)
+                    results.append((operation, item_id, None))
+                    continue
+
+                data = handle.read(size)
+                if len(data) != size:
+                    error = f"registro truncado ({len(data)} de {size} bytes)"
+                elif zlib.crc32(data) != checksum:
+                    error = "checksum invalido"
+                else:
+                    error = None
+                results.append((operation, item_id, error))
+            except Exception as e:
+                results.append((operation, item_id, str(e) or type(e).__name__))
+    finally:
+        if handle is not None:
+            handle.close()
+    return results
+
+
+class IntegrityChecker:
+    """Verificador paralelo e incremental dos objetos do FileStore
+
+    O checkpoint guarda as localizacoes verificadas sem erro e a assinatura
+    (mtime, tamanho) de cada arquivo lido. No modo incremental so sao
+    verificados registros novos, com localizacao diferente, com erro na
+    ultima execucao ou em arquivos modificados desde o checkpoint.
+    """
+
+    def __init__(self, checkpoint_file: Path, workers: Optional[int] = None, batch_size: int = 512):
+        self.checkpoint_file = Path(checkpoint_file)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'files': {}, 'verified': {}}
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]):
+        tmp_file = self.checkpoint_file.with_name(self.checkpoint_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(tmp_file, self.checkpoint_file)
+
+    @staticmethod
+    def _task(operation: str, item_id: str, location: Any, directory: str,
+              segment_path: Callable[[int], Path]) -> Task:
+        if isinstance(location, list):
+            segment, offset, size, checksum = location
+            return (operation, item_id, str(segment_path(segment)), offset, size, checksum)
+        if isinstance(location, dict):
+            return (operation, item_id, os.path.join(directory, location['file']), 0,
+                    location['size'], location['crc'])
+        return (operation, item_id, os.path.join(directory, location), 0, None, None)
+
+    @staticmethod
+    def _file_signature(path: str) -> Optional[List[int]]:
+        try:
+            stat = os.stat(path)
+            return [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            return None
+
+    def verify(self, targets: Dict[str, Dict[str, Any]], incremental: bool = False,
+               progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Verifica os registros dos indices informados
+
+        Args:
+            targets: tipo -> {'index': id -> localizacao, 'directory': pasta dos
+                pickles, 'segment_path': numero do segmento -> caminho}
+            incremental: Pula o que nao mudou desde o ultimo checkpoint
+            progress: Funcao progress(verificados, total)
+
+        Returns:
+            dict: por tipo, {'ok', 'errors' (lista de (id, erro)), 'skipped'};
+            mais 'checked', 'skipped', 'elapsed_seconds', 'workers', 'incremental'
+        """
+        start = time.time()
+        previous = self._load_checkpoint() if incremental else {'files': {}, 'verified': {}}
+        report = {operation: {'ok': 0, 'errors': [], 'skipped': 0} for operation in targets}
+
+        signatures = {}
+        verified = {}
+        tasks = []
+        for operation, target in targets.items():
+            previous_verified = previous['verified'].get(operation, {})
+            verified[operation] = {}
+            for item_id, location in target['index'].items():
+                task = self._task(operation, item_id, location, target['directory'], target['segment_path'])
+                path = task[2]
+                if path not in signatures:
+                    signatures[path] = self._file_signature(path)
+
+                unchanged = (
+                    previous_verified.get(item_id) == location
+                    and signatures[path] is not None
+                    and previous['files'].get(path) == signatures[path]
+                )
+                if unchanged:
+                    verified[operation][item_id] = location
+                    report[operation]['skipped'] += 1
+                else:
+                    tasks.append(task)
+
+        tasks.sort(key=lambda task: (task[2], task[3]))
+        batches = [tasks[i:i + self.batch_size] for i in range(0, len(tasks), self.batch_size)]
+        total = len(tasks)
+        done = 0
+
+        def collect(results):
+            nonlocal done
+            for operation, item_id, error in results:
+                if error is None:
+                    report[operation]['ok'] += 1
+                    verified[operation][item_id] = targets[operation]['index'][item_id]
+                else:
+                    report[operation]['errors'].append((item_id, error))
+            done += len(results)
+            if progress is not None:
+                progress(done, total)
+
+        workers = min(self.workers, len(batches))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_verify_batch, batch) for batch in batches]
+                for future in as_completed(futures):
+                    collect(future.result())
+        else:
+            for batch in batches:
+                collect(_verify_batch(batch))
+
+        self._save_checkpoint({
+            'timestamp': datetime.now().isoformat(),
+            'files': {path: signature for path, signature in signatures.items() if signature is not None},
+            'verified': verified
+        })
+
+        report.update({
+            'checked': total,
+            'skipped': sum(report[operation]['skipped'] for operation in targets),
+            'elapsed_seconds': round(time.time() - start, 3),
+            'workers': max(workers, 1),
+            'incremental': incremental
+        })
+        return report
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Armazenamento em segmentos (log-structured) para o FileStore
+Objetos sao anexados a arquivos de segmento; o indice guarda a localizacao
+[segmento, offset, tamanho, crc] de cada registro
+"""
+
+import os
+import pickle
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Localizacao de um registro: [segmento, offset, tamanho, crc32]
+Location = List[int]
+
+
+def lock_file(fd: int, wait: bool = False) -> bool:
+    """Trava exclusiva entre processos em um arquivo aberto (liberada ao fechar)
+
+    Sem `wait`, retorna False se outro processo (ou outro arquivo aberto
+    neste processo) ja detem a trava.
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+class SegmentStore:
+    """Objetos serializados em arquivos de segmento append-only
+
+    Cada segmento cresce ate max_bytes e entao um novo e aberto. Remocoes e
+    sobrescritas apenas deixam bytes mortos no segmento; compact() reescreve
+    os registros vivos em novos segmentos e remove os antigos. Leituras de
+    varios registros sao ordenadas por (segmento, offset), entao uma
+    varredura completa e uma leitura sequencial dos arquivos.
+
+    Cada instancia so anexa a segmentos que ela mesma criou (criacao
+    exclusiva), entao varios escritores (instancias ou processos) no mesmo
+    diretorio nunca gravam no mesmo arquivo e o offset de cada registro e
+    sempre o do proprio escritor. Os segmentos criados ficam travados (arquivo
+    .lock com trava do sistema operacional) ate close(): a compactacao de
+    outros escritores nao reescreve nem remove segmentos travados.
+    """
+
+    def __init__(self, directory: str, prefix: str, max_bytes: int = 64 * 1024 * 1024,
+                 fsync: bool = False):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._pattern = re.compile(rf'^{re.escape(prefix)}_(\d+)\.seg$')
+        self._file = None
+        self._active = None  # Numero do segmento aberto para escrita
+        self._locks = {}  # Segmentos criados por esta instancia -> arquivo .lock travado
+        self._total_bytes = 0
+        self._live_bytes = 0
+        self._live_records = 0
+        self._scan()
+
+    def _path(self, segment: int) -> Path:
+        return self.directory / f"{self.prefix}_{segment:06d}.seg"
+
+    def path(self, segment: int) -> Path:
+        """Caminho do arquivo de um segmento"""
+        return self._path(segment)
+
+    def _lock_path(self, segment: int) -> Path:
+        return self.directory / f"{self.prefix}_{segment:06d}.lock"
+
+    def segments(self) -> List[int]:
+        """Numeros dos segmentos existentes, em ordem"""
+        numbers = []
+        for path in self.directory.iterdir():
+            match = self._pattern.match(path.name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _scan(self):
+        self._total_bytes = sum(self._path(segment).stat().st_size for segment in self.segments())
+
+    # ===== CONTABILIDADE =====
+
+    def attach(self, locations: Iterable[Location]):
+        """Informa as localizacoes vivas (do indice) para contar bytes mortos"""
+        self._live_bytes = 0
+        self._live_records = 0
+        for location in locations:
+            self._live_bytes += location[2]
+            self._live_records += 1
+        self._scan()
+
+    def discard(self, location: Location):
+        """Marca um registro como morto (remocao ou sobrescrita)"""
+        self._live_bytes -= location[2]
+        self._live_records -= 1
+
+    @property
+    def dead_ratio(self) -> float:
+        """Fracao dos bytes dos segmentos que nao pertence a registros vivos"""
+        if not self._total_bytes:
+            return 0.0
+        return max(0.0, 1.0 - self._live_bytes / self._total_bytes)
+
+    def statistics(self) -> Dict[str, Any]:
+        """Estatisticas em O(1) (nao percorre os segmentos)"""
+        return {
+            'records': self._live_records,
+            'segments': len(self.segments()),
+            'total_bytes': self._total_bytes,
+            'live_bytes': self._live_bytes,
+            'dead_ratio': round(self.dead_ratio, 4)
+        }
+
+    # ===== ESCRITA =====
+
+    def _open_active(self):
+        """Abre um segmento novo, criado e travado por esta instancia"""
+        if self._file is not None and self._file.tell() < self.max_bytes:
+            return
+
+        self._close_active()
+        segment = max(self.segments() + list(self._locks), default=0) + 1
+        while True:
+            lock = self._create_lock(segment)
+            if lock is not None:
+                try:
+                    self._file = open(self._path(segment), 'xb')
+                    break
+                except FileExistsError:
+                    self._release_lock(segment)
+            segment += 1  # Numero ja usado por outro escritor
+        self._active = segment
+
+    def _create_lock(self, segment: int):
+        """Cria e trava o .lock de um segmento novo (None se ja existe)"""
+        try:
+            handle = open(self._lock_path(segment), 'xb')
+        except FileExistsError:
+            return None
+        if not lock_file(handle.fileno()):
+            handle.close()
+            return None
+        self._locks[segment] = handle
+        return handle
+
+    def _release_lock(self, segment: int):
+        handle = self._locks.pop(segment, None)
+        if handle is None:
+            return
+        try:
+            self._lock_path(segment).unlink()
+        except OSError:
+            pass  # Windows: arquivo aberto; sem trava, nao bloqueia ninguem
+        handle.close()
+
+    def _in_use(self, segment: int) -> bool:
+        """Verifica se o segmento ainda pode receber registros de outro escritor"""
+        if segment in self._locks:
+            return segment == self._active
+        try:
+            fd = os.open(self._lock_path(segment), os.O_RDWR)
+        except OSError:
+            return False  # Sem .lock: escritor ja fechou o segmento
+        try:
+            return not lock_file(fd)
+        finally:
+            os.close(fd)
+
+    def append_many(self, objects: Iterable[Any]) -> List[Location]:
+        """Anexa objetos e retorna suas localizacoes (na mesma ordem)"""
+        return self._write_records(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL) for obj in objects)
+
+    def _write_records(self, records: Iterable[bytes]) -> List[Location]:
+        locations = []
+        for data in records:
+            self._open_active()
+            offset = self._file.tell()
+            self._file.write(data)
+            locations.append([self._active, offset, len(data), zlib.crc32(data)])
+            self._total_bytes += len(data)
+            self._live_bytes += len(data)
+            self._live_records += 1
+
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        return locations
+
+    # ===== LEITURA =====
+
+    def read_bytes(self, location: Location, handle=None) -> bytes:
+        """Le e verifica os bytes de um registro"""
+        segment, offset, size, checksum = location
+        if handle is None:
+            with open(self._path(segment), 'rb') as f:
+                f.seek(offset)
+                data = f.read(size)
+        else:
+            handle.seek(offset)
+            data = handle.read(size)
+
+        if len(data) != size or zlib.crc32(data) != checksum:
+            raise ValueError(f"Registro corrompido em {self._path(segment).name} (offset {offset})")
+        return data
+
+    def read(self, location: Location) -> Any:
+        """Le um objeto"""
+        if self._file is not None:
+            self._file.flush()
+        return pickle.loads(self.read_bytes(location))
+
+    def _iter_bytes(self, items: Iterable[Tuple[str, Location]]) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """Le registros em ordem fisica, um arquivo aberto por segmento
+
+        Registros corrompidos sao retornados como None.
+        """
+        if self._file is not None:
+            self._file.flush()
+
+        handle = None
+        current = None
+        try:
+            for item_id, location in sorted(items, key=lambda item: (item[1][0], item[1][1])):
+                try:
+                    if location[0] != current:
+                        if handle is not None:
+                            handle.close()
+                            handle = None
+                        current = location[0]
+                        handle = open(self._path(current), 'rb')
+                    yield item_id, self.read_bytes(location, handle)
+                except (OSError, ValueError) as e:
+                    print(f"Erro ao ler registro {item_id}: {e}")
+                    yield item_id, None
+        finally:
+            if handle is not None:
+                handle.close()
+
+    def read_many(self, items: Iterable[Tuple[str, Location]]) -> Iterator[Tuple[str, Optional[Any]]]:
+        """Le varios objetos em ordem fisica (varredura sequencial)
+
+        Registros corrompidos sao retornados como None.
+        """
+        for item_id, data in self._iter_bytes(items):
+            yield item_id, pickle.loads(data) if data is not None else None
+
+    # ===== COMPACTACAO =====
+
+    def compact(self, index: Dict[str, Location]) -> Tuple[Dict[str, Location], List[int]]:
+        """Reescreve os registros vivos em novos segmentos
+
+        Retorna (novo indice, segmentos antigos). Registros corrompidos ficam
+        fora do novo indice. Segmentos ainda travados por outros escritores
+        nao sao reescritos: seus registros mantem a localizacao. Os segmentos
+        antigos so devem ser removidos (remove_segments) depois que o novo
+        indice estiver gravado.
+        """
+        self._close_active()
+        busy = {segment for segment in self.segments() if self._in_use(segment)}
+        old_segments = [segment for segment in self.segments() if segment not in busy]
+        kept = {item_id: location for item_id, location in index.items() if location[0] in busy}
+        moved = {item_id: location for item_id, location in index.items() if location[0] not in busy}
+
+        self._live_bytes = sum(location[2] for location in kept.values())
+        self._live_records = len(kept)
+
+        ids = []
+
+        def records():
+            for item_id, data in self._iter_bytes(moved.items()):
+                if data is not None:
+                    ids.append(item_id)
+                    yield data
+
+        # Novos registros vao para um segmento posterior a todos os antigos
+        locations = self._write_records(records())
+        kept.update(zip(ids, locations))
+        return kept, old_segments
+
+    def remove_segments(self, segments: Iterable[int]):
+        """Remove segmentos antigos (apos a compactacao)
+
+        O segmento ativo e os travados por outros escritores sao mantidos.
+        """
+        for segment in segments:
+            if segment == self._active or self._in_use(segment):
+                continue
+            self._release_lock(segment)
+            path = self._path(segment)
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            try:
+                self._lock_path(segment).unlink()  # .lock de um escritor interrompido
+            except OSError:
+                pass
+        self._scan()
+
+    def clear(self):
+        """Remove todos os segmentos"""
+        self.close()
+        self.remove_segments(self.segments())
+        self._live_bytes = 0
+        self._live_records = 0
+        self._total_bytes = 0
+
+    def flush(self):
+        """Descarrega o segmento aberto para que outros leitores vejam os registros"""
+        if self._file is not None:
+            self._file.flush()
+
+    def _close_active(self):
+        """Fecha o segmento aberto para escrita (a trava e mantida ate close)"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._active = None
+
+    def close(self):
+        """Fecha o segmento aberto e libera as travas dos segmentos criados"""
+        self._close_active()
+        for segment in list(self._locks):
+            self._release_lock(segment)
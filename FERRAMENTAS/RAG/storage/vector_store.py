@@ -8,13 +8,19 @@ import faiss
 import numpy as np
 import pickle
 import json
+import time
+from array import array
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import sys
 import os
+import shutil
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.document import ProcessedChunk, SearchResult
+from storage.write_ahead_log import WriteAheadLog
+from storage.chunk_store import ChunkStore
+from estatisticas_corpus import Distribuicao, LIMITES_QUALIDADE, LIMITES_TAMANHO
 
 class RAGVectorStore:
     """Sistema de armazenamento vetorial para chunks processados"""
@@ -45,15 +51,37 @@ class RAGVectorStore:
         self.max_top_k = self.config.get('max_top_k', 100)
         self.similarity_threshold = self.config.get('similarity_threshold', 0.5)
         
+        # Configuracoes de remocao: fracao de vetores removidos que dispara compactacao
+        self.compaction_ratio = self.config.get('compaction_ratio', 0.2)
+        
+        # Configuracoes de persistencia: log de escrita + checkpoint por tamanho ou tempo
+        self.wal_enabled = self.config.get('wal_enabled', False)
+        self.checkpoint_every = self.config.get('checkpoint_every', 100)  # Operacoes no log
+        self.checkpoint_interval = self.config.get('checkpoint_interval', 300)  # Segundos
+        
         # Inicializar componentes
         self.index = None
-        self.chunks = []  # Cache local dos chunks
-        self.chunk_metadata = {}  # Metadados dos chunks
+        # Chunks em formato colunar (posicao = ID FAISS; None = removido)
+        self.chunks = ChunkStore(str(self.storage_path), self.config.get('chunk_cache_size', 1024))
+        self.chunk_metadata = {}  # chunk_id -> {'internal_id', 'added_timestamp'}
+        self._tombstones = set()  # IDs removidos ainda presentes no indice FAISS
+        
+        # Metadados colunares para pre-filtragem (posicao = indice interno)
+        self._reset_columns()
         
-        # Arquivos de persistência
-        self.index_file = self.storage_path / 'faiss_index.bin'
-        self.chunks_file = self.storage_path / 'chunks.pkl'
-        self.metadata_file = self.storage_path / 'metadata.json'
+        # Arquivos de persistência: cada checkpoint grava indice, chunks e
+        # metadados em uma pasta propria (checkpoint_NNNNNN) e so entao troca o
+        # ponteiro checkpoint.json; sem ponteiro, vale o formato antigo na raiz
+        self.checkpoint_file = self.storage_path / 'checkpoint.json'
+        self.chunks_file = self.storage_path / 'chunks.pkl'  # Formato antigo (migrado no save)
+        self.wal_file = self.storage_path / 'wal.log'
+        self.fsync = self.config.get('wal_fsync', True)
+        self._use_checkpoint_dir(self.storage_path)
+        
+        # Log de escrita: operacoes gravadas desde o ultimo checkpoint
+        self._wal = WriteAheadLog(str(self.wal_file), self.fsync) if self.wal_enabled else None
+        self._replaying = False
+        self._last_checkpoint = time.monotonic()
         
         # Estatisticas
         self.stats = {
@@ -64,8 +92,16 @@ class RAGVectorStore:
             'search_count': 0
         }
         
-        # Tentar carregar indice existente
+        # Controle de recarga: assinatura dos arquivos carregados e alteracoes pendentes
+        self._loaded_signature = None
+        self._dirty = False
+        
+        # Incrementada a cada alteracao do conjunto de chunks (indices derivados comparam a versao)
+        self.version = 0
+        
+        # Tentar carregar indice existente (e operacoes do log posteriores a ele)
         self._load_existing_index()
+        self._replay_wal()
     
     def _create_index(self, dimension: int) -> faiss.Index:
         """Cria indice FAISS baseado na configuracao"""
@@ -79,6 +115,10 @@ class RAGVectorStore:
             index = faiss.IndexIVFFlat(quantizer, dimension, self.nlist)
             index.nprobe = self.nprobe
             
+            # IVF guarda IDs proprios; o hashtable permite reconstruct e remove_ids por ID
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+            return index
+            
         elif self.index_type == 'hnsw':
             # Indice HNSW (Hierarchical Navigable Small World)
             index = faiss.IndexHNSWFlat(dimension, self.hnsw_m)
@@ -88,7 +128,15 @@ class RAGVectorStore:
         else:
             raise ValueError(f"Tipo de indice nao suportado: {self.index_type}")
         
-        return index
+        # IDs estaveis de 64 bits (posicao em self.chunks), independentes da ordem interna
+        return faiss.IndexIDMap2(index)
+    
+    @staticmethod
+    def _has_stable_ids(index: faiss.Index) -> bool:
+        """Verifica se o indice usa IDs explicitos (formato criado por _create_index)"""
+        if isinstance(index, faiss.IndexIDMap2):
+            return True
+        return isinstance(index, faiss.IndexIVF) and index.direct_map.type == faiss.DirectMap.Hashtable
     
     def add_chunks(self, chunks: List[ProcessedChunk]) -> bool:
         """Adiciona chunks ao vector store"""
@@ -100,8 +148,10 @@ class RAGVectorStore:
             new_chunks = []
             new_embeddings = []
             
+            seen_ids = set()
             for chunk in chunks:
-                if chunk.chunk_id not in self.chunk_metadata:
+                if chunk.chunk_id not in self.chunk_metadata and chunk.chunk_id not in seen_ids:
+                    seen_ids.add(chunk.chunk_id)
                     new_chunks.append(chunk)
                     new_embeddings.append(chunk.embedding)
             
@@ -127,30 +177,33 @@ class RAGVectorStore:
             
             # Obter próximo índice interno
             current_size = len(self.chunks)
+            ids = np.arange(current_size, current_size + len(new_chunks), dtype='int64')
             
             # Adicionar embeddings ao indice FAISS
-            self.index.add(embeddings)
+            self.index.add_with_ids(embeddings, ids)
             
             # Armazenar chunks e metadados
             for i, chunk in enumerate(new_chunks):
                 internal_id = current_size + i
                 
-                # Adicionar ao cache local
+                # Adicionar ao armazenamento de chunks
                 self.chunks.append(chunk)
                 
                 # Adicionar metadados
                 self.chunk_metadata[chunk.chunk_id] = {
                     'internal_id': internal_id,
-                    'chunk': chunk,
                     'added_timestamp': datetime.now().isoformat()
                 }
+                self._add_to_columns(internal_id, chunk)
             
             # Atualizar estatisticas
             self._update_stats()
+            self.version += 1
             
             print(f"Adicionados {len(new_chunks)} chunks ao vector store")
-            print(f"Total de chunks: {len(self.chunks)}")
+            print(f"Total de chunks: {self.chunk_count}")
             
+            self._log_operation('add', new_chunks)
             return True
             
         except Exception as e:
@@ -159,60 +212,31 @@ class RAGVectorStore:
     
     def search(self, query_embedding: np.ndarray, top_k: int = None, 
               filters: Dict[str, Any] = None) -> List[SearchResult]:
-        """Busca chunks similares usando embedding da query"""
-        if self.index is None or self.index.ntotal == 0:
+        """Busca chunks similares usando embedding da query
+        
+        Filtros por source_type, document_id, quality_score e chunk_size sao
+        aplicados antes da busca (metadados colunares), entao a busca retorna
+        ate top_k resultados que ja atendem aos filtros.
+        """
+        if self.index is None or self.chunk_count == 0:
             return []
         
-        top_k = min(top_k or self.default_top_k, self.max_top_k, self.index.ntotal)
+        top_k = min(top_k or self.default_top_k, self.max_top_k, self.chunk_count)
         
         try:
-            start_time = datetime.now()
-            
-            # Normalizar query embedding
-            query_embedding = query_embedding.astype('float32').reshape(1, -1)
+            # Normalizar query embedding (copia: o array de quem chamou nao e alterado)
+            query_embedding = np.array(query_embedding, dtype='float32').reshape(1, -1)
             faiss.normalize_L2(query_embedding)
             
-            # Buscar no indice FAISS
-            scores, indices = self.index.search(query_embedding, top_k * 2)  # Buscar mais para filtrar
+            # Buscar no indice FAISS (pre-filtrado quando ha filtros)
+            candidate_ids = self._candidate_ids(filters) if filters else None
+            if candidate_ids is None:
+                scores, indices = self.index.search(query_embedding, top_k, params=self._live_search_params())
+                scores, indices = scores[0], indices[0]
+            else:
+                scores, indices = self._search_candidates(query_embedding, candidate_ids, top_k)
             
-            # Converter resultados
-            results = []
-            for i, (score, faiss_idx) in enumerate(zip(scores[0], indices[0])):
-                if faiss_idx == -1:  # FAISS retorna -1 para resultados invalidos
-                    continue
-                
-                # Aplicar threshold de similaridade
-                if score < self.similarity_threshold:
-                    continue
-                
-                # Obter chunk do cache local
-                chunk = self._get_chunk_by_index(int(faiss_idx))
-                if not chunk:
-                    continue
-                
-                # Aplicar filtros se especificados
-                if filters and not self._apply_filters(filters, chunk):
-                    continue
-                
-                # Criar resultado
-                search_result = SearchResult(
-                    chunk=chunk,
-                    score=float(score),
-                    query="",  # Query sera definida externamente
-                    rank=len(results) + 1,
-                    search_type="semantic",
-                    search_metadata={
-                        'faiss_index': int(faiss_idx),
-                        'original_score': float(score),
-                        'index_type': self.index_type
-                    }
-                )
-                
-                results.append(search_result)
-                
-                # Parar quando atingir top_k
-                if len(results) >= top_k:
-                    break
+            results = self._build_results(scores, indices, top_k)
             
             # Atualizar estatisticas
             self.stats['search_count'] += 1
@@ -223,6 +247,215 @@ class RAGVectorStore:
             print(f"Erro na busca: {e}")
             return []
     
+    def _build_results(self, scores: np.ndarray, indices: np.ndarray, top_k: int) -> List[SearchResult]:
+        """Converte saida da busca FAISS em SearchResult"""
+        results = []
+        for score, faiss_idx in zip(scores, indices):
+            if faiss_idx == -1:  # FAISS retorna -1 para resultados invalidos
+                continue
+            
+            # Aplicar threshold de similaridade
+            if score < self.similarity_threshold:
+                continue
+            
+            # Obter chunk do cache local
+            chunk = self._get_chunk_by_index(int(faiss_idx))
+            if not chunk:
+                continue
+            
+            results.append(SearchResult(
+                chunk=chunk,
+                score=float(score),
+                query="",  # Query sera definida externamente
+                rank=len(results) + 1,
+                search_type="semantic",
+                search_metadata={
+                    'faiss_index': int(faiss_idx),
+                    'original_score': float(score),
+                    'index_type': self.index_type
+                }
+            ))
+            
+            # Parar quando atingir top_k
+            if len(results) >= top_k:
+                break
+        
+        return results
+    
+    def _search_candidates(self, query_embedding: np.ndarray, candidate_ids: np.ndarray,
+                           top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Busca restrita a um subconjunto de indices internos
+        
+        Flat/HNSW: calcula similaridade exata apenas dos candidatos (custo
+        proporcional ao subconjunto; o grafo HNSW perde resultados com
+        seletores esparsos). IVF: usa IDSelector do FAISS.
+        """
+        k = min(top_k, len(candidate_ids))
+        if k == 0:
+            return np.array([], dtype='float32'), np.array([], dtype='int64')
+        
+        if self.index_type in ('flat', 'hnsw'):
+            vectors = self.index.reconstruct_batch(candidate_ids)
+            similarities = vectors @ query_embedding[0]
+            
+            if k < len(similarities):
+                top = np.argpartition(-similarities, k - 1)[:k]
+            else:
+                top = np.arange(len(similarities))
+            top = top[np.argsort(-similarities[top])]
+            
+            scores = similarities[top]
+            if self.index.metric_type == faiss.METRIC_L2:
+                # Mesma escala do indice: distancia L2 ao quadrado entre vetores normalizados
+                scores = 2 - 2 * scores
+            return scores, candidate_ids[top]
+        
+        selector = faiss.IDSelectorBatch(candidate_ids)
+        return self._search_with_selector(query_embedding, k, selector)
+    
+    def _live_search_params(self) -> Optional[faiss.SearchParameters]:
+        """Parametros de busca que excluem IDs removidos (None se nao houver)"""
+        if not self._tombstones:
+            return None
+        
+        removed = np.fromiter(self._tombstones, dtype='int64', count=len(self._tombstones))
+        return self._search_params(faiss.IDSelectorNot(faiss.IDSelectorBatch(removed)))
+    
+    def _search_params(self, selector) -> faiss.SearchParameters:
+        """Parametros de busca com seletor de IDs para o tipo de indice"""
+        if self.index_type == 'ivf':
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        return faiss.SearchParameters(sel=selector)
+    
+    def _search_with_selector(self, query_embedding: np.ndarray, k: int,
+                              selector) -> Tuple[np.ndarray, np.ndarray]:
+        """Busca FAISS restrita aos IDs aceitos pelo seletor"""
+        scores, indices = self.index.search(query_embedding, k, params=self._search_params(selector))
+        return scores[0], indices[0]
+    
+    def _reset_columns(self):
+        """Limpa os metadados colunares usados na pre-filtragem"""
+        self._ids_by_source_type = {}  # source_type -> {indices internos}
+        self._ids_by_document = {}  # document_id -> {indices internos}
+        self._quality_column = array('f')
+        self._size_column = array('q')
+        self._alive_column = bytearray()  # 0 = chunk removido
+        # Distribuicoes mantidas a cada inclusao/remocao (get_statistics em O(1))
+        self._quality_stats = Distribuicao(LIMITES_QUALIDADE)
+        self._size_stats = Distribuicao(LIMITES_TAMANHO)
+    
+    def _add_to_columns(self, internal_id: int, chunk):
+        """Registra um chunk nos metadados colunares"""
+        if chunk is None:
+            # Posicao removida: mantem o alinhamento das colunas com os IDs
+            self._quality_column.append(0.0)
+            self._size_column.append(0)
+            self._alive_column.append(0)
+            return
+        
+        self._ids_by_source_type.setdefault(chunk.source_type, set()).add(internal_id)
+        self._ids_by_document.setdefault(chunk.document_id, set()).add(internal_id)
+        self._quality_column.append(chunk.quality_score)
+        self._size_column.append(chunk.chunk_size)
+        self._alive_column.append(1)
+        self._quality_stats.adicionar(round(float(chunk.quality_score), 6))  # Coluna guarda float32
+        self._size_stats.adicionar(chunk.chunk_size)
+    
+    def _remove_from_columns(self, internal_id: int, chunk):
+        """Retira um chunk dos metadados colunares (a posicao continua reservada)"""
+        ids = self._ids_by_source_type.get(chunk.source_type)
+        if ids is not None:
+            ids.discard(internal_id)
+            if not ids:
+                del self._ids_by_source_type[chunk.source_type]
+        self._alive_column[internal_id] = 0
+        self._quality_stats.remover(round(float(chunk.quality_score), 6))
+        self._size_stats.remover(chunk.chunk_size)
+    
+    def _rebuild_columns(self):
+        """Reconstroi os metadados colunares a partir de self.chunks"""
+        self._reset_columns()
+        for internal_id in range(len(self.chunks)):
+            self._add_to_columns(internal_id, self.chunks.summary(internal_id))
+    
+    def _candidate_ids(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Indices internos que atendem aos filtros (None = sem restricao)"""
+        candidates = None
+        
+        # Particoes por tipo de fonte e por documento (custo proporcional ao subconjunto)
+        for key, partitions in (('source_type', self._ids_by_source_type),
+                                ('document_id', self._ids_by_document)):
+            if key not in filters:
+                continue
+            allowed = filters[key]
+            if isinstance(allowed, str):
+                allowed = [allowed]
+            ids = set().union(*(partitions.get(value, ()) for value in allowed))
+            ids = np.array(sorted(ids), dtype='int64')
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids)
+        
+        # Filtros numericos sobre as colunas
+        quality = np.frombuffer(self._quality_column, dtype=np.float32)
+        sizes = np.frombuffer(self._size_column, dtype=np.int64)
+        
+        masks = []
+        quality_filter = filters.get('quality_score')
+        if isinstance(quality_filter, dict):
+            masks.append((quality, quality_filter.get('min', 0), quality_filter.get('max', 1)))
+        elif isinstance(quality_filter, (int, float)):
+            masks.append((quality, quality_filter, float('inf')))
+        
+        size_filter = filters.get('chunk_size')
+        if isinstance(size_filter, dict):
+            masks.append((sizes, size_filter.get('min', 0), size_filter.get('max', float('inf'))))
+        
+        for column, min_value, max_value in masks:
+            if candidates is None:
+                alive = np.frombuffer(self._alive_column, dtype=np.uint8).astype(bool)
+                candidates = np.nonzero(alive & (column >= min_value) & (column <= max_value))[0].astype('int64')
+            else:
+                values = column[candidates]
+                candidates = candidates[(values >= min_value) & (values <= max_value)]
+        
+        return candidates
+    
+    def search_by_source_type(self, query_embeddings: np.ndarray, top_k_by_type: Dict[str, int],
+                              query_row_by_type: Optional[Dict[str, int]] = None) -> Dict[str, List[SearchResult]]:
+        """Busca varios tipos de fonte, uma particao de source_type por vez
+        
+        Args:
+            query_embeddings: Matriz (n_queries x dim) com os embeddings das queries
+            top_k_by_type: Numero de resultados desejado por source_type
+            query_row_by_type: Linha de query_embeddings usada por cada tipo (padrao: 0)
+            
+        Returns:
+            Dicionario source_type -> lista de SearchResult
+        """
+        results = {source_type: [] for source_type in top_k_by_type}
+        if self.index is None or self.chunk_count == 0 or not top_k_by_type:
+            return results
+        
+        query_row_by_type = query_row_by_type or {}
+        
+        try:
+            queries = np.array(query_embeddings, dtype='float32')
+            queries = np.ascontiguousarray(queries.reshape(-1, queries.shape[-1]))
+            faiss.normalize_L2(queries)
+            
+            # Uma busca por particao de tipo, sem buscar resultados a mais
+            for source_type, top_k in top_k_by_type.items():
+                row = query_row_by_type.get(source_type, 0)
+                candidate_ids = self._candidate_ids({'source_type': source_type})
+                scores, indices = self._search_candidates(queries[row:row + 1], candidate_ids, top_k)
+                results[source_type] = self._build_results(scores, indices, top_k)
+            
+            self.stats['search_count'] += 1
+            return results
+            
+        except Exception as e:
+            print(f"Erro na busca por tipo de fonte: {e}")
+            return results
+    
     def search_with_context(self, query_embedding: np.ndarray, top_k: int = None,
                            context_window: int = 1) -> List[SearchResult]:
         """Busca com contexto de chunks adjacentes"""
@@ -240,7 +473,7 @@ class RAGVectorStore:
         context_chunks = []
         
         # Buscar chunks do mesmo documento
-        document_chunks = [c for c in self.chunks if c.document_id == chunk.document_id]
+        document_chunks = self.get_chunks_by_document(chunk.document_id)
         document_chunks.sort(key=lambda x: x.chunk_index)
         
         # Encontrar posicao do chunk atual
@@ -267,136 +500,152 @@ class RAGVectorStore:
             return self.chunks[index]
         return None
     
-    def _apply_filters(self, filters: Dict[str, Any], chunk: ProcessedChunk) -> bool:
-        """Aplica filtros a um chunk"""
-        # Filtro por tipo de fonte
-        if 'source_type' in filters:
-            allowed_sources = filters['source_type']
-            if isinstance(allowed_sources, str):
-                allowed_sources = [allowed_sources]
-            if chunk.source_type not in allowed_sources:
-                return False
-        
-        # Filtro por score de qualidade
-        if 'quality_score' in filters:
-            quality_filter = filters['quality_score']
-            if isinstance(quality_filter, dict):
-                min_score = quality_filter.get('min', 0)
-                max_score = quality_filter.get('max', 1)
-                if not (min_score <= chunk.quality_score <= max_score):
-                    return False
-            elif isinstance(quality_filter, (int, float)):
-                if chunk.quality_score < quality_filter:
-                    return False
-        
-        # Filtro por documento
-        if 'document_id' in filters:
-            allowed_docs = filters['document_id']
-            if isinstance(allowed_docs, str):
-                allowed_docs = [allowed_docs]
-            if chunk.document_id not in allowed_docs:
-                return False
-        
-        # Filtro por tamanho do chunk
-        if 'chunk_size' in filters:
-            size_filter = filters['chunk_size']
-            if isinstance(size_filter, dict):
-                min_size = size_filter.get('min', 0)
-                max_size = size_filter.get('max', float('inf'))
-                if not (min_size <= chunk.chunk_size <= max_size):
-                    return False
-        
-        return True
-    
     def get_chunk_by_id(self, chunk_id: str) -> Optional[ProcessedChunk]:
         """Obtem chunk por ID"""
         metadata = self.chunk_metadata.get(chunk_id)
         if metadata:
-            return metadata['chunk']
+            return self.chunks[metadata['internal_id']]
         return None
     
+    @property
+    def chunk_count(self) -> int:
+        """Numero de chunks ativos (sem contar os removidos)"""
+        return len(self.chunk_metadata)
+    
+    def iter_chunks(self):
+        """Itera sobre os chunks ativos, na ordem de insercao"""
+        return (self.chunks[int(internal_id)] for internal_id in self.chunks.live_ids())
+    
     def get_chunks_by_document(self, document_id: str) -> List[ProcessedChunk]:
         """Obtem todos os chunks de um documento"""
-        chunks = []
-        for chunk in self.chunks:
-            if chunk.document_id == document_id:
-                chunks.append(chunk)
-        return chunks
+        ids = sorted(self._ids_by_document.get(document_id, ()))
+        return [self.chunks[i] for i in ids]
     
     def remove_chunks_by_document(self, document_id: str) -> int:
-        """Remove todos os chunks de um documento"""
+        """Remove todos os chunks de um documento
+        
+        Os IDs removidos viram tombstones: saem imediatamente dos resultados
+        de busca, e o indice FAISS so e compactado quando a fracao de
+        removidos passa de compaction_ratio. Custo proporcional ao numero
+        de chunks do documento.
+        """
         try:
-            removed_count = 0
-            chunks_to_keep = []
-            
-            # Filtrar chunks
-            for chunk in self.chunks:
-                if chunk.document_id == document_id:
-                    removed_count += 1
-                    # Remover dos metadados
-                    if chunk.chunk_id in self.chunk_metadata:
-                        del self.chunk_metadata[chunk.chunk_id]
-                else:
-                    chunks_to_keep.append(chunk)
+            ids = self._ids_by_document.pop(document_id, None)
+            if not ids:
+                return 0
             
-            # Atualizar lista de chunks
-            self.chunks = chunks_to_keep
+            for internal_id in ids:
+                summary = self.chunks.summary(internal_id)
+                self.chunks[internal_id] = None
+                self.chunk_metadata.pop(summary.chunk_id, None)
+                self._remove_from_columns(internal_id, summary)
             
-            if removed_count > 0:
-                print(f"Removidos {removed_count} chunks do documento {document_id}")
-                print("Reconstruindo índice FAISS...")
-                self.rebuild_index()
+            self._tombstones.update(ids)
+            self._update_stats()
+            self.version += 1
             
-            return removed_count
+            print(f"Removidos {len(ids)} chunks do documento {document_id}")
+            self._log_operation('remove', document_id)
+            self._maybe_compact()
+            
+            return len(ids)
             
         except Exception as e:
             print(f"Erro ao remover chunks do documento {document_id}: {e}")
             return 0
     
+    def _maybe_compact(self):
+        """Compacta o indice se a fracao de tombstones passou do limite"""
+        if self.index is None or self.index.ntotal == 0:
+            return
+        
+        if len(self._tombstones) / self.index.ntotal >= self.compaction_ratio:
+            self.compact()
+    
+    def compact(self) -> bool:
+        """Remove fisicamente do indice FAISS os vetores marcados como removidos
+        
+        Flat e IVF removem os IDs no proprio indice; HNSW nao suporta remocao,
+        entao o grafo e recriado a partir dos vetores ativos. Os IDs dos
+        chunks ativos nao mudam.
+        """
+        if self.index is None or not self._tombstones:
+            return True
+        
+        try:
+            removed = np.fromiter(self._tombstones, dtype='int64', count=len(self._tombstones))
+            
+            if self.index_type == 'hnsw':
+                live_ids = self.chunks.live_ids()
+                vectors = self.index.reconstruct_batch(live_ids) if len(live_ids) else None
+                self.index = self._create_index(self.embedding_dim)
+                if vectors is not None:
+                    self.index.add_with_ids(vectors, live_ids)
+            elif self.index_type == 'ivf':
+                # Direct map em hashtable so aceita IDSelectorArray
+                self.index.remove_ids(faiss.IDSelectorArray(removed))
+            else:
+                self.index.remove_ids(faiss.IDSelectorBatch(removed))
+            
+            print(f"Índice FAISS compactado: {len(removed)} vetores removidos, {self.index.ntotal} ativos")
+            self._tombstones.clear()
+            self._update_stats()
+            return True
+            
+        except Exception as e:
+            print(f"Erro ao compactar índice: {e}")
+            return False
+    
     def rebuild_index(self) -> bool:
         """Reconstrói índice FAISS a partir dos chunks válidos"""
         try:
             print("Reconstruindo índice FAISS...")
+            self._tombstones.clear()
             
-            if not self.chunks:
-                print("Nenhum chunk encontrado para reconstrução")
-                self.index = self._create_index(self.embedding_dim)
-                return True
+            # Filtrar chunks com embeddings válidos (mantendo os IDs atuais)
+            valid_ids = []
+            for internal_id in self.chunks.live_ids():
+                internal_id = int(internal_id)
+                chunk = self.chunks[internal_id]
+                if chunk.embedding is not None and len(chunk.embedding) > 0:
+                    valid_ids.append(internal_id)
+                else:
+                    self.chunks[internal_id] = None
+                    self.chunk_metadata.pop(chunk.chunk_id, None)
+            self._rebuild_columns()
             
-            # Filtrar chunks com embeddings válidos
-            valid_chunks = [chunk for chunk in self.chunks if chunk.embedding and len(chunk.embedding) > 0]
+            # Criar novo índice
+            self.index = self._create_index(self.embedding_dim)
             
-            if not valid_chunks:
+            if not valid_ids:
                 print("Nenhum chunk com embeddings válidos encontrado")
-                self.index = self._create_index(self.embedding_dim)
+                self._update_stats()
                 return True
             
-            print(f"Reconstruindo com {len(valid_chunks)} chunks válidos")
-            
-            # Criar novo índice
-            self.index = self._create_index(self.embedding_dim)
+            print(f"Reconstruindo com {len(valid_ids)} chunks válidos")
             
             # Preparar embeddings
-            embeddings = np.array([chunk.embedding for chunk in valid_chunks], dtype=np.float32)
+            embeddings = np.array([self.chunks[i].embedding for i in valid_ids], dtype=np.float32)
+            faiss.normalize_L2(embeddings)
             
             # Treinar índice se necessário
-            if hasattr(self.index, 'is_trained') and not self.index.is_trained:
+            if not self.index.is_trained:
                 self.index.train(embeddings)
             
             # Adicionar embeddings
-            self.index.add(embeddings)
+            self.index.add_with_ids(embeddings, np.array(valid_ids, dtype='int64'))
             
-            # Atualizar chunks e metadados
-            self.chunks = valid_chunks
-            self.chunk_metadata = {}
-            for i, chunk in enumerate(valid_chunks):
+            # Atualizar metadados
+            for internal_id in valid_ids:
+                chunk = self.chunks[internal_id]
+                previous = self.chunk_metadata.get(chunk.chunk_id, {})
                 self.chunk_metadata[chunk.chunk_id] = {
-                    'internal_id': i,
-                    'chunk': chunk,
-                    'added_timestamp': datetime.now().isoformat()
+                    'internal_id': internal_id,
+                    'added_timestamp': previous.get('added_timestamp', datetime.now().isoformat())
                 }
             
             # Salvar índice reconstruído
+            self._dirty = True
             self.save_index()
             
             print(f"Índice reconstruído com sucesso: {self.index.ntotal} vetores")
@@ -407,19 +656,45 @@ class RAGVectorStore:
             return False
     
     def save_index(self, path: Optional[str] = None) -> bool:
-        """Salva índice FAISS e dados no disco"""
+        """Salva índice FAISS e dados no disco
+        
+        Funciona como checkpoint: indice, chunks e metadados vao para uma
+        pasta nova, o ponteiro checkpoint.json e substituido por ultimo e so
+        entao o log de escrita e esvaziado. Uma interrupcao em qualquer ponto
+        deixa o checkpoint anterior intacto (mais o log) ou o novo completo.
+        
+        Args:
+            path: Se informado, apenas exporta uma copia do indice FAISS para
+                esse caminho (o checkpoint nao e alterado)
+        """
         if self.index is None:
             print("Nenhum índice para salvar")
             return False
         
+        if path is not None:
+            try:
+                faiss.write_index(self.index, path)
+                return True
+            except Exception as e:
+                print(f"Erro ao exportar índice: {e}")
+                return False
+        
         try:
+            # Vetores removidos nao vao para o disco
+            if self._tombstones:
+                self.compact()
+            
+            previous_dir = self.checkpoint_dir
+            checkpoint_dir = self._next_checkpoint_dir()
+            if checkpoint_dir.exists():
+                shutil.rmtree(checkpoint_dir)  # Restos de um checkpoint interrompido
+            checkpoint_dir.mkdir(parents=True)
+            
             # Salvar índice FAISS
-            index_path = path or str(self.index_file)
-            faiss.write_index(self.index, index_path)
+            faiss.write_index(self.index, str(checkpoint_dir / self.index_file.name))
             
-            # Salvar chunks
-            with open(self.chunks_file, 'wb') as f:
-                pickle.dump(self.chunks, f)
+            # Salvar chunks (formato colunar)
+            self.chunks.save(str(checkpoint_dir))
             
             # Salvar metadados
             metadata = {
@@ -427,24 +702,98 @@ class RAGVectorStore:
                 'stats': self.stats,
                 'last_updated': datetime.now().isoformat()
             }
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
+            with open(checkpoint_dir / self.metadata_file.name, 'w', encoding='utf-8') as f:
                 json.dump(metadata, f, indent=2, ensure_ascii=False)
             
-            print(f"Dados salvos: {len(self.chunks)} chunks")
+            # Publicar o checkpoint: o ponteiro e o ultimo arquivo gravado
+            if self.fsync:
+                self._fsync_files(checkpoint_dir)
+            pointer = {'directory': checkpoint_dir.name, 'timestamp': datetime.now().isoformat()}
+            pointer_tmp = self.checkpoint_file.with_name(self.checkpoint_file.name + '.tmp')
+            with open(pointer_tmp, 'w', encoding='utf-8') as f:
+                json.dump(pointer, f)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(pointer_tmp, self.checkpoint_file)
+            self._use_checkpoint_dir(checkpoint_dir)
+            
+            # Operacoes do log agora estao no checkpoint
+            if self._wal is not None:
+                self._wal.truncate()
+            self._last_checkpoint = time.monotonic()
+            
+            # O checkpoint anterior fica para leitores que ainda o estejam carregando
+            self._remove_old_checkpoints(keep={checkpoint_dir, previous_dir})
+            
+            self._loaded_signature = self._storage_signature()
+            self._dirty = False
+            
+            print(f"Dados salvos: {self.chunk_count} chunks")
             return True
         except Exception as e:
             print(f"Erro ao salvar dados: {e}")
             return False
     
+    def _use_checkpoint_dir(self, checkpoint_dir: Path):
+        """Aponta os arquivos de indice, metadados e chunks para a pasta do checkpoint"""
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.index_file = self.checkpoint_dir / 'faiss_index.bin'
+        self.metadata_file = self.checkpoint_dir / 'metadata.json'
+        self.chunks.set_directory(str(self.checkpoint_dir))
+    
+    def _read_checkpoint_pointer(self) -> Path:
+        """Pasta do checkpoint publicado (a raiz, no formato antigo sem ponteiro)"""
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                return self.storage_path / json.load(f)['directory']
+        except FileNotFoundError:
+            return self.storage_path
+    
+    def _next_checkpoint_dir(self) -> Path:
+        """Pasta do proximo checkpoint (numeracao crescente)"""
+        numbers = [int(path.name.split('_')[1]) for path in self.storage_path.glob('checkpoint_*')
+                   if path.is_dir() and path.name.split('_')[1].isdigit()]
+        return self.storage_path / f"checkpoint_{max(numbers, default=0) + 1:06d}"
+    
+    @staticmethod
+    def _fsync_files(directory: Path):
+        """Garante no disco os arquivos da pasta antes de publica-la"""
+        for file in directory.iterdir():
+            with open(file, 'rb') as f:
+                os.fsync(f.fileno())
+    
+    def _remove_old_checkpoints(self, keep: set):
+        """Remove checkpoints substituidos (erros sao ignorados: arquivos em uso)"""
+        for checkpoint_dir in self.storage_path.glob('checkpoint_*'):
+            if checkpoint_dir.is_dir() and checkpoint_dir not in keep:
+                shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        
+        # Formato antigo na raiz, ja migrado para uma pasta de checkpoint
+        if self.storage_path not in keep:
+            legacy = ChunkStore(str(self.storage_path))
+            for file in [self.storage_path / 'faiss_index.bin', self.storage_path / 'metadata.json',
+                         self.chunks_file] + legacy.files:
+                try:
+                    file.unlink()
+                except OSError:
+                    pass
+    
     def _load_existing_index(self) -> bool:
         """Carrega indice FAISS existente"""
+        # Registrar assinatura antes da leitura: mudancas posteriores serao detectadas
+        self._loaded_signature = self._storage_signature()
+        
         try:
+            # Checkpoint publicado (o ponteiro so muda quando a pasta esta completa)
+            self._use_checkpoint_dir(self._read_checkpoint_pointer())
+            
             # Verificar se arquivos existem
             if not self.index_file.exists():
                 print("Nenhum índice FAISS encontrado")
                 return False
                 
-            if not self.chunks_file.exists():
+            if not self.chunks.exists() and not self.chunks_file.exists():
                 print("Nenhum arquivo de chunks encontrado")
                 return False
             
@@ -452,25 +801,44 @@ class RAGVectorStore:
             self.index = faiss.read_index(str(self.index_file))
             print(f"Índice FAISS carregado: {self.index.ntotal} vetores")
             
-            # Carregar chunks
-            with open(self.chunks_file, 'rb') as f:
-                self.chunks = pickle.load(f)
+            # Carregar chunks (arquivos mapeados; texto e decodificado sob demanda)
+            legacy_chunks = not self.chunks.exists()
+            if legacy_chunks:
+                # Formato antigo: lista pickled, convertida no proximo save
+                self.chunks.clear()
+                with open(self.chunks_file, 'rb') as f:
+                    self.chunks.extend(pickle.load(f))
+            else:
+                self.chunks.load()
             
             # Carregar metadados se existir
+            saved_metadata = {}
             if self.metadata_file.exists():
                 with open(self.metadata_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.chunk_metadata = data.get('chunk_metadata', {})
+                    saved_metadata = data.get('chunk_metadata', {})
                     self.stats = data.get('stats', self.stats)
             
-            # Reconstruir metadados se necessário
-            if not self.chunk_metadata:
-                for i, chunk in enumerate(self.chunks):
-                    self.chunk_metadata[chunk.chunk_id] = {
-                        'internal_id': i,
-                        'chunk': chunk,
-                        'added_timestamp': datetime.now().isoformat()
-                    }
+            # Reconstruir metadados a partir da tabela de chunks
+            self.chunk_metadata = {}
+            for i, summary in self.chunks.summaries():
+                saved = saved_metadata.get(summary.chunk_id, {})
+                self.chunk_metadata[summary.chunk_id] = {
+                    'internal_id': i,
+                    'added_timestamp': saved.get('added_timestamp', datetime.now().isoformat())
+                }
+            self._rebuild_columns()
+            self._tombstones = set()
+            
+            # Indices antigos (sem IDs explicitos): migrar para IndexIDMap2
+            if not self._has_stable_ids(self.index):
+                print("Índice FAISS sem IDs estáveis, migrando...")
+                self.embedding_dim = self.index.d
+                self.rebuild_index()
+            elif legacy_chunks:
+                print("Chunks no formato antigo, convertendo para formato colunar...")
+                self._dirty = True
+                self.save_index()
             
             # Atualizar estatísticas
             self._update_stats()
@@ -484,13 +852,120 @@ class RAGVectorStore:
             traceback.print_exc()
             return False
     
-
+    def _replay_wal(self) -> int:
+        """Reaplica as operacoes do log de escrita posteriores ao ultimo checkpoint"""
+        if self._wal is None:
+            return 0
+        
+        applied = 0
+        self._replaying = True
+        try:
+            for operation, payload in self._wal.replay():
+                if operation == 'add':
+                    self.add_chunks(payload)
+                elif operation == 'remove':
+                    self.remove_chunks_by_document(payload)
+                else:
+                    print(f"Operação desconhecida no log de escrita: {operation}")
+                    continue
+                applied += 1
+        except Exception as e:
+            print(f"Erro ao reaplicar log de escrita: {e}")
+        finally:
+            self._replaying = False
+        
+        if applied:
+            print(f"Log de escrita reaplicado: {applied} operações")
+        self._loaded_signature = self._storage_signature()
+        return applied
     
-
+    def _log_operation(self, operation: str, payload: Any):
+        """Registra uma alteracao no log de escrita e dispara checkpoint se necessario
+        
+        Sem log de escrita, a alteracao fica apenas em memoria ate o
+        proximo save_index.
+        """
+        if self._replaying:
+            return
+        
+        if self._wal is None:
+            self._dirty = True
+            return
+        
+        try:
+            self._wal.append(operation, payload)
+        except Exception as e:
+            print(f"Erro ao gravar log de escrita: {e}")
+            self._dirty = True
+            return
+        
+        if (len(self._wal) >= self.checkpoint_every
+                or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval):
+            if self.save_index():
+                return
+        
+        # A alteracao ja esta no disco (log): nao conta como mudanca externa
+        self._loaded_signature = self._storage_signature()
+    
+    def checkpoint(self) -> bool:
+        """Grava o estado completo e esvazia o log de escrita"""
+        if self._wal is not None and len(self._wal) == 0 and not self._dirty:
+            return True
+        return self.save_index()
+    
+    def _storage_signature(self) -> Tuple:
+        """Assinatura (mtime, tamanho) dos arquivos persistidos do indice"""
+        signature = []
+        for file in (self.checkpoint_file, self.index_file, self.chunks.table_file, self.wal_file):
+            try:
+                stat = file.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def has_changed_on_disk(self) -> bool:
+        """Verifica se os arquivos do indice mudaram desde o ultimo load/save"""
+        return self._storage_signature() != self._loaded_signature
+    
+    def reload(self) -> bool:
+        """Descarta o estado em memoria e recarrega indice e chunks do disco"""
+        self.index = None
+        self.chunks.clear()
+        self.chunk_metadata = {}
+        self._tombstones = set()
+        self._reset_columns()
+        self._loaded_signature = None
+        self._dirty = False
+        if self._wal is not None:
+            self._wal.close()
+        loaded = self._load_existing_index()
+        self.version += 1
+        return self._replay_wal() > 0 or loaded
+    
+    def reload_if_changed(self) -> bool:
+        """Recarrega do disco apenas se os arquivos mudaram
+        
+        Alteracoes em memoria ainda nao salvas tem prioridade: nesse caso
+        a recarga e ignorada para nao descartar dados.
+        
+        Returns:
+            bool: True se o indice foi recarregado
+        """
+        if not self.has_changed_on_disk():
+            return False
+        
+        if self._dirty:
+            print("Índice alterado no disco, mas há chunks não salvos em memória; recarga ignorada")
+            return False
+        
+        print("Índice FAISS alterado no disco, recarregando...")
+        self.reload()
+        return True
     
     def _update_stats(self):
         """Atualiza estatisticas do vector store"""
-        self.stats['total_chunks'] = self.index.ntotal if self.index else 0
+        self.stats['total_chunks'] = self.chunk_count
         self.stats['total_documents'] = 0  # Será obtido do SQLite quando necessário
         self.stats['index_size'] = self.index.ntotal if self.index else 0
         self.stats['last_updated'] = datetime.now().isoformat()
@@ -499,24 +974,19 @@ class RAGVectorStore:
         """Obtem estatisticas do vector store"""
         try:
             # Calcular estatísticas dos documentos
-            document_ids = set(chunk.document_id for chunk in self.chunks)
-            source_distribution = {}
-            quality_scores = []
-            
-            for chunk in self.chunks:
-                # Distribuição por tipo de fonte
-                source_type = chunk.source_type
-                source_distribution[source_type] = source_distribution.get(source_type, 0) + 1
-                
-                # Scores de qualidade
-                quality_scores.append(chunk.quality_score)
+            document_ids = set(self._ids_by_document)
             
-            avg_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 0
+            # Distribuição por tipo de fonte e scores de qualidade (metadados colunares)
+            source_distribution = {
+                source_type: len(ids) for source_type, ids in self._ids_by_source_type.items()
+            }
+            min_quality, max_quality = self._quality_stats.extremos()
             
             # Estatisticas basicas
             basic_stats = {
-                'total_chunks': len(self.chunks),
+                'total_chunks': self.chunk_count,
                 'total_documents': len(document_ids),
+                'removed_pending_compaction': len(self._tombstones),
                 'index_size': self.index.ntotal if self.index else 0,
                 'embedding_dimension': self.embedding_dim,
                 'index_type': self.index_type,
@@ -549,13 +1019,15 @@ class RAGVectorStore:
                 'source_distribution': source_distribution,
                 'document_distribution': {
                     'total_documents': len(document_ids),
-                    'total_chunks': len(self.chunks)
+                    'total_chunks': self.chunk_count
                 },
                 'quality_metrics': {
-                    'avg_quality_score': avg_quality,
-                    'min_quality': min(quality_scores) if quality_scores else 0,
-                    'max_quality': max(quality_scores) if quality_scores else 0
+                    'avg_quality_score': self._quality_stats.media,
+                    'min_quality': min_quality or 0,
+                    'max_quality': max_quality or 0,
+                    'histogram': self._quality_stats.histograma()
                 },
+                'size_metrics': self._size_stats.resumo(),
                 'index_info': index_info
             }
         except Exception as e:
@@ -563,7 +1035,7 @@ class RAGVectorStore:
             # Retornar estatísticas básicas em caso de erro
             return {
                 'basic_stats': {
-                    'total_chunks': len(self.chunks),
+                    'total_chunks': self.chunk_count,
                     'total_documents': 0,
                     'index_size': self.index.ntotal if self.index else 0,
                     'embedding_dimension': self.embedding_dim,
@@ -586,8 +1058,12 @@ class RAGVectorStore:
         try:
             # Limpar referências
             self.index = None
-            self.chunks = []
+            self.chunks.clear()
             self.chunk_metadata = {}
+            self._tombstones = set()
+            self._reset_columns()
+            if self._wal is not None:
+                self._wal.close()
             
             # Forçar garbage collection
             import gc
@@ -602,19 +1078,25 @@ class RAGVectorStore:
         try:
             # Limpar dados em memória
             self.index = None
-            self.chunks = []
+            self.chunks.clear()
             self.chunk_metadata = {}
+            self._tombstones = set()
+            self._reset_columns()
             
-            # Remover arquivos de persistência
-            if self.index_file.exists():
-                self.index_file.unlink()
-            if self.chunks_file.exists():
-                self.chunks_file.unlink()
-            if self.metadata_file.exists():
-                self.metadata_file.unlink()
+            # Remover arquivos de persistência (checkpoints e formato antigo)
+            self.chunks.release()
+            if self.checkpoint_file.exists():
+                self.checkpoint_file.unlink()
+            self._remove_old_checkpoints(keep=set())
+            self._use_checkpoint_dir(self.storage_path)
+            if self._wal is not None:
+                self._wal.truncate()
             
             # Recriar índice vazio
             self.index = self._create_index(self.embedding_dim)
+            self.version += 1
+            self._loaded_signature = self._storage_signature()
+            self._dirty = False
             
             # Atualizar estatísticas
             self._update_stats()
@@ -631,5 +1113,5 @@ class RAGVectorStore:
             return {
                 'status': 'error',
                 'message': f'Erro ao limpar vector store: {e}',
-                'total_chunks': len(self.chunks)
+                'total_chunks': self.chunk_count
             }
\ No newline at end of file
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Log de escrita antecipada (write-ahead log) para o armazenamento RAG
+Cada operacao e anexada ao fim do arquivo antes de ser considerada gravada;
+o estado completo so e reescrito no checkpoint
+"""
+
+import os
+import pickle
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Iterator, Tuple
+
+# Cabecalho de cada registro: tamanho do payload + CRC32
+_HEADER = struct.Struct('<II')
+
+
+class WriteAheadLog:
+    """Arquivo de operacoes anexadas (append-only) com registros verificados por CRC"""
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._file = None
+        self._records = 0  # Registros desde o ultimo truncate (conhecidos apos replay)
+
+    def __len__(self) -> int:
+        return self._records
+
+    @property
+    def size_bytes(self) -> int:
+        """Tamanho atual do arquivo de log"""
+        try:
+            return self.path.stat().st_size
+        except OSError:
+            return 0
+
+    def append(self, operation: str, payload: Any):
+        """Anexa uma operacao ao log (custo independente do tamanho do indice)"""
+        data = pickle.dumps((operation, payload), protocol=pickle.HIGHEST_PROTOCOL)
+        record = _HEADER.pack(len(data), zlib.crc32(data)) + data
+
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(record)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+        self._records += 1
+
+    def replay(self) -> Iterator[Tuple[str, Any]]:
+        """Le as operacoes registradas, em ordem
+
+        Um registro final incompleto ou corrompido (escrita interrompida) e
+        descartado e o arquivo e truncado no ultimo registro valido.
+        """
+        self._records = 0
+        if not self.path.exists():
+            return
+
+        valid_offset = 0
+        with open(self.path, 'rb') as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+
+                size, checksum = _HEADER.unpack(header)
+                data = f.read(size)
+                if len(data) < size or zlib.crc32(data) != checksum:
+                    break
+
+                valid_offset = f.tell()
+                self._records += 1
+                yield pickle.loads(data)
+
+        if valid_offset < self.size_bytes:
+            print(f"Log de escrita com registro final incompleto, truncando em {valid_offset} bytes")
+            self.close()
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_offset)
+
+    def truncate(self):
+        """Descarta todas as operacoes (chamado apos um checkpoint)"""
+        self.close()
+        with open(self.path, 'wb') as f:
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._records = 0
+
+    def close(self):
+        """Fecha o arquivo de log"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
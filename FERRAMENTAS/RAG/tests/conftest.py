@@ -0,0 +1,64 @@
+"""
+Configuração comum dos testes do RAG
+Os módulos do RAG importam uns aos outros a partir da pasta FERRAMENTAS/RAG
+"""
+
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+RAG_DIR = str(Path(__file__).resolve().parent.parent)
+if RAG_DIR not in sys.path:
+    sys.path.insert(0, RAG_DIR)
+
+from models.document import ProcessedChunk
+
+
+def criar_chunks(quantidade, dimensao=16, semente=0, source_type=None, **extras):
+    """Chunks com embeddings aleatórios normalizados (dispensa modelo de embeddings)"""
+    rng = np.random.default_rng(semente)
+    chunks = []
+    for i in range(quantidade):
+        embedding = rng.random(dimensao).astype('float32')
+        embedding /= np.linalg.norm(embedding)
+        tipo = source_type(i) if callable(source_type) else (source_type or 'documento')
+        chunks.append(ProcessedChunk(
+            text=f'conteudo {i}', embedding=embedding, document_id=f'doc{i}',
+            chunk_index=0, source_type=tipo, **extras
+        ))
+    return chunks
+
+
+@pytest.fixture
+def modelo_falso(monkeypatch):
+    """
+    Substitui o SentenceTransformer por um codificador determinístico
+    (saco de palavras com hash), para testar RAGElis sem baixar o modelo
+    """
+    pytest.importorskip('sentence_transformers')
+    from processing import document_processor
+
+    class ModeloHash:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def get_sentence_embedding_dimension(self):
+            return 384
+
+        def encode(self, textos, **kwargs):
+            unico = isinstance(textos, str)
+            lista = [textos] if unico else list(textos)
+            saida = np.zeros((len(lista), 384), dtype='float32')
+            for i, texto in enumerate(lista):
+                for palavra in texto.lower().split():
+                    saida[i, zlib.crc32(palavra.encode()) % 384] += 1.0
+                norma = np.linalg.norm(saida[i])
+                if norma:
+                    saida[i] /= norma
+            return saida[0] if unico else saida
+
+    monkeypatch.setattr(document_processor, 'SentenceTransformer', ModeloHash)
+    return ModeloHash
@@ -0,0 +1,103 @@
+"""
+Testes do ranqueamento BM25 do RAGFileManager e da BuscaAvancada
+"""
+
+import numpy as np
+import pytest
+
+from busca_avancada import BuscaAvancada
+from models.document import ProcessedChunk, RawDocument
+from rag_file_manager import RAGFileManager
+
+ENCHIMENTO = ' '.join(f'enchimento{i}' for i in range(40))
+
+
+@pytest.fixture(params=['files', 'segments'])
+def gerenciador(request, tmp_path):
+    manager = RAGFileManager(str(tmp_path), {'storage_backend': request.param})
+    yield manager
+    manager.file_store.close()
+
+
+def documento(doc_id, conteudo, titulo=None):
+    return RawDocument(title=titulo or doc_id, content=conteudo, source_type='web', document_id=doc_id)
+
+
+def chunk(chunk_id, conteudo):
+    return ProcessedChunk(conteudo, np.zeros(4, dtype='float32'), f'doc_{chunk_id}', 0, chunk_id=chunk_id)
+
+
+def ids(resultados):
+    return [resultado['id'] for resultado in resultados]
+
+
+def test_termo_raro_supera_termo_comum(gerenciador):
+    # 'comum' aparece em todos os documentos; 'raro' em um só, com o mesmo tamanho
+    gerenciador.file_store.save_documents(
+        [documento('raro', 'raro alfa beta'), documento('comum', 'comum alfa beta')] +
+        [documento(f'outro{i}', 'comum gama delta') for i in range(8)]
+    )
+    gerenciador.file_store.save_chunks(
+        [chunk('raro', 'raro alfa beta'), chunk('comum', 'comum alfa beta')] +
+        [chunk(f'outro{i}', 'comum gama delta') for i in range(8)]
+    )
+    busca = BuscaAvancada(gerenciador)
+
+    documentos = gerenciador.buscar_documentos('comum raro', campo='conteudo')
+    assert ids(documentos)[0] == 'raro'
+    assert documentos[0]['score'] > documentos[1]['score'] > 0
+    assert ids(gerenciador.buscar_chunks('comum raro'))[0] == 'raro'
+
+    # Na busca combinada o termo comum pontua menos que o raro nos mesmos candidatos
+    combinada = busca.busca_combinada({'palavras_chave': ['alfa']}, limite=5)
+    assert sorted(ids(combinada)) == ['comum', 'raro']
+    assert busca.bm25_documentos.pontuar('raro', ['titulo', 'conteudo'])['raro'] > \
+        busca.bm25_documentos.pontuar('comum', ['titulo', 'conteudo'])['comum']
+
+
+def test_campos_longos_sao_normalizados_pelo_tamanho(gerenciador):
+    gerenciador.file_store.save_documents([
+        documento('curto', 'python rede'),
+        documento('longo', f'python {ENCHIMENTO}'),
+        documento('sem_termo', ENCHIMENTO),
+    ])
+    gerenciador.file_store.save_chunks([chunk('curto', 'python rede'), chunk('longo', f'python {ENCHIMENTO}')])
+
+    documentos = gerenciador.buscar_documentos('python', campo='conteudo')
+    assert ids(documentos) == ['curto', 'longo']
+    assert documentos[0]['score'] > documentos[1]['score']
+    assert ids(gerenciador.buscar_chunks('python')) == ['curto', 'longo']
+    assert ids(BuscaAvancada(gerenciador).busca_combinada({'termo': 'python'}, limite=5)) == ['curto', 'longo']
+
+    # Mesmo tamanho: mais ocorrências do termo pontuam mais
+    gerenciador.file_store.save_documents([documento('repetido', 'python python')])
+    assert ids(gerenciador.buscar_documentos('python', campo='conteudo'))[:2] == ['repetido', 'curto']
+
+
+def test_crud_atualiza_o_ranking_incrementalmente(gerenciador):
+    gerenciador.file_store.save_documents(
+        [documento(f'd{i}', f'conteudo base {i} {ENCHIMENTO}') for i in range(20)]
+    )
+    indice = gerenciador.indice_documentos.sincronizar()
+    assert gerenciador.buscar_documentos('zebra', campo='conteudo') == []
+
+    novo = gerenciador.criar_documento('Zebras', 'zebra listrada na savana', 'web')
+    assert ids(gerenciador.buscar_documentos('zebra', campo='conteudo')) == [novo]
+    assert ids(gerenciador.buscar_documentos('zebras', campo='titulo')) == [novo]
+
+    gerenciador.atualizar_documento('d3', conteudo='zebra zebra')
+    assert ids(gerenciador.buscar_documentos('zebra', campo='conteudo')) == ['d3', novo]
+    assert 'd3' not in ids(gerenciador.buscar_documentos('base', campo='conteudo', limite=50))
+
+    gerenciador.excluir_documento(novo)
+    assert ids(gerenciador.buscar_documentos('zebra', campo='conteudo')) == ['d3']
+    assert ids(BuscaAvancada(gerenciador).busca_combinada({'termo': 'zebra'}, limite=5)) == ['d3']
+
+    # Alterações aplicadas pelo observador do FileStore, no mesmo índice, sem reindexar o acervo
+    assert gerenciador.indice_documentos.indice is indice
+    assert gerenciador.indice_documentos._versao == gerenciador.file_store.version
+
+    # Mesmo ranking de um índice reconstruído do zero
+    esperado = gerenciador.buscar_documentos('zebra base', campo='conteudo', limite=50)
+    gerenciador.indice_documentos.reconstruir()
+    assert gerenciador.buscar_documentos('zebra base', campo='conteudo', limite=50) == esperado
@@ -0,0 +1,160 @@
+"""
+Testes da BuscaAvancada sobre o índice invertido do RAGFileManager
+"""
+
+import random
+
+import pytest
+
+from busca_avancada import BuscaAvancada
+from indice_invertido import distancia_levenshtein, tokenizar
+from models.document import RawDocument
+from rag_file_manager import RAGFileManager
+from storage.file_store import FileStore
+
+PALAVRAS = 'python java rust faiss vetor indice busca dados modelo rede neural texto'.split()
+CONFIG = {'storage_backend': 'segments'}
+
+
+def criar_documentos(quantidade, inicio=0, semente=1):
+    rng = random.Random(semente)
+    documentos = []
+    for i in range(inicio, inicio + quantidade):
+        conteudo = ' '.join(rng.choices(PALAVRAS, k=rng.randint(5, 40)))
+        if i % 7 == 0:
+            conteudo += ' aprendizado profundo'
+        documentos.append(RawDocument(
+            title=f'Doc {i} {rng.choice(PALAVRAS)}', content=conteudo,
+            source_type=rng.choice(['wikipedia', 'arxiv']), document_id=f'd{i}'
+        ))
+    return documentos
+
+
+def esperado(documentos, palavras, operador):
+    """Resultado por força bruta sobre os tokens de título, conteúdo e resumo"""
+    encontrados = set()
+    for doc in documentos:
+        tokens = set(tokenizar(f'{doc.title} {doc.content} {doc.abstract}'))
+        presentes = [palavra in tokens for palavra in palavras]
+        if (operador == 'AND' and all(presentes)) or (operador == 'OR' and any(presentes)) \
+                or (operador == 'NOT' and not any(presentes)):
+            encontrados.add(doc.document_id)
+    return encontrados
+
+
+@pytest.fixture
+def gerenciador(tmp_path):
+    manager = RAGFileManager(str(tmp_path), CONFIG)
+    yield manager
+    manager.file_store.close()
+
+
+@pytest.mark.parametrize('palavras,operador', [
+    (['python', 'java'], 'AND'),
+    (['rust', 'aprendizado'], 'OR'),
+    (['aprendizado'], 'NOT'),
+])
+def test_palavras_chave_igual_forca_bruta(gerenciador, palavras, operador):
+    documentos = criar_documentos(200)
+    gerenciador.file_store.save_documents(documentos)
+    busca = BuscaAvancada(gerenciador)
+
+    resultados = busca.busca_por_palavras_chave(palavras, operador, limite=1000)
+
+    assert {r['id'] for r in resultados} == esperado(documentos, palavras, operador)
+
+
+def test_documentos_gravados_depois_entram_pelo_observador(gerenciador):
+    gerenciador.file_store.save_documents(criar_documentos(50))
+    busca = BuscaAvancada(gerenciador)
+    busca.indice_documentos.sincronizar()
+
+    novos = [RawDocument(title='Zebra', content='zebra listrada', source_type='x', document_id='z1')]
+    gerenciador.file_store.save_documents(novos)
+
+    assert [r['id'] for r in busca.busca_por_palavras_chave(['zebra'])] == ['z1']
+    # O índice já estava em dia: a busca não relê o FileStore
+    assert busca.indice_documentos._versao == gerenciador.file_store.version
+
+
+def test_documento_excluido_sai_do_indice(gerenciador):
+    documentos = criar_documentos(50)
+    gerenciador.file_store.save_documents(documentos)
+    busca = BuscaAvancada(gerenciador)
+
+    gerenciador.excluir_documento('d7', excluir_chunks=False)
+
+    assert 'd7' not in busca.indice_documentos.indice
+    ids = {r['id'] for r in busca.busca_por_palavras_chave(['aprendizado'], 'OR', limite=1000)}
+    assert ids == esperado(documentos, ['aprendizado'], 'OR') - {'d7'}
+
+
+def test_indice_salvo_reconcilia_apenas_alteracoes_externas(tmp_path, capsys):
+    manager = RAGFileManager(str(tmp_path), CONFIG)
+    manager.file_store.save_documents(criar_documentos(100))
+    busca = BuscaAvancada(manager)
+    busca.salvar_indice()
+    manager.fechar()
+
+    # Outro escritor altera o FileStore sem o índice
+    externo = FileStore(str(tmp_path), CONFIG)
+    externo.save_documents([RawDocument(title='Zebra', content='zebra', source_type='x', document_id='z1')])
+    externo.delete_document('d14')
+    externo.close()
+
+    capsys.readouterr()
+    manager = RAGFileManager(str(tmp_path), CONFIG)
+    busca = BuscaAvancada(manager)
+    try:
+        assert [r['id'] for r in busca.busca_por_palavras_chave(['zebra'])] == ['z1']
+        assert 'd14' not in busca.indice_documentos.indice
+        assert len(busca.indice_documentos.indice) == 100
+        assert 'Índice de documents sincronizado: 2 alterações' in capsys.readouterr().out
+    finally:
+        manager.file_store.close()
+
+
+def test_busca_fuzzy_igual_forca_bruta(gerenciador):
+    documentos = criar_documentos(100)
+    documentos.append(RawDocument(title='Pyton mal escrito', content='x', source_type='x', document_id='p1'))
+    gerenciador.file_store.save_documents(documentos)
+    busca = BuscaAvancada(gerenciador)
+
+    esperado = {}
+    for doc in documentos:
+        for palavra in tokenizar(doc.title):
+            distancia = distancia_levenshtein('pyton', palavra)
+            score = 1 - distancia / max(len('pyton'), len(palavra))
+            if distancia <= 2 and score > 0:
+                esperado[doc.document_id] = max(esperado.get(doc.document_id, 0), score)
+
+    resultados = busca.busca_fuzzy('Pyton', 'titulo', limite=1000)
+
+    assert {r['id']: r['score'] for r in resultados} == pytest.approx(esperado)
+    assert resultados[0]['id'] == 'p1' and resultados[0]['score'] == 1
+
+
+def test_duplicados_por_minhash(gerenciador):
+    rng = random.Random(2)
+    textos = [' '.join(rng.choices([f'w{i}' for i in range(3000)], k=300)) for _ in range(50)]
+    ids = [f't{i}' for i in range(len(textos))]
+    palavras = textos[0].split()
+    palavras[5] = palavras[100] = 'trocada'
+    quase = 'quase'
+    gerenciador.file_store.save_documents([
+        RawDocument(title=doc_id, content=texto, source_type='web', document_id=doc_id)
+        for doc_id, texto in zip(ids + [quase], textos + [' '.join(palavras)])
+    ])
+    busca = BuscaAvancada(gerenciador)
+
+    similares = busca.busca_similar_por_conteudo(ids[0])
+    assert similares[0]['id'] == quase and similares[0]['similaridade'] > 0.8
+    assert all(s['similaridade'] < 0.5 for s in similares[1:])
+    assert [doc_id for doc_id, _ in gerenciador.encontrar_duplicados(textos[1])] == [ids[1]]
+
+    # Com limiar configurado, a cópia devolve o documento existente
+    gerenciador.limiar_duplicados = 0.8
+    assert gerenciador.criar_documento('copia', textos[2], 'web') == ids[2]
+
+    gerenciador.excluir_documento(quase, excluir_chunks=False)
+    assert quase not in [s['id'] for s in busca.busca_similar_por_conteudo(ids[0])]
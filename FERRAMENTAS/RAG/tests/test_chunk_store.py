@@ -0,0 +1,62 @@
+"""Armazenamento colunar de chunks (ChunkStore)"""
+
+import numpy as np
+
+from conftest import criar_chunks
+from storage.chunk_store import ChunkStore
+from storage.vector_store import RAGVectorStore
+
+
+def test_gravar_e_carregar_preserva_chunks(tmp_path):
+    chunks = criar_chunks(5)
+    store = ChunkStore(str(tmp_path))
+    store.extend(chunks)
+    store[2] = None
+    store.save()
+
+    carregado = ChunkStore(str(tmp_path))
+    assert carregado.load()
+
+    assert len(carregado) == 5 and carregado[2] is None
+    assert list(carregado.live_ids()) == [0, 1, 3, 4]
+    assert carregado[3].text == chunks[3].text
+    assert np.array_equal(carregado[3].embedding, chunks[3].embedding)
+    assert carregado.summary(4).document_id == 'doc4'
+
+
+def test_embedding_decodificado_nao_prende_arquivo_mapeado(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.extend(criar_chunks(3))
+    store.save()
+    retido = store[1]
+    esperado = retido.embedding.copy()
+
+    assert not isinstance(retido.embedding, np.memmap)
+    assert not np.shares_memory(retido.embedding, store._embeddings)
+
+    # Novos saves com o chunk ainda referenciado (resultados, caches)
+    store.extend(criar_chunks(2, semente=1))
+    store.save()
+    store.save(str(tmp_path / 'nova_pasta'))
+
+    assert np.array_equal(retido.embedding, esperado)
+    assert np.array_equal(store[1].embedding, esperado)
+    assert len(store.live_ids()) == 5
+
+
+def test_busca_com_embedding_de_chunk_gravado(tmp_path):
+    config = {'storage_path': str(tmp_path), 'embedding_dim': 16, 'similarity_threshold': -1}
+    store = RAGVectorStore(config)
+    store.add_chunks(criar_chunks(10))
+    store.save_index()
+
+    recarregado = RAGVectorStore(config)
+    chunk = recarregado.get_chunk_by_id(recarregado.chunks[4].chunk_id)
+    antes = chunk.embedding.copy()
+
+    resultados = recarregado.search(chunk.embedding, 1)
+    recarregado.add_chunks(criar_chunks(2, semente=3))
+
+    assert resultados[0].chunk.chunk_id == chunk.chunk_id
+    assert np.array_equal(chunk.embedding, antes)  # A busca não normaliza o array recebido
+    assert recarregado.save_index()
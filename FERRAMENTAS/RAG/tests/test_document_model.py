@@ -0,0 +1,89 @@
+"""ProcessedChunk com __slots__: serialização e compatibilidade com pickles antigos"""
+
+import copyreg
+import pickle
+from datetime import datetime
+
+import numpy as np
+
+from models.document import ProcessedChunk, SearchResult, create_processed_chunk_from_dict
+from storage.vector_store import RAGVectorStore
+
+
+class PickleAntigo:
+    """Reproduz o pickle do ProcessedChunk dataclass (estado em __dict__)"""
+
+    def __init__(self, estado):
+        self.estado = estado
+
+    def __reduce__(self):
+        return copyreg._reconstructor, (ProcessedChunk, object, None), self.estado
+
+
+def estado_antigo(indice, embedding):
+    # Campos da dataclass anterior; previous/next_chunk_id e metadata ainda não existiam
+    return {
+        'text': f'texto {indice}', 'embedding': embedding, 'document_id': 'antigo',
+        'chunk_index': indice, 'chunk_id': f'antigo-{indice}', 'source_type': 'regra_sistema',
+        'document_title': 'Documento antigo', 'processing_timestamp': datetime(2024, 1, 2, 3, 4, 5),
+        'chunk_size': 7, 'overlap_size': 0, 'quality_score': 0.8, 'embedding_norm': 1.0
+    }
+
+
+def test_chunk_sem_dict_por_instancia():
+    chunk = ProcessedChunk(text='abc', embedding=np.ones(4, dtype='float32'), document_id='d', chunk_index=2)
+
+    assert not hasattr(chunk, '__dict__')
+    assert chunk.chunk_id == 'd_chunk_2'
+    assert chunk.chunk_size == 3
+    assert isinstance(chunk.processing_timestamp, datetime)
+
+
+def test_pickle_e_dicionario_ida_e_volta():
+    chunk = ProcessedChunk(text='abc def', embedding=np.arange(4, dtype='float32'), document_id='d',
+                           chunk_index=0, chunk_id='c1', source_type='erro_solucao',
+                           metadata={'source_metadata': {'autor': 'x'}})
+
+    copia = pickle.loads(pickle.dumps(chunk))
+    reconstruido = create_processed_chunk_from_dict(chunk.to_dict(include_embedding=True))
+
+    for outro in (copia, reconstruido):
+        assert outro.chunk_id == 'c1' and outro.source_type == 'erro_solucao'
+        assert outro.source_metadata == {'autor': 'x'}
+        assert np.allclose(outro.embedding, chunk.embedding)
+        assert outro.processing_timestamp == chunk.processing_timestamp
+    assert SearchResult(chunk=copia, score=1.0, query='q').to_dict()['chunk_id'] == 'c1'
+
+
+def test_carrega_pickle_da_dataclass_antiga():
+    chunk = pickle.loads(pickle.dumps(PickleAntigo(estado_antigo(3, np.ones(4, dtype='float32')))))
+
+    assert isinstance(chunk, ProcessedChunk)
+    assert chunk.chunk_id == 'antigo-3'
+    assert chunk.processing_timestamp == datetime(2024, 1, 2, 3, 4, 5)
+    assert chunk.previous_chunk_id == '' and chunk.next_chunk_id == ''
+    assert chunk.metadata == {}
+    assert chunk.to_dict()['quality_score'] == 0.8
+
+
+def test_vector_store_migra_lista_de_chunks_antigos(tmp_path):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((5, 16)).astype('float32')
+    antigos = [PickleAntigo(estado_antigo(i, embeddings[i])) for i in range(5)]
+    with open(tmp_path / 'chunks.pkl', 'wb') as f:
+        pickle.dump(antigos, f)
+
+    # Índice com IDs estáveis gravado pela versão anterior ao formato colunar
+    config = {'storage_path': str(tmp_path), 'embedding_dim': 16, 'similarity_threshold': -1}
+    anterior = RAGVectorStore(dict(config, storage_path=str(tmp_path / 'indice')))
+    anterior.index = anterior._create_index(16)
+    normalizados = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    anterior.index.add_with_ids(normalizados, np.arange(5, dtype='int64'))
+    anterior.save_index(str(tmp_path / 'faiss_index.bin'))
+
+    store = RAGVectorStore(config)
+
+    assert store.chunk_count == 5
+    assert store.search(embeddings[2], 1)[0].chunk.chunk_id == 'antigo-2'
+    assert (tmp_path / 'checkpoint.json').exists()  # Convertido para o formato colunar
+    assert RAGVectorStore(config).get_chunk_by_id('antigo-4').text == 'texto 4'
@@ -0,0 +1,128 @@
+"""Cache de embeddings em shards append-only"""
+
+import threading
+
+import numpy as np
+
+from processing.embedding_cache import EmbeddingCache
+
+
+def vetor(i, dimensao=64):
+    return np.full(dimensao, i, dtype=np.float32)
+
+
+def test_grava_e_le_entre_instancias(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 'modelo')
+    chaves = [cache.key(f'texto {i}') for i in range(100)]
+    for i, chave in enumerate(chaves):
+        cache.put(chave, vetor(i))
+
+    outro = EmbeddingCache(str(tmp_path), 'modelo', memory_items=1)
+
+    assert len(outro) == 100
+    assert np.array_equal(outro.get(chaves[42]), vetor(42))
+    assert outro.get(cache.key('ausente')) is None
+    # Poucos arquivos: um shard (dados + índice), não um arquivo por embedding
+    assert len(list(outro.cache_dir.iterdir())) == 2
+
+
+def test_chave_depende_do_modelo(tmp_path):
+    assert EmbeddingCache(None, 'a').key('x') != EmbeddingCache(None, 'b').key('x')
+
+
+def test_escritores_simultaneos_no_mesmo_diretorio(tmp_path):
+    primeiro = EmbeddingCache(str(tmp_path), 'modelo')
+    segundo = EmbeddingCache(str(tmp_path), 'modelo')
+    chaves = {}
+    for i in range(50):
+        for n, cache in enumerate((primeiro, segundo)):
+            chave = cache.key(f'{n}-{i}')
+            cache.put(chave, vetor(n * 100 + i))
+            chaves[chave] = n * 100 + i
+
+    # Cada instância grava no próprio shard; todas as entradas ficam legíveis
+    assert len(list(primeiro.cache_dir.glob('*.bin'))) == 2
+    leitor = EmbeddingCache(str(tmp_path), 'modelo', memory_items=1)
+    encontrados = leitor.get_many(list(chaves))
+    assert len(encontrados) == 100
+    assert all(np.array_equal(encontrados[chave], vetor(valor)) for chave, valor in chaves.items())
+    # Entradas novas de outra instância são vistas sem recriar o cache
+    primeiro.put(primeiro.key('nova'), vetor(7))
+    assert np.array_equal(segundo.get(segundo.key('nova')), vetor(7))
+
+
+def test_limite_remove_shards_antigos_e_preserva_em_uso(tmp_path):
+    # Cada embedding ocupa ~4 KB; shards de 16 KB e limite de 64 KB
+    cache = EmbeddingCache(str(tmp_path), 'modelo', max_bytes=64 * 1024, memory_items=1,
+                           shard_bytes=16 * 1024)
+    em_uso = cache.key('em uso')
+    cache.put(em_uso, vetor(-1, 1024))
+    for i in range(60):
+        cache.put(cache.key(f'texto {i}'), vetor(i, 1024))
+        cache.get(em_uso)
+
+    tamanho = sum(path.stat().st_size for path in cache.cache_dir.iterdir())
+    assert tamanho <= 64 * 1024
+    assert cache.stats['evictions'] > 0
+    assert cache.get(cache.key('texto 0')) is None
+    assert np.array_equal(cache.get(em_uso), vetor(-1, 1024))
+    assert np.array_equal(cache.get(cache.key('texto 59')), vetor(59, 1024))
+
+
+def test_acesso_concorrente_entre_threads(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 'modelo', memory_items=16)
+    erros = []
+
+    def trabalhar(n):
+        try:
+            for i in range(200):
+                chave = cache.key(f'{i % 50}')
+                cache.put(chave, vetor(i % 50))
+                obtido = cache.get(chave)
+                assert obtido is not None and obtido[0] == i % 50
+        except Exception as e:  # pragma: no cover - falha reportada abaixo
+            erros.append(e)
+
+    threads = [threading.Thread(target=trabalhar, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert erros == []
+    assert len(cache._memory) <= 16
+    assert len(cache) == 50
+
+
+def test_clear_remove_tudo(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 'modelo')
+    (cache.cache_dir / 'ab').mkdir()
+    (cache.cache_dir / 'ab' / 'antigo.npy').write_bytes(b'x')
+    cache = EmbeddingCache(str(tmp_path), 'modelo')  # Remove o formato antigo
+    cache.put(cache.key('a'), vetor(1))
+    cache.clear()
+
+    assert len(cache) == 0
+    assert list(cache.cache_dir.iterdir()) == []
+
+
+def test_processador_reaproveita_cache(tmp_path, modelo_falso):
+    from processing.document_processor import DocumentProcessor
+
+    chamadas = []
+    codificar = modelo_falso.encode
+
+    def contar(self, textos, **kwargs):
+        chamadas.append(len(textos))
+        return codificar(self, textos, **kwargs)
+
+    modelo_falso.encode = contar
+    try:
+        config = {'embedding_cache_dir': str(tmp_path)}
+        primeiro = DocumentProcessor(config).generate_embeddings(['abc', 'de', 'abc'])
+        segundo = DocumentProcessor(config).generate_embeddings(['de', 'abc', 'novo'])
+    finally:
+        modelo_falso.encode = codificar
+
+    assert chamadas == [2, 1]
+    assert np.allclose(primeiro[0], segundo[1]) and np.allclose(primeiro[1], segundo[0])
@@ -0,0 +1,33 @@
+"""
+Testes do caminho leve de embedding de queries do DocumentProcessor
+"""
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def processador(modelo_falso):
+    from processing.document_processor import DocumentProcessor
+    return DocumentProcessor({'embedding_cache_dir': None})
+
+
+def test_uma_query_curta_vira_um_embedding(processador, monkeypatch):
+    monkeypatch.setattr(processador, 'chunk_text', lambda *args: pytest.fail('fez chunking'))
+
+    # Bem abaixo de min_text_length: process_documents descartaria o texto
+    embeddings = processador.embed_queries(['numpy', '<b>ImportError</b> numpy', '   '])
+
+    assert embeddings.shape == (3, 384)
+    assert np.allclose(embeddings[0], processador.embedding_model.encode('numpy'))
+    # A limpeza remove o HTML; query esvaziada pela limpeza usa o texto original
+    assert np.allclose(embeddings[1], processador.embedding_model.encode('ImportError numpy'))
+    assert processador.embed_queries([]).size == 0
+
+
+def test_embed_query_igual_ao_lote_e_usa_o_cache(processador, monkeypatch):
+    lote = processador.embed_queries(['ImportError numpy', 'falha de rede'])
+
+    monkeypatch.setattr(processador.embedding_model, 'encode', lambda *args, **kwargs: pytest.fail('recodificou'))
+
+    assert np.allclose(processador.embed_query('falha de rede'), lote[1])
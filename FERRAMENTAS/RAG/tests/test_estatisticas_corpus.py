@@ -0,0 +1,101 @@
+"""
+Testes das estatísticas do corpus mantidas incrementalmente
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from busca_avancada import BuscaAvancada
+from estatisticas_corpus import LIMITES_TAMANHO, Distribuicao
+from indice_invertido import tokenizar
+from models.document import RawDocument
+from rag_file_manager import RAGFileManager
+
+
+def test_distribuicao_igual_forca_bruta_com_remocoes():
+    rng = random.Random(0)
+    valores = [rng.randint(0, 30000) for _ in range(500)]
+    distribuicao = Distribuicao(LIMITES_TAMANHO)
+    for valor in valores:
+        distribuicao.adicionar(valor)
+
+    # Remove os extremos primeiro, depois valores quaisquer
+    for valor in sorted(valores)[:5] + sorted(valores)[-5:] + rng.sample(valores, 100):
+        if valor in valores:
+            valores.remove(valor)
+            distribuicao.remover(valor)
+    distribuicao.remover(-1)  # Valor ausente é ignorado
+
+    assert distribuicao.total == len(valores)
+    assert distribuicao.media == pytest.approx(sum(valores) / len(valores))
+    assert distribuicao.extremos() == (min(valores), max(valores))
+    assert sum(distribuicao.histograma().values()) == len(valores)
+    assert distribuicao.histograma()['0-100'] == sum(1 for v in valores if v < 100)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = random.Random(3)
+    # Vocabulário com frequências bem distintas (Zipf), menor que a tabela de termos frequentes
+    vocab = [f'pal{i}' for i in range(300)]
+    pesos = [1 / (i + 1) for i in range(300)]
+    documentos = [
+        RawDocument(
+            title=f't{i}', content=' '.join(rng.choices(vocab + ['de', 'que'], pesos + [5, 5], k=rng.randint(5, 400))),
+            source_type=rng.choice(['web', 'arxiv']), document_id=f'd{i}'
+        )
+        for i in range(400)
+    ]
+    manager = RAGFileManager(str(tmp_path), {'storage_backend': 'segments'})
+    manager.file_store.save_documents(documentos)
+    yield manager, documentos
+    manager.file_store.close()
+
+
+def forca_bruta(documentos, stop_words):
+    frequencias = Counter()
+    for doc in documentos:
+        frequencias.update({t for t in tokenizar(doc.content) if len(t) >= 3 and t not in stop_words})
+    tamanhos = [len(doc.content) for doc in documentos]
+    return {
+        'total_documentos': len(documentos),
+        'fontes_disponiveis': dict(Counter(doc.source_type for doc in documentos)),
+        'tamanho_medio_caracteres': int(sum(tamanhos) / len(tamanhos)),
+        'tamanho_min_caracteres': min(tamanhos),
+        'tamanho_max_caracteres': max(tamanhos),
+        'total_palavras_unicas': len(frequencias)
+    }, frequencias
+
+
+def conferir(busca, documentos):
+    estatisticas = busca.estatisticas_busca()
+    esperado, frequencias = forca_bruta(documentos, busca.stop_words['pt'])
+
+    assert {chave: estatisticas[chave] for chave in esperado} == esperado
+    comuns = estatisticas['palavras_mais_comuns']
+    assert 'que' not in comuns
+    assert all(frequencias[palavra] == contagem for palavra, contagem in comuns.items())
+    assert sorted(comuns.values(), reverse=True) == [c for _, c in frequencias.most_common(20)]
+
+
+def test_estatisticas_busca_igual_forca_bruta(corpus):
+    manager, documentos = corpus
+    conferir(BuscaAvancada(manager), documentos)
+
+
+def test_estatisticas_acompanham_exclusoes(corpus):
+    manager, documentos = corpus
+    busca = BuscaAvancada(manager)
+    busca.estatisticas_busca()  # Agregados montados antes das exclusões
+
+    # Inclui o menor e o maior documento, para recalcular os extremos
+    por_tamanho = sorted(documentos, key=lambda doc: len(doc.content))
+    removidos = {por_tamanho[0].document_id, por_tamanho[-1].document_id} | {f'd{i}' for i in range(0, 400, 3)}
+    for doc_id in removidos:
+        manager.excluir_documento(doc_id, excluir_chunks=False)
+    restantes = [doc for doc in documentos if doc.document_id not in removidos]
+
+    conferir(busca, restantes)
+    assert manager.obter_estatisticas()['documentos_por_fonte'] == dict(Counter(doc.source_type for doc in restantes))
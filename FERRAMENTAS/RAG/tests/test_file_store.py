@@ -0,0 +1,167 @@
+"""FileStore: índice em memória com journal, backends 'files' e 'segments'"""
+
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from models.document import ProcessedChunk
+from storage.file_store import FileStore
+
+from conftest import RAG_DIR
+
+
+def criar_chunk(i, texto=None):
+    return ProcessedChunk(text=texto or f'texto {i}', embedding=np.zeros(4, dtype='float32'),
+                          document_id=f'd{i % 3}', chunk_index=i, chunk_id=f'c{i}', source_type='x')
+
+
+@pytest.fixture(params=['files', 'segments'])
+def backend(request):
+    return request.param
+
+
+def test_alteracoes_vao_para_o_journal(tmp_path, backend):
+    store = FileStore(str(tmp_path), {'storage_backend': backend})
+    snapshot = (tmp_path / 'metadata.json').read_bytes()
+
+    assert store.save_chunks(criar_chunk(i) for i in range(20)) == 20
+    assert store.delete_chunks(['c1', 'c2', 'inexistente']) == 2
+    assert store.save_chunk(criar_chunk(3, 'sobrescrito'))
+
+    # metadata.json só é reescrito na compactação
+    assert (tmp_path / 'metadata.json').read_bytes() == snapshot
+    assert len(store._journal) == 3
+
+    reaberto = FileStore(str(tmp_path), {'storage_backend': backend})
+    assert sorted(reaberto.list_chunk_ids()) == sorted(f'c{i}' for i in range(20) if i not in (1, 2))
+    assert reaberto.load_chunk('c3').text == 'sobrescrito'
+    assert reaberto.load_chunk('c1') is None
+
+
+def test_compactacao_do_journal(tmp_path, backend):
+    config = {'storage_backend': backend, 'journal_compact_every': 5}
+    store = FileStore(str(tmp_path), config)
+    for i in range(12):
+        store.save_chunk(criar_chunk(i))
+    store.delete_chunk('c0')
+
+    assert len(store._journal) < 5
+    reaberto = FileStore(str(tmp_path), config)
+    assert len(reaberto.list_chunk_ids()) == 11
+    assert {c.chunk_id for c in reaberto.load_all_chunks()} == {f'c{i}' for i in range(1, 12)}
+
+    store.close()
+    assert len(FileStore(str(tmp_path), config)._journal) == 0
+
+
+def test_alteracoes_de_outra_instancia(tmp_path, backend):
+    config = {'storage_backend': backend}
+    escritor = FileStore(str(tmp_path), config)
+    leitor = FileStore(str(tmp_path), config)
+    versao = leitor.version
+
+    escritor.save_chunks(criar_chunk(i) for i in range(5))
+    escritor.delete_chunk('c4')
+
+    assert leitor.chunk_exists('c3') and not leitor.chunk_exists('c4')
+    assert leitor.load_chunk('c2').text == 'texto 2'
+    assert leitor.version > versao
+
+
+def test_final_do_journal_corrompido(tmp_path):
+    store = FileStore(str(tmp_path))
+    store.save_chunks(criar_chunk(i) for i in range(3))
+    store._journal.close()
+    with open(tmp_path / 'metadata.journal', 'ab') as f:
+        f.write(b'\x20\x00\x00\x00incompleto')
+
+    reaberto = FileStore(str(tmp_path))
+
+    assert sorted(reaberto.list_chunk_ids()) == ['c0', 'c1', 'c2']
+    assert reaberto.save_chunk(criar_chunk(9))
+    assert FileStore(str(tmp_path)).chunk_exists('c9')
+
+
+def test_listener_recebe_alteracoes_locais(tmp_path):
+    store = FileStore(str(tmp_path))
+    recebidas = []
+    store.add_listener(lambda operation, entries, objects: recebidas.append((operation, set(entries), set(objects))))
+
+    store.save_chunks([criar_chunk(1), criar_chunk(2)])
+    store.delete_chunk('c1')
+
+    assert recebidas == [('chunks', {'c1', 'c2'}, {'c1', 'c2'}), ('chunks', {'c1'}, set())]
+
+
+def test_dois_escritores_em_segmentos(tmp_path):
+    config = {'storage_backend': 'segments'}
+    primeiro = FileStore(str(tmp_path), config)
+    segundo = FileStore(str(tmp_path), config)
+
+    for i in range(30):
+        escritor = primeiro if i % 2 else segundo
+        assert escritor.save_chunk(criar_chunk(i))
+
+    # Cada escritor anexa apenas ao próprio segmento
+    assert len(primeiro._segments['chunks'].segments()) == 2
+    for store in (primeiro, segundo, FileStore(str(tmp_path), config)):
+        textos = {c.chunk_id: c.text for c in store.load_all_chunks()}
+        assert textos == {f'c{i}': f'texto {i}' for i in range(30)}
+        assert store.load_chunk('c7').text == 'texto 7'
+    relatorio = primeiro.verify_integrity(workers=1)['chunks']
+    assert relatorio['ok'] == 30 and relatorio['errors'] == []
+
+
+def test_compactacao_preserva_segmento_de_outro_escritor(tmp_path):
+    config = {'storage_backend': 'segments'}
+    primeiro = FileStore(str(tmp_path), config)
+    segundo = FileStore(str(tmp_path), config)
+    primeiro.save_chunks(criar_chunk(i) for i in range(10))
+    segundo.save_chunks(criar_chunk(i) for i in range(10, 20))
+    primeiro.delete_chunks([f'c{i}' for i in range(5)])
+
+    primeiro.compact(force_segments=True)
+    segundo.save_chunk(criar_chunk(20))  # Continua no segmento que ainda é seu
+
+    leitor = FileStore(str(tmp_path), config)
+    assert sorted(c.chunk_id for c in leitor.load_all_chunks()) == sorted(f'c{i}' for i in range(5, 21))
+
+    # Fechado o segundo escritor, o segmento dele pode ser reescrito e removido
+    segundo.close()
+    primeiro.compact(force_segments=True)
+    primeiro.close()
+    final = FileStore(str(tmp_path), config)
+    assert len(final._segments['chunks'].segments()) == 1
+    assert sorted(c.chunk_id for c in final.load_all_chunks()) == sorted(f'c{i}' for i in range(5, 21))
+    assert list(tmp_path.glob('segments/*.lock')) == []
+
+
+ESCRITOR_EXTERNO = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import numpy as np
+from models.document import ProcessedChunk
+from storage.file_store import FileStore
+store = FileStore(sys.argv[2], {'storage_backend': 'segments', 'journal_compact_every': 7})
+for i in range(100, 160):
+    store.save_chunk(ProcessedChunk(text=f'texto {i}', embedding=np.zeros(4, dtype='float32'),
+                                    document_id='externo', chunk_index=i, chunk_id=f'c{i}'))
+store.close()
+"""
+
+
+def test_escritor_em_outro_processo(tmp_path):
+    config = {'storage_backend': 'segments', 'journal_compact_every': 5}
+    store = FileStore(str(tmp_path), config)
+    processo = subprocess.Popen([sys.executable, '-c', ESCRITOR_EXTERNO, RAG_DIR, str(tmp_path)],
+                                stdout=subprocess.DEVNULL)
+    for i in range(60):
+        store.save_chunk(criar_chunk(i))
+    assert processo.wait(timeout=120) == 0
+    store.close()
+
+    leitor = FileStore(str(tmp_path), config)
+    textos = {c.chunk_id: c.text for c in leitor.load_all_chunks()}
+    assert textos == {f'c{i}': f'texto {i}' for i in list(range(60)) + list(range(100, 160))}
@@ -0,0 +1,115 @@
+"""
+Testes dos índices auxiliares do índice invertido
+"""
+
+import random
+
+import pytest
+
+from indice_invertido import IndiceInvertido, IndiceLSH, IndiceTrigramas, MinHash, shingles
+
+
+def levenshtein(a, b):
+    """Distância de edição sem poda (referência)"""
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i]
+        for j, cb in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        anterior = atual
+    return anterior[-1]
+
+
+def vocabulario(quantidade, semente=0):
+    rng = random.Random(semente)
+    return {''.join(rng.choices('abcdef', k=rng.randint(1, 9))) for _ in range(quantidade)}
+
+
+@pytest.mark.parametrize('tolerancia', [0, 1, 2, 3])
+def test_trigramas_igual_forca_bruta(tolerancia):
+    termos = vocabulario(800)
+    indice = IndiceTrigramas(termos)
+    rng = random.Random(1)
+
+    for consulta in [''.join(rng.choices('abcdef', k=rng.randint(1, 10))) for _ in range(30)]:
+        esperado = {termo: levenshtein(consulta, termo) for termo in termos}
+        esperado = {termo: d for termo, d in esperado.items() if d <= tolerancia}
+        resultado = indice.similares(consulta, tolerancia)
+
+        assert dict(resultado) == esperado
+        assert [d for _, d in resultado] == sorted(esperado.values())
+
+
+def test_trigramas_apos_remocao():
+    termos = vocabulario(500)
+    indice = IndiceTrigramas(termos)
+    removidos = set(sorted(termos)[::3])
+    for termo in removidos:
+        indice.remover(termo)
+
+    assert len(indice) == len(termos) - len(removidos)
+    for consulta in sorted(removidos)[:20]:
+        encontrados = {termo for termo, _ in indice.similares(consulta, 1)}
+        assert encontrados == {t for t in termos - removidos if levenshtein(consulta, t) <= 1}
+
+
+def test_termos_similares_acompanham_o_indice():
+    indice = IndiceInvertido(['titulo'])
+    indice.adicionar('a', {'titulo': 'python java'})
+    assert indice.termos_similares('pyton', 'titulo', 1) == [('python', 1)]
+
+    # O índice de trigramas já montado é mantido a cada inclusão/remoção
+    indice.adicionar('b', {'titulo': 'pythons'})
+    indice.remover('a')
+    assert indice.termos_similares('pyton', 'titulo', 2) == [('pythons', 2)]
+    assert indice.termos_similares('pyton', 'outro', 2) == []
+
+
+def textos_com_variantes(quantidade, semente=0):
+    """Textos aleatórios e, para cada um, uma variante com poucas palavras trocadas"""
+    rng = random.Random(semente)
+    vocab = [f'w{i}' for i in range(5000)]
+    textos, variantes = [], []
+    for _ in range(quantidade):
+        palavras = rng.choices(vocab, k=200)
+        textos.append(' '.join(palavras))
+        for posicao in rng.sample(range(200), 5):
+            palavras[posicao] = 'trocada'
+        variantes.append(' '.join(palavras))
+    return textos, variantes
+
+
+def jaccard(a, b):
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def test_minhash_estima_jaccard():
+    minhash = MinHash()
+    textos, variantes = textos_com_variantes(20)
+    for texto, variante in zip(textos, variantes):
+        estimado = MinHash.similaridade(minhash.assinatura_texto(texto), minhash.assinatura_texto(variante))
+        assert estimado == pytest.approx(jaccard(texto, variante), abs=0.15)
+
+    # Assinaturas estáveis entre instâncias (guardadas nos resumos persistidos)
+    assert MinHash().assinatura_texto(textos[0]) == minhash.assinatura_texto(textos[0])
+
+
+def test_lsh_encontra_quase_duplicados_igual_forca_bruta():
+    minhash = MinHash()
+    textos, variantes = textos_com_variantes(200)
+    lsh = IndiceLSH()
+    for i, texto in enumerate(textos):
+        lsh.adicionar(f't{i}', minhash.assinatura_texto(texto))
+
+    conjuntos = [shingles(texto) for texto in textos]
+    for i, variante in enumerate(variantes):
+        consulta = shingles(variante)
+        esperado = {f't{j}' for j, conjunto in enumerate(conjuntos)
+                    if len(consulta & conjunto) / len(consulta | conjunto) >= 0.5}
+        encontrados = lsh.similares(minhash.assinatura_texto(variante), limite=10, minimo=0.5)
+        assert {item_id for item_id, _ in encontrados} == esperado == {f't{i}'}
+
+    lsh.remover('t0')
+    assert len(lsh) == 199
+    assert lsh.similares(minhash.assinatura_texto(variantes[0]), minimo=0.5) == []
@@ -0,0 +1,109 @@
+"""
+Testes do índice ordenado e das buscas por intervalo
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from busca_avancada import BuscaAvancada
+from indice_ordenado import IndiceOrdenado, valor_ordenavel
+from models.document import RawDocument
+from rag_file_manager import RAGFileManager
+
+
+def test_intervalos_igual_forca_bruta_com_inclusoes_e_remocoes():
+    rng = random.Random(0)
+    valores = {f'i{i}': float(rng.randint(0, 200)) for i in range(1000)}  # Muitas chaves repetidas
+    indice = IndiceOrdenado(list(valores.items())[:500])
+    for item_id, chave in list(valores.items())[500:]:
+        indice.adicionar(item_id, chave)
+    for item_id in rng.sample(sorted(valores), 300):
+        assert indice.remover(item_id)
+        del valores[item_id]
+    regravado = next(iter(valores))
+    indice.adicionar(regravado, 999.0)  # Regravação troca a chave
+    valores[regravado] = 999.0
+    assert not indice.remover('ausente')
+    assert len(indice) == len(valores)
+
+    for minimo, maximo in [(None, None), (10, 50), (50, 10), (None, 30), (150, None), (42, 42)]:
+        esperado = sorted(
+            (item_id, chave) for item_id, chave in valores.items()
+            if (minimo is None or chave >= minimo) and (maximo is None or chave <= maximo)
+        )
+        assert sorted(indice.intervalo(minimo, maximo)) == esperado
+        assert indice.contar(minimo, maximo) == len(esperado)
+
+        chaves = sorted(chave for _, chave in esperado)
+        assert [c for _, c in indice.intervalo(minimo, maximo, limite=7)] == chaves[:7]
+        assert [c for _, c in indice.intervalo(minimo, maximo, limite=7, decrescente=True)] == chaves[::-1][:7]
+
+
+def test_valor_ordenavel():
+    data = datetime(2024, 1, 2, 3, 4, 5)
+    assert valor_ordenavel(data) == data.timestamp()
+    assert valor_ordenavel(3) == 3.0
+    assert valor_ordenavel(True) is None
+    assert valor_ordenavel('2024') is None
+
+
+@pytest.fixture
+def gerenciador(tmp_path):
+    rng = random.Random(5)
+    inicio = datetime(2020, 1, 1)
+    documentos = [
+        RawDocument(
+            title=f't{i}', content='x' * rng.randint(1, 5000), source_type=rng.choice(['web', 'arxiv']),
+            document_id=f'd{i}', publication_date=inicio + timedelta(days=rng.randint(0, 1500))
+        )
+        for i in range(300)
+    ]
+    manager = RAGFileManager(str(tmp_path), {'storage_backend': 'segments'})
+    manager.file_store.save_documents(documentos)
+    yield manager, documentos
+    manager.file_store.close()
+
+
+def test_buscar_por_intervalo_igual_forca_bruta(gerenciador):
+    manager, documentos = gerenciador
+    de, ate = datetime(2021, 1, 1), datetime(2022, 6, 30)
+
+    por_data = manager.buscar_por_intervalo('data_publicacao', de, ate)
+    assert {doc_id for doc_id, _ in por_data} == {
+        doc.document_id for doc in documentos if de <= doc.publication_date <= ate
+    }
+    assert [chave for _, chave in por_data] == sorted(chave for _, chave in por_data)
+
+    with pytest.raises(ValueError):
+        manager.buscar_por_intervalo('titulo')
+
+
+def test_buscas_por_tamanho_e_data(gerenciador):
+    manager, documentos = gerenciador
+    busca = BuscaAvancada(manager)
+
+    resultados = busca.busca_por_tamanho(1000, 2000, limite=5)
+    tamanhos = sorted((len(doc.content) for doc in documentos if 1000 <= len(doc.content) <= 2000), reverse=True)
+    assert [r['tamanho'] for r in resultados] == tamanhos[:5]
+
+    recentes = busca.busca_por_data(campo_data='data_publicacao', limite=3)
+    datas = sorted((doc.publication_date for doc in documentos), reverse=True)
+    assert [r['data_publicacao'] for r in recentes] == [data.isoformat() for data in datas[:3]]
+
+    # Exclusões saem dos índices ordenados
+    manager.excluir_documento(resultados[0]['id'], excluir_chunks=False)
+    assert [r['tamanho'] for r in busca.busca_por_tamanho(1000, 2000, limite=5)] == tamanhos[1:6]
+
+
+def test_busca_combinada_por_intervalo_e_fonte(gerenciador):
+    manager, documentos = gerenciador
+    busca = BuscaAvancada(manager)
+
+    resultados = busca.busca_combinada({'tamanho_min': 500, 'tamanho_max': 3000, 'fontes': ['arxiv']}, limite=1000)
+
+    assert {r['id'] for r in resultados} == {
+        doc.document_id for doc in documentos
+        if 500 <= len(doc.content) <= 3000 and doc.source_type == 'arxiv'
+    }
@@ -0,0 +1,65 @@
+"""
+Testes do IntegradorMCPRAG: chamadas concorrentes e cache de contexto
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_buscas_concorrentes_durante_recarga(tmp_path, monkeypatch, modelo_falso):
+    monkeypatch.chdir(tmp_path)  # O RAG do integrador usa ./rag_elis_storage
+    from integrador_mcp import IntegradorMCPRAG
+
+    integrador = IntegradorMCPRAG(cache_ttl_segundos=0)  # Sem cache: toda chamada busca no RAG
+    integrador.rag.registrar_erros_em_lote([
+        {'erro': 'ImportError numpy modulo ' * 4, 'solucao': f'instalar numpy modulo ImportError {i} ' * 4}
+        for i in range(20)
+    ])
+    integrador.rag.salvar()
+
+    parar = threading.Event()
+    recargas = []
+
+    def recarregar():
+        while not parar.is_set():
+            integrador.recarregar()
+            recargas.append(1)
+
+    recarregador = threading.Thread(target=recarregar)
+    recarregador.start()
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            contextos = list(executor.map(
+                lambda _: integrador.buscar_contexto_unificado('ImportError numpy modulo'), range(200)
+            ))
+    finally:
+        parar.set()
+        recarregador.join()
+
+    assert recargas
+    vazios = [contexto for contexto in contextos if not contexto.get('solucoes_relevantes')]
+    assert vazios == []
+    integrador.rag.fechar()
+
+
+def test_acerto_no_cache_devolve_copia_com_timestamp_novo(tmp_path, monkeypatch, modelo_falso):
+    monkeypatch.chdir(tmp_path)
+    from integrador_mcp import IntegradorMCPRAG
+
+    integrador = IntegradorMCPRAG()
+    integrador.rag.registrar_erro_solucao('ImportError numpy modulo ' * 4, 'instalar numpy modulo ImportError ' * 4)
+
+    primeiro = integrador.buscar_contexto_unificado('ImportError numpy modulo')
+    primeiro['solucoes_relevantes'].clear()  # Quem chamou altera a resposta
+    time.sleep(0.01)
+    segundo = integrador.buscar_contexto_unificado('importerror  NUMPY modulo')
+    segundo['metadados']['fonte'] = 'alterado'
+    terceiro = integrador.buscar_contexto_unificado('ImportError numpy modulo')
+
+    assert integrador.cache.stats['hits'] == 2
+    assert segundo['solucoes_relevantes'] and terceiro['solucoes_relevantes']
+    assert terceiro['metadados']['fonte'] == 'IntegradorMCPRAG'
+    assert segundo['query'] == 'importerror  NUMPY modulo'
+    assert primeiro['timestamp'] < segundo['timestamp'] < terceiro['timestamp']
+    integrador.rag.fechar()
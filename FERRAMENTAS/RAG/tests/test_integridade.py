@@ -0,0 +1,85 @@
+"""
+Testes da verificação de integridade incremental
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from models.document import ProcessedChunk, RawDocument
+from rag_file_manager import RAGFileManager
+
+
+@pytest.fixture(params=['files', 'segments'])
+def gerenciador(request, tmp_path):
+    manager = RAGFileManager(str(tmp_path), {'storage_backend': request.param})
+    manager.file_store.save_documents([
+        RawDocument(title=f't{i}', content='conteudo ' * 50, source_type='web', document_id=f'd{i}')
+        for i in range(100)
+    ])
+    manager.file_store.save_chunks([
+        ProcessedChunk(f'texto {i} ' * 20, np.zeros(4, dtype='float32'), f'd{i}', 0, chunk_id=f'c{i}')
+        for i in range(100)
+    ])
+    yield manager
+    manager.file_store.close()
+
+
+def corromper(manager, doc_id):
+    """Inverte um byte do registro gravado, preservando o tamanho do arquivo"""
+    store = manager.file_store
+    localizacao = store._index('documents')[doc_id]
+    if isinstance(localizacao, list):
+        caminho, posicao = store._segments['documents'].path(localizacao[0]), localizacao[1] + 10
+    else:
+        caminho, posicao = store.docs_dir / localizacao['file'], 10
+    with open(caminho, 'r+b') as f:
+        f.seek(posicao)
+        byte = f.read(1)
+        f.seek(posicao)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    # Garante mtime diferente mesmo com relógio de baixa resolução
+    estado = os.stat(caminho)
+    os.utime(caminho, ns=(estado.st_atime_ns, estado.st_mtime_ns + 10 ** 9))
+
+
+def test_verificacao_completa_e_incremental(gerenciador):
+    completo = gerenciador.verificar_integridade(processos=1)
+    assert (completo['verificados'], completo['ignorados']) == (200, 0)
+    assert (completo['documentos_ok'], completo['chunks_ok']) == (100, 100)
+    assert completo['erros'] == []
+
+    # Nada mudou: todos os registros são pulados
+    incremental = gerenciador.verificar_integridade(incremental=True, processos=1)
+    assert (incremental['verificados'], incremental['ignorados']) == (0, 200)
+    assert (incremental['documentos_ok'], incremental['chunks_ok']) == (100, 100)
+
+
+def test_incremental_verifica_registros_novos(gerenciador):
+    gerenciador.verificar_integridade(processos=1)
+    gerenciador.file_store.save_documents([
+        RawDocument(title='novo', content='novo ' * 30, source_type='web', document_id='dnovo')
+    ])
+
+    relatorio = gerenciador.verificar_integridade(incremental=True, processos=1)
+
+    assert relatorio['documentos_ok'] == 101 and relatorio['documentos_erro'] == 0
+    assert relatorio['verificados'] >= 1
+    assert relatorio['verificados'] + relatorio['ignorados'] == 201
+    if gerenciador.file_store.storage_backend == 'files':
+        assert relatorio['verificados'] == 1  # Um arquivo por registro: só o novo é relido
+
+
+def test_incremental_detecta_registro_corrompido(gerenciador):
+    gerenciador.verificar_integridade(processos=1)
+    corromper(gerenciador, 'd5')
+
+    relatorio = gerenciador.verificar_integridade(incremental=True, processos=1)
+    assert relatorio['documentos_erro'] == 1
+    assert 'd5' in relatorio['erros'][0]
+    assert relatorio['ignorados'] > 0  # Os chunks, em outros arquivos, não são relidos
+
+    # Registros com erro são verificados de novo na execução seguinte
+    novamente = gerenciador.verificar_integridade(incremental=True, processos=1)
+    assert novamente['documentos_erro'] == 1
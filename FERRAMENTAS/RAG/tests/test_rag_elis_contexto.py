@@ -0,0 +1,44 @@
+"""
+Testes da busca unificada do RAGElis (uma codificação para todas as coleções)
+"""
+
+import pytest
+
+from medicao import coletar_etapas
+
+# Textos curtos não geram chunks (min_chunk_size); a repetição mantém o
+# cosseno com a query acima do similarity_threshold
+TEXTO = 'ImportError numpy modulo ' * 6
+
+
+@pytest.fixture
+def rag(tmp_path, modelo_falso):
+    from rag_elis import RAGElis
+    sistema = RAGElis(str(tmp_path / 'rag'))
+    yield sistema
+    sistema.fechar()
+
+
+def test_buscar_contexto_codifica_as_queries_uma_vez(rag, monkeypatch):
+    rag.registrar_regra('Imports', TEXTO)
+    rag.registrar_erro_solucao('ImportError numpy', TEXTO)
+    rag.registrar_sessao('s1', 'editar', {'nota': 'sessão s1 ' * 12})  # Query do histórico: 'sessão s1'
+
+    lotes = []
+    embed_queries = rag.document_processor.embed_queries
+    monkeypatch.setattr(rag.document_processor, 'embed_queries', lambda textos: lotes.append(textos) or embed_queries(textos))
+    monkeypatch.setattr(rag.document_processor, 'embed_query', lambda texto: pytest.fail('embedding avulso'))
+
+    with coletar_etapas() as etapas:
+        contexto = rag.buscar_contexto('ImportError numpy modulo', sessao_id='s1')
+
+    # Query do usuário e query do histórico em uma única chamada ao modelo
+    assert len(lotes) == 1 and len(lotes[0]) == 2
+    assert contexto['regras'] and contexto['solucoes'] and contexto['historico_sessao']
+    assert {'embed', 'search', 'format'} <= set(etapas)
+
+
+def test_buscar_contexto_sem_query_nem_sessao_nao_codifica(rag, monkeypatch):
+    monkeypatch.setattr(rag.document_processor, 'embed_queries', lambda textos: pytest.fail('codificou'))
+
+    assert rag.buscar_contexto('') == {'regras': [], 'historico_sessao': [], 'solucoes': []}
@@ -0,0 +1,100 @@
+"""
+Testes da busca híbrida do RAGElis (BM25 + FAISS fundidos por RRF)
+"""
+
+import numpy as np
+import pytest
+
+# Textos curtos não geram chunks (min_chunk_size)
+COMPLEMENTO = ' '.join(f'complemento{i}' for i in range(12))
+ZEBRA = 'zebra listrada ' * 8
+
+
+@pytest.fixture
+def rag(tmp_path, modelo_falso):
+    from rag_elis import RAGElis
+    sistema = RAGElis(str(tmp_path / 'rag'), modo_busca='hibrido')
+    yield sistema
+    sistema.fechar()
+
+
+@pytest.mark.parametrize('registrar,tipo,buscar', [
+    (lambda rag: rag.registrar_erro_solucao('zebra', ZEBRA), 'erro_solucao',
+     lambda rag: rag.buscar_solucoes('zebra listrada')),
+    (lambda rag: rag.registrar_regra('Zebra', ZEBRA), 'regra_sistema',
+     lambda rag: rag.buscar_regras('zebra listrada')),
+    (lambda rag: rag.registrar_sessao('s1', 'zebra', {'nota': ZEBRA}), 'historico_sessao', None),
+])
+def test_registro_individual_atualiza_indice_lexico(rag, registrar, tipo, buscar):
+    rag.registrar_erros_em_lote([{'erro': f'falha {i}', 'solucao': f'corrigir {i} {COMPLEMENTO}'} for i in range(5)])
+    rag.registrar_regras_em_lote([{'titulo': f'Regra {i}', 'descricao': f'descricao {i} {COMPLEMENTO}'} for i in range(5)])
+    rag.registrar_sessao('s0', 'inicio', {'nota': COMPLEMENTO})
+    rag._sincronizar_indice_lexico()
+    motores = dict(rag._motores_lexicos)
+
+    registrar(rag)
+
+    # Indexado sem reconstruir os índices léxicos na próxima busca
+    assert rag._versao_lexica == rag.vector_store.version
+    assert rag._motores_lexicos[tipo] is motores[tipo]
+    assert any(
+        'zebra' in rag.vector_store.get_chunk_by_id(chunk_id).content
+        for chunk_id in rag._motores_lexicos[tipo].indice.ids()
+    )
+    if buscar:
+        assert buscar(rag)
+
+
+def test_score_hibrido_e_o_cosseno_e_o_rrf_fica_nos_metadados(rag):
+    rag.registrar_erro_solucao('ImportError numpy modulo ' * 4, 'instalar numpy modulo ImportError ' * 4)
+    rag.registrar_erro_solucao(
+        'falha longa ' + ' '.join(f'palavra{i}' for i in range(60)) + ' numpy', 'outra coisa'
+    )
+    consulta = 'ImportError numpy modulo'
+    query_embedding = rag.document_processor.embed_query(consulta)
+
+    def cosseno(chunk):
+        embedding = np.asarray(chunk.embedding, dtype='float32')
+        return float(np.dot(query_embedding, embedding) / np.linalg.norm(query_embedding) / np.linalg.norm(embedding))
+
+    lexicos = rag._iniciar_busca_lexica(['importerror', 'numpy', 'modulo'], {'erro_solucao': 20}).result()
+    assert len(lexicos['erro_solucao']) == 2  # O BM25 encontra os dois registros
+
+    resultados = rag._buscar_por_tipo(consulta, {'source_type': 'erro_solucao'}, 5, 'hibrido')
+
+    # O registro longo só aparece no BM25 e fica abaixo do similarity_threshold
+    assert len(resultados) == 1
+    resultado = resultados[0]
+    assert 'ImportError' in resultado.chunk.content
+    assert resultado.score == pytest.approx(cosseno(resultado.chunk), abs=1e-5)
+    assert resultado.score >= rag.vector_store.similarity_threshold
+    assert resultado.search_metadata['score_rrf'] > 0
+    assert resultado.search_metadata['score_rrf'] != resultado.score
+
+    # Sem a busca semântica, o cosseno é calculado para os chunks encontrados só pelo BM25
+    apenas_lexicos = rag._fundir_resultados(consulta, [], lexicos['erro_solucao'], 5, query_embedding)
+    assert [r.chunk.chunk_id for r in apenas_lexicos] == [resultado.chunk.chunk_id]
+    assert apenas_lexicos[0].score == pytest.approx(resultado.score, abs=1e-5)
+
+
+def test_modo_padrao_e_semantico_sem_indices_lexicos(tmp_path, modelo_falso):
+    from rag_elis import RAGElis
+    padrao = RAGElis(str(tmp_path / 'padrao'))
+    try:
+        assert padrao.modo_busca == 'semantico'
+        padrao.registrar_erro_solucao('ImportError numpy modulo ' * 4, 'instalar numpy modulo ImportError ' * 4)
+
+        solucoes = padrao.buscar_solucoes('ImportError numpy modulo')
+        contexto = padrao.buscar_contexto('ImportError numpy modulo')
+
+        # Scores de cosseno do FAISS, sem RRF e sem montar os índices BM25
+        esperado = padrao.vector_store.search(
+            padrao.document_processor.embed_query('ImportError numpy modulo'), top_k=5,
+            filters={'source_type': 'erro_solucao'}
+        )
+        assert [s['score'] for s in solucoes] == [r.score for r in esperado]
+        assert [s['score'] for s in contexto['solucoes']] == pytest.approx([r.score for r in esperado])
+        assert padrao._motores_lexicos == {} and padrao._versao_lexica is None
+        assert padrao._executor_lexico is None
+    finally:
+        padrao.fechar()
@@ -0,0 +1,40 @@
+"""
+Testes do registro em lote do RAGElis
+"""
+
+from datetime import datetime
+
+import pytest
+
+NOTA = 'sessão s1 ' * 12  # Próxima da query do histórico ('sessão s1')
+
+
+class RelogioParado(datetime):
+    """Todos os registros no mesmo instante"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 1, 2, 3, 4, 5)
+
+
+@pytest.fixture
+def rag(tmp_path, modelo_falso):
+    from rag_elis import RAGElis
+    sistema = RAGElis(str(tmp_path / 'rag'))
+    yield sistema
+    sistema.fechar()
+
+
+def test_sessoes_identicas_no_mesmo_instante_tem_ids_distintos(rag, monkeypatch):
+    import rag_elis
+    monkeypatch.setattr(rag_elis, 'datetime', RelogioParado)
+    contador = rag.session_counter
+
+    avulso = rag.registrar_sessao('s1', 'editar', {'nota': NOTA})
+    lote = rag.registrar_sessoes_em_lote([{'sessao_id': 's1', 'acao': 'editar', 'detalhes': {'nota': NOTA}}] * 3)
+    outro_avulso = rag.registrar_sessao('s1', 'editar', {'nota': NOTA})
+
+    ids = [avulso, *lote, outro_avulso]
+    assert len(set(ids)) == 5 and all(ids)
+    assert rag.session_counter == contador + 5
+    assert len(rag.buscar_historico_sessao('s1', limite=10)) == 5
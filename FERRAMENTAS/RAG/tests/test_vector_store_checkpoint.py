@@ -0,0 +1,126 @@
+"""Log de escrita e checkpoints do RAGVectorStore (inclusive interrompidos)"""
+
+import numpy as np
+import pytest
+
+from models.document import ProcessedChunk
+from storage import vector_store as modulo_vector_store
+from storage.vector_store import RAGVectorStore
+
+
+@pytest.fixture
+def gerar():
+    rng = np.random.default_rng(0)
+
+    def criar(document_id, quantidade=3):
+        return [ProcessedChunk(text=f'{document_id}-{i}', embedding=rng.standard_normal(32).astype('float32'),
+                               document_id=document_id, chunk_index=i, chunk_id=f'{document_id}-{i}')
+                for i in range(quantidade)]
+    return criar
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {'storage_path': str(tmp_path), 'embedding_dim': 32, 'similarity_threshold': -1,
+            'wal_enabled': True, 'checkpoint_every': 1000, 'wal_fsync': False}
+
+
+def assert_consistente(store, documentos):
+    """Todo chunk ativo está no índice e é o mais próximo de si mesmo"""
+    assert sorted(store._ids_by_document) == sorted(documentos)
+    assert store.index.ntotal - len(store._tombstones) == store.chunk_count
+    for chunk in store.iter_chunks():
+        assert store.search(np.array(chunk.embedding), 1)[0].chunk.chunk_id == chunk.chunk_id
+
+
+def test_log_reaplicado_em_nova_instancia(config, gerar):
+    store = RAGVectorStore(config)
+    for k in range(4):
+        store.add_chunks(gerar(f'd{k}'))
+    store.remove_chunks_by_document('d3')
+
+    novo = RAGVectorStore(config)
+
+    assert novo.chunk_count == 9
+    assert_consistente(novo, ['d0', 'd1', 'd2'])
+
+
+def test_final_do_log_corrompido_e_descartado(config, gerar, tmp_path):
+    store = RAGVectorStore(config)
+    store.add_chunks(gerar('a'))
+    with open(tmp_path / 'wal.log', 'ab') as f:
+        f.write(b'\x10\x00\x00\x00lixo')
+
+    # A próxima instância descarta o registro incompleto e continua o log
+    RAGVectorStore(config).add_chunks(gerar('b'))
+    novo = RAGVectorStore(config)
+
+    assert_consistente(novo, ['a', 'b'])
+
+
+def test_checkpoint_interrompido_antes_de_publicar(config, gerar, monkeypatch):
+    store = RAGVectorStore(config)
+    store.add_chunks(gerar('a'))
+    assert store.save_index()
+    store.add_chunks(gerar('b'))
+    store.remove_chunks_by_document('a')
+
+    # Falha ao trocar o ponteiro: pasta nova completa, mas não publicada
+    substituir = modulo_vector_store.os.replace
+
+    def falhar_no_ponteiro(origem, destino):
+        if str(destino).endswith('checkpoint.json'):
+            raise OSError('interrompido')
+        substituir(origem, destino)
+
+    monkeypatch.setattr(modulo_vector_store.os, 'replace', falhar_no_ponteiro)
+    assert not store.save_index()
+    monkeypatch.undo()
+
+    novo = RAGVectorStore(config)
+
+    assert_consistente(novo, ['b'])
+
+
+def test_checkpoint_publicado_sem_esvaziar_log(config, gerar, monkeypatch):
+    store = RAGVectorStore(config)
+    store.add_chunks(gerar('a'))
+    assert store.save_index()
+    store.add_chunks(gerar('b'))
+    store.add_chunks(gerar('c'))
+    store.remove_chunks_by_document('a')
+
+    def falhar(*args):
+        raise OSError('interrompido')
+
+    monkeypatch.setattr(store._wal, 'truncate', falhar)
+    assert not store.save_index()
+
+    novo = RAGVectorStore(config)
+
+    assert novo.chunk_count == 6
+    assert_consistente(novo, ['b', 'c'])
+
+
+def test_checkpoints_substituidos_sao_removidos(config, gerar, tmp_path):
+    store = RAGVectorStore(config)
+    for k in range(4):
+        store.add_chunks(gerar(f'd{k}'))
+        assert store.save_index()
+
+    pastas = sorted(p.name for p in tmp_path.glob('checkpoint_*'))
+
+    assert pastas == ['checkpoint_000003', 'checkpoint_000004']
+    assert store.checkpoint_dir.name == 'checkpoint_000004'
+    assert_consistente(RAGVectorStore(config), ['d0', 'd1', 'd2', 'd3'])
+
+
+def test_recarga_detecta_checkpoint_de_outra_instancia(config, gerar):
+    leitor = RAGVectorStore(config)
+    escritor = RAGVectorStore(config)
+    escritor.add_chunks(gerar('a'))
+    escritor.save_index()
+
+    assert leitor.reload_if_changed()
+    assert_consistente(leitor, ['a'])
+    assert not leitor.reload_if_changed()
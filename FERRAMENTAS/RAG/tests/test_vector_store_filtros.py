@@ -0,0 +1,63 @@
+"""Busca filtrada no RAGVectorStore: top-k completo mesmo com filtros raros"""
+
+import numpy as np
+import pytest
+
+from conftest import criar_chunks
+from storage.vector_store import RAGVectorStore
+
+
+def tipo_raro(i):
+    return 'erro_solucao' if i % 100 == 0 else 'historico_sessao'
+
+
+@pytest.fixture(params=['flat', 'ivf', 'hnsw'])
+def store(request, tmp_path):
+    store = RAGVectorStore({
+        'storage_path': str(tmp_path / request.param), 'index_type': request.param,
+        'embedding_dim': 16, 'nlist': 4, 'similarity_threshold': -1
+    })
+    chunks = criar_chunks(500, source_type=tipo_raro)
+    for i, chunk in enumerate(chunks):
+        chunk.quality_score = (i % 10) / 10
+    store.add_chunks(chunks)
+    return store
+
+
+def consulta(semente=1):
+    q = np.random.default_rng(semente).random(16).astype('float32')
+    return q / np.linalg.norm(q)
+
+
+def test_source_type_raro_retorna_top_k_completo(store):
+    resultados = store.search(consulta(), top_k=5, filters={'source_type': 'erro_solucao'})
+
+    assert len(resultados) == 5
+    assert {r.chunk.source_type for r in resultados} == {'erro_solucao'}
+
+
+def test_source_type_raro_igual_a_forca_bruta(store):
+    q = consulta()
+    raros = [c for c in store.iter_chunks() if c.source_type == 'erro_solucao']
+    esperado = sorted(raros, key=lambda c: -float(np.dot(c.embedding, q)))[:3]
+
+    resultados = store.search(q, top_k=3, filters={'source_type': 'erro_solucao'})
+
+    assert [r.chunk.chunk_id for r in resultados] == [c.chunk_id for c in esperado]
+
+
+def test_filtro_combinado_respeita_faixa(store):
+    resultados = store.search(consulta(), top_k=5,
+                              filters={'source_type': 'historico_sessao', 'quality_score': {'min': 0.85}})
+
+    assert len(resultados) == 5
+    assert all(r.chunk.quality_score >= 0.85 for r in resultados)
+
+
+def test_busca_por_source_type_com_limites(store):
+    q = consulta()
+    resultados = store.search_by_source_type(np.stack([q, q]), {'erro_solucao': 3, 'historico_sessao': 2},
+                                             {'historico_sessao': 1})
+
+    assert len(resultados['erro_solucao']) == 3
+    assert len(resultados['historico_sessao']) == 2
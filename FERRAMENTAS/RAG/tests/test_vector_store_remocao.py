@@ -0,0 +1,94 @@
+"""Remoção com tombstones, compactação e migração do formato antigo"""
+
+import pickle
+
+import faiss
+import numpy as np
+import pytest
+
+from models.document import ProcessedChunk
+from storage.vector_store import RAGVectorStore
+
+
+def criar_documento(document_id, quantidade, rng, source_type='a'):
+    return [ProcessedChunk(text=f'{document_id}-{i}', embedding=rng.standard_normal(32).astype('float32'),
+                           document_id=document_id, chunk_index=i, chunk_id=f'{document_id}-{i}',
+                           source_type=source_type)
+            for i in range(quantidade)]
+
+
+def config(caminho, index_type='flat'):
+    return {'storage_path': str(caminho), 'index_type': index_type, 'embedding_dim': 32,
+            'nlist': 4, 'similarity_threshold': -1, 'compaction_ratio': 0.5}
+
+
+def ids(resultados):
+    return [r.chunk.chunk_id for r in resultados]
+
+
+@pytest.mark.parametrize('index_type', ['flat', 'ivf', 'hnsw'])
+def test_remover_e_compactar_mantem_resultados(tmp_path, index_type):
+    rng = np.random.default_rng(0)
+    documentos = {f'd{k}': criar_documento(f'd{k}', 20, rng, 'a' if k % 2 else 'b') for k in range(10)}
+    store = RAGVectorStore(config(tmp_path / 'com_remocao', index_type))
+    store.add_chunks([c for chunks in documentos.values() for c in chunks])
+    consultas = [documentos['d8'][3].embedding, documentos['d9'][7].embedding, rng.standard_normal(32)]
+
+    assert store.search(documentos['d0'][0].embedding, 1)[0].chunk.document_id == 'd0'
+    assert store.remove_chunks_by_document('d0') == 20
+    # Abaixo do limite de compactação: o vetor continua no índice como tombstone
+    assert store.index.ntotal == 200
+    com_tombstones = [ids(store.search(q, 5)) for q in consultas]
+    assert all(not i.startswith('d0-') for r in com_tombstones for i in r)
+    assert all(len(r) == 5 for r in com_tombstones)
+
+    for k in range(1, 6):
+        store.remove_chunks_by_document(f'd{k}')
+    # d0-d4 atingem 50% e disparam a compactação; d5 volta a ser tombstone
+    assert store.index.ntotal == 100 and len(store._tombstones) == 20
+    compactados = [ids(store.search(q, 5)) for q in consultas]
+
+    referencia = RAGVectorStore(config(tmp_path / 'referencia', index_type))
+    referencia.add_chunks([c for k in range(6, 10) for c in documentos[f'd{k}']])
+    if index_type == 'flat':
+        assert compactados == [ids(referencia.search(q, 5)) for q in consultas]
+    assert all(r.chunk.document_id in {'d6', 'd7', 'd8', 'd9'}
+               for q in consultas for r in store.search(q, 5))
+    assert store.search(documentos['d8'][3].embedding, 1)[0].chunk.chunk_id == 'd8-3'
+
+    store.save_index()
+    recarregado = RAGVectorStore(config(tmp_path / 'com_remocao', index_type))
+    assert recarregado.chunk_count == 80 and recarregado.index.ntotal == 80
+    assert [ids(recarregado.search(q, 5)) for q in consultas] == compactados
+
+
+def test_filtros_ignoram_tombstones(tmp_path):
+    rng = np.random.default_rng(1)
+    store = RAGVectorStore(config(tmp_path))
+    chunks = criar_documento('x', 20, rng, 'b') + criar_documento('y', 20, rng, 'b')
+    store.add_chunks(chunks)
+    store.remove_chunks_by_document('x')
+
+    resultados = store.search_by_source_type(chunks[0].embedding[None], {'b': 5})['b']
+
+    assert len(resultados) == 5
+    assert all(r.chunk.document_id == 'y' for r in resultados)
+
+
+def test_migra_indice_e_pickle_antigos(tmp_path):
+    rng = np.random.default_rng(2)
+    chunks = criar_documento('x', 10, rng)
+    index = faiss.IndexFlatIP(32)
+    embeddings = np.array([c.embedding for c in chunks])
+    faiss.normalize_L2(embeddings)
+    index.add(embeddings)
+    faiss.write_index(index, str(tmp_path / 'faiss_index.bin'))
+    with open(tmp_path / 'chunks.pkl', 'wb') as f:
+        pickle.dump(chunks, f)
+
+    store = RAGVectorStore(config(tmp_path))
+
+    assert isinstance(store.index, faiss.IndexIDMap2)
+    assert store.search(chunks[3].embedding, 1)[0].chunk.chunk_id == 'x-3'
+    assert store.remove_chunks_by_document('x') == 10
+    assert store.search(chunks[3].embedding, 1) == []
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP Metrics - ELIS v2
+Latência, vazão e erros por ferramenta do servidor MCP, com tempos por
+etapa (embed, search, format) e gravação periódica em JSONL
+"""
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Etapas instrumentadas no RAG (FERRAMENTAS/RAG/medicao.py)
+_rag_path = str(Path(__file__).parent.parent / "FERRAMENTAS" / "RAG")
+if _rag_path not in sys.path:
+    sys.path.insert(0, _rag_path)
+from medicao import coletar_etapas, etapa
+
+# Faixas do histograma de latência (limite superior, em ms)
+LIMITES_LATENCIA_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+ARQUIVO_PADRAO = Path(__file__).parent / "mcp_metrics.jsonl"
+
+# Tamanho máximo do JSONL antes da rotação (o anterior vira <arquivo>.1)
+TAMANHO_MAXIMO_PADRAO_MB = 5
+
+def _percentil(ordenados: list, p: float) -> float:
+    """Percentil p (0-100) de uma lista ordenada (método nearest-rank)"""
+    if not ordenados:
+        return 0.0
+    posicao = max(1, math.ceil(p / 100 * len(ordenados)))
+    return ordenados[posicao - 1]
+
+class Latencias:
+    """
+    Contagem, soma, máximo e histograma acumulados de uma série de durações
+
+    Os percentis vêm das últimas `janela` amostras, para refletir o
+    comportamento recente e manter a memória limitada.
+    """
+
+    def __init__(self, janela: int = 1024):
+        self.total = 0
+        self.soma_ms = 0.0
+        self.maximo_ms = 0.0
+        self._faixas = [0] * (len(LIMITES_LATENCIA_MS) + 1)
+        self._recentes = deque(maxlen=janela)
+
+    def adicionar(self, duracao_ms: float):
+        self.total += 1
+        self.soma_ms += duracao_ms
+        self.maximo_ms = max(self.maximo_ms, duracao_ms)
+        self._recentes.append(duracao_ms)
+        for i, limite in enumerate(LIMITES_LATENCIA_MS):
+            if duracao_ms <= limite:
+                self._faixas[i] += 1
+                break
+        else:
+            self._faixas[-1] += 1
+
+    def histograma(self) -> Dict[str, int]:
+        """Contagem por faixa, com rótulos '<=limite' e '>ultimo_limite'"""
+        resultado = {f"<={limite}ms": self._faixas[i] for i, limite in enumerate(LIMITES_LATENCIA_MS)}
+        resultado[f">{LIMITES_LATENCIA_MS[-1]}ms"] = self._faixas[-1]
+        return resultado
+
+    def resumo(self) -> Dict[str, Any]:
+        ordenados = sorted(self._recentes)
+        return {
+            'total': self.total,
+            'media_ms': round(self.soma_ms / self.total, 3) if self.total else 0.0,
+            'p50_ms': round(_percentil(ordenados, 50), 3),
+            'p95_ms': round(_percentil(ordenados, 95), 3),
+            'p99_ms': round(_percentil(ordenados, 99), 3),
+            'max_ms': round(self.maximo_ms, 3),
+            'histograma': self.histograma()
+        }
+
+class MetricasMCP:
+    """
+    Métricas por ferramenta: chamadas, erros, latência e tempo por etapa
+
+    Seguro entre threads (as ferramentas pesadas rodam no pool de workers).
+    Com `arquivo` definido, um resumo é acrescentado ao JSONL a cada
+    `intervalo_segundos`, sempre que houve chamadas desde o último registro;
+    a verificação é feita a cada chamada registrada, sem thread própria.
+    
+    Quando o arquivo passaria de `max_bytes`, ele é renomeado para
+    `<arquivo>.1` (substituindo a rotação anterior) e um novo é iniciado:
+    o disco usado fica limitado a cerca de 2x `max_bytes` (None desativa).
+    """
+
+    def __init__(self, arquivo: Optional[Path] = None, intervalo_segundos: float = 60, janela: int = 1024,
+                 max_bytes: Optional[int] = TAMANHO_MAXIMO_PADRAO_MB * 1024 * 1024):
+        self.arquivo = Path(arquivo) if arquivo else None
+        self.max_bytes = max_bytes
+        self.intervalo_segundos = intervalo_segundos
+        self.janela = janela
+        self.inicio = time.time()
+        self._ferramentas = {}  # nome -> {'chamadas', 'erros', 'latencia', 'etapas'}
+        self._eventos = Counter()
+        self._lock = threading.Lock()
+        self._ultimo_registro = time.monotonic()
+        self._alterado = False
+
+    def registrar(self, ferramenta: str, duracao_segundos: float, erro: bool = False,
+                  etapas: Optional[Dict[str, float]] = None):
+        """Registra uma chamada de ferramenta (durações em segundos)"""
+        with self._lock:
+            dados = self._ferramentas.get(ferramenta)
+            if dados is None:
+                dados = {'chamadas': 0, 'erros': 0, 'latencia': Latencias(self.janela), 'etapas': {}}
+                self._ferramentas[ferramenta] = dados
+
+            dados['chamadas'] += 1
+            if erro:
+                dados['erros'] += 1
+            dados['latencia'].adicionar(duracao_segundos * 1000)
+            for nome, duracao in (etapas or {}).items():
+                if nome not in dados['etapas']:
+                    dados['etapas'][nome] = Latencias(self.janela)
+                dados['etapas'][nome].adicionar(duracao * 1000)
+            self._alterado = True
+
+        self.registrar_se_necessario()
+
+    def evento(self, tipo: str):
+        """Conta um evento nomeado (ex: INICIO/COMPLETO do IA_MEDIADOR)"""
+        with self._lock:
+            self._eventos[tipo] += 1
+            self._alterado = True
+
+    def resumo(self) -> Dict[str, Any]:
+        """Métricas acumuladas desde o início do processo"""
+        with self._lock:
+            uptime = time.time() - self.inicio
+            ferramentas = {}
+            for nome, dados in self._ferramentas.items():
+                ferramentas[nome] = {
+                    'chamadas': dados['chamadas'],
+                    'erros': dados['erros'],
+                    'chamadas_por_minuto': round(dados['chamadas'] / uptime * 60, 3) if uptime else 0.0,
+                    'latencia': dados['latencia'].resumo(),
+                    'etapas': {etapa: latencias.resumo() for etapa, latencias in dados['etapas'].items()}
+                }
+
+            return {
+                'timestamp': datetime.now().isoformat(),
+                'pid': os.getpid(),
+                'uptime_segundos': round(uptime, 3),
+                'ferramentas': ferramentas,
+                'eventos': dict(self._eventos)
+            }
+
+    def registrar_se_necessario(self, forcar: bool = False) -> bool:
+        """Grava um resumo no JSONL se houve alterações e o intervalo passou (ou forcar)"""
+        if self.arquivo is None:
+            return False
+        with self._lock:
+            if not self._alterado:
+                return False
+            if not forcar and time.monotonic() - self._ultimo_registro < self.intervalo_segundos:
+                return False
+            self._alterado = False  # Reserva a gravação para esta thread
+        return self.gravar()
+
+    def gravar(self) -> bool:
+        """Acrescenta o resumo atual ao arquivo JSONL"""
+        if self.arquivo is None:
+            return False
+
+        resumo = self.resumo()
+        with self._lock:
+            self._ultimo_registro = time.monotonic()
+            self._alterado = False
+
+        try:
+            linha = (json.dumps(resumo, ensure_ascii=False) + "\n").encode('utf-8')
+            self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+            self._rotacionar_se_necessario(len(linha))
+            with open(self.arquivo, 'ab') as f:
+                f.write(linha)
+            return True
+        except Exception as e:
+            print(f"Aviso: Erro ao gravar métricas: {e}", file=sys.stderr)
+            return False
+
+    def _rotacionar_se_necessario(self, tamanho_linha: int):
+        """Renomeia o arquivo para <arquivo>.1 se a próxima linha passaria do limite"""
+        if not self.max_bytes:
+            return
+        try:
+            tamanho = self.arquivo.stat().st_size
+        except FileNotFoundError:
+            return
+        if tamanho and tamanho + tamanho_linha > self.max_bytes:
+            os.replace(self.arquivo, self.arquivo.with_name(self.arquivo.name + ".1"))
+
+# Instância do processo, configurada pelo ambiente
+_metricas_global = None
+_metricas_lock = threading.Lock()
+
+def obter_metricas() -> MetricasMCP:
+    """
+    Retorna as métricas do processo, criando-as na primeira chamada
+
+    ELIS_MCP_METRICS_FILE define o JSONL (vazio desativa a gravação),
+    ELIS_MCP_METRICS_INTERVAL o intervalo entre registros, em segundos, e
+    ELIS_MCP_METRICS_MAX_MB o tamanho que dispara a rotação (0 desativa).
+    """
+    global _metricas_global
+
+    with _metricas_lock:
+        if _metricas_global is None:
+            arquivo = os.environ.get("ELIS_MCP_METRICS_FILE", str(ARQUIVO_PADRAO))
+            intervalo = float(os.environ.get("ELIS_MCP_METRICS_INTERVAL", "60"))
+            maximo_mb = float(os.environ.get("ELIS_MCP_METRICS_MAX_MB", str(TAMANHO_MAXIMO_PADRAO_MB)))
+            _metricas_global = MetricasMCP(arquivo or None, intervalo, max_bytes=int(maximo_mb * 1024 * 1024))
+        return _metricas_global
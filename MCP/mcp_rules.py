@@ -3,9 +3,111 @@
 """
 MCP Rules - Model Context Protocol
 Sistema básico MCP usando Python
+
+Imports pesados (RAG, modelo de embeddings, FAISS) ficam dentro das funções
+que os usam: live e iarules respondem logo após o início do processo.
 """
 
+import copy
 import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Estado do pré-carregamento do motor RAG (inativo, aquecendo, pronto, erro)
+_aquecimento = {'estado': 'inativo', 'inicio': None, 'duracao_segundos': None, 'erro': None}
+_aquecimento_lock = threading.Lock()
+
+# Cache de get_context (criado na primeira chamada) e integrador a que se refere
+_cache_contexto = None
+_cache_dono = None
+_cache_lock = threading.Lock()
+
+def _caminho_ferramenta(nome: str) -> str:
+    """Adiciona FERRAMENTAS/<nome> ao sys.path (uma única vez) e retorna o caminho"""
+    caminho = str(Path(__file__).parent.parent / "FERRAMENTAS" / nome)
+    if caminho not in sys.path:
+        sys.path.insert(0, caminho)
+    return caminho
+
+def _obter_integrador():
+    """IntegradorMCPRAG compartilhado (importa o RAG na primeira chamada)"""
+    _caminho_ferramenta("RAG")
+    from integrador_mcp import obter_integrador
+    return obter_integrador()
+
+def _chave_contexto(query: str, session_id: str, integrador):
+    """
+    Chave de cache de get_context: consulta normalizada, sessão e versão
+    do armazenamento do integrador que vai montar o contexto (None se o
+    integrador não estiver disponível)
+    """
+    global _cache_contexto, _cache_dono
+    
+    if integrador is None:
+        return None
+    try:
+        from cache_contexto import CacheContexto, normalizar_consulta
+    except Exception:
+        return None
+    
+    with _cache_lock:
+        if _cache_contexto is None:
+            _cache_contexto = CacheContexto()
+        if integrador is not _cache_dono:
+            # Integrador recriado: versões recomeçam, entradas antigas não valem
+            _cache_contexto.limpar()
+            _cache_dono = integrador
+    
+    return (normalizar_consulta(query), session_id, integrador.versao)
+
+def _executar_aquecimento():
+    """Carrega integrador, modelo e índices e faz uma primeira inferência"""
+    inicio = time.time()
+    try:
+        integrador = _obter_integrador()
+        # Primeira inferência do modelo (inicialização preguiçosa do backend)
+        integrador.aquecer()
+        estado, erro = 'pronto', None
+    except Exception as e:
+        estado, erro = 'erro', str(e)
+    
+    with _aquecimento_lock:
+        _aquecimento.update({
+            'estado': estado,
+            'duracao_segundos': round(time.time() - inicio, 3),
+            'erro': erro
+        })
+
+def aquecer() -> bool:
+    """
+    Inicia o pré-carregamento do motor RAG em uma thread de fundo
+    
+    Chamadas repetidas não têm efeito enquanto o aquecimento estiver em
+    andamento ou concluído (após erro, tenta de novo). Um get_context feito
+    durante o aquecimento aguarda o mesmo integrador, sem carregar duas vezes.
+    
+    Returns:
+        bool: True se o aquecimento foi iniciado nesta chamada
+    """
+    with _aquecimento_lock:
+        if _aquecimento['estado'] in ('aquecendo', 'pronto'):
+            return False
+        _aquecimento.update({
+            'estado': 'aquecendo',
+            'inicio': time.time(),
+            'duracao_segundos': None,
+            'erro': None
+        })
+    
+    threading.Thread(target=_executar_aquecimento, name="mcp-aquecimento", daemon=True).start()
+    return True
+
+def estado_aquecimento() -> dict:
+    """Cópia do estado de prontidão do motor RAG"""
+    with _aquecimento_lock:
+        return dict(_aquecimento)
 
 def live():
     """
@@ -39,13 +141,8 @@ def iarules():
     Returns:
         str: Texto com as regras da IA
     """
-    import sys
-    import os
-    from pathlib import Path
-    
     # Adiciona o caminho do gerenciador de regras ao sys.path
-    gerenciador_path = Path(__file__).parent.parent / "FERRAMENTAS" / "GERENCIADOR_REGRAS"
-    sys.path.insert(0, str(gerenciador_path))
+    _caminho_ferramenta("GERENCIADOR_REGRAS")
     
     try:
         from gerenciador_simples import listar_regras
@@ -56,18 +153,12 @@ def iarules():
 
 def IA_MEDIADOR(prompt_dev: str):
     """Função IA_MEDIADOR - Otimiza prompts do desenvolvedor de forma simples"""
-    import sys
-    import os
-    from pathlib import Path
-    from datetime import datetime
-    
     try:
         # Registrar início
         registrar_evento('INICIO', {'prompt': prompt_dev})
         
         # Adicionar caminho do AssistentePrompts
-        assistente_path = Path(__file__).parent.parent / "FERRAMENTAS" / "ASSISTENTE_PROMPTS"
-        sys.path.insert(0, str(assistente_path))
+        _caminho_ferramenta("ASSISTENTE_PROMPTS")
         
         # Usar AssistentePrompts existente
         from assistente_prompts import AssistentePrompts
@@ -113,13 +204,9 @@ def IA_MEDIADOR(prompt_dev: str):
 
 def aplicar_regras_pre(prompt: str) -> str:
     """Aplica regras de pré-processamento"""
-    import sys
-    from pathlib import Path
-    
     try:
         # Regra 2: Remover emojis
-        removedor_path = Path(__file__).parent.parent / "FERRAMENTAS" / "REMOVEDOR_EMOJIS"
-        sys.path.insert(0, str(removedor_path))
+        _caminho_ferramenta("REMOVEDOR_EMOJIS")
         
         from removedor_emojis import RemovedorEmojis
         removedor = RemovedorEmojis()
@@ -146,11 +233,26 @@ def get_context(query: str = "", session_id: str = ""):
     Returns:
         dict: Contexto estruturado com regras, histórico e soluções
     """
-    import sys
-    from pathlib import Path
     from datetime import datetime
     
     try:
+        # Integrador obtido uma vez por chamada: a versão da chave é a do
+        # integrador que monta o contexto
+        try:
+            integrador, erro_integrador = _obter_integrador(), None
+        except Exception as e:
+            integrador, erro_integrador = None, e
+        
+        # Contexto já montado para a mesma consulta, sessão e versão
+        chave = _chave_contexto(query, session_id, integrador)
+        if chave is not None:
+            em_cache = _cache_contexto.obter(chave)
+            if em_cache is not None:
+                # Cópia profunda: o contexto guardado não é exposto a alterações
+                contexto = copy.deepcopy(em_cache)
+                contexto.update(query=query, timestamp=datetime.now().isoformat())
+                return contexto
+        
         # Inicializar resposta estruturada
         contexto = {
             'timestamp': datetime.now().isoformat(),
@@ -164,8 +266,7 @@ def get_context(query: str = "", session_id: str = ""):
         
         # 1. Buscar regras do sistema
         try:
-            gerenciador_path = Path(__file__).parent.parent / "FERRAMENTAS" / "GERENCIADOR_REGRAS"
-            sys.path.insert(0, str(gerenciador_path))
+            _caminho_ferramenta("GERENCIADOR_REGRAS")
             from gerenciador_simples import listar_regras
             contexto['regras'] = listar_regras().split('\n')
         except Exception:
@@ -173,12 +274,9 @@ def get_context(query: str = "", session_id: str = ""):
         
         # 2. Buscar contexto integrado via IntegradorMCPRAG
         try:
-            # Usar IntegradorMCPRAG para busca unificada
-            integrador_path = Path(__file__).parent.parent / "FERRAMENTAS" / "RAG"
-            sys.path.insert(0, str(integrador_path))
-            
-            from integrador_mcp import IntegradorMCPRAG
-            integrador = IntegradorMCPRAG()
+            # IntegradorMCPRAG compartilhado (modelo e índice carregados uma vez)
+            if integrador is None:
+                raise erro_integrador
             
             # Buscar contexto unificado
             contexto_integrado = integrador.buscar_contexto_unificado(query, session_id)
@@ -219,9 +317,15 @@ def get_context(query: str = "", session_id: str = ""):
         contexto['metadados'].update({
             'sistema': 'ELIS v2',
             'mcp_version': '1.0',
-            'funcoes_disponiveis': ['live', 'iarules', 'IA_MEDIADOR', 'get_context']
+            'funcoes_disponiveis': ['live', 'iarules', 'IA_MEDIADOR', 'get_context', 'metrics']
         })
         
+        # Só guarda contextos completos (sem fallback por falha do integrador),
+        # montados na versão da chave (um registro durante a montagem muda a versão)
+        if (chave is not None and 'integrador_error' not in contexto['metadados']
+                and chave[2] == integrador.versao):
+            _cache_contexto.guardar(chave, copy.deepcopy(contexto))
+        
         return contexto
         
     except Exception as e:
@@ -232,16 +336,10 @@ def get_context(query: str = "", session_id: str = ""):
         }
 
 def registrar_evento(tipo: str, dados: dict):
-    """Registra eventos simples (versão simplificada)"""
-    from datetime import datetime
-    
-    # Por enquanto, apenas log simples
-    # RAG será integrado na próxima fase
+    """Registra eventos simples: contagem por tipo nas métricas do servidor (ver mcp_metrics)"""
     try:
-        timestamp = datetime.now().isoformat()
-        # Log básico para debug (opcional)
-        # print(f"[{timestamp}] Evento {tipo}: {dados}")
-        pass
+        from mcp_metrics import obter_metricas
+        obter_metricas().evento(tipo)
     except Exception:
         # Não falhar nunca
-        pass
\ No newline at end of file
+        pass
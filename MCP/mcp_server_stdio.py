@@ -6,19 +6,129 @@ Servidor MCP compatível com Trae IDE usando protocolo stdio
 """
 
 import json
+import os
 import sys
+import time
 import asyncio
-from typing import Any, Dict, List
-from mcp_rules import live, iarules, IA_MEDIADOR, get_context
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from mcp_rules import live, iarules, IA_MEDIADOR, get_context, aquecer, estado_aquecimento
+from mcp_metrics import obter_metricas, coletar_etapas, etapa
+
+try:
+    import orjson  # Opcional: serialização JSON mais rápida
+except ImportError:
+    orjson = None
+
+# Ferramentas pesadas (modelo, FAISS, RAG): executadas no pool de workers
+FERRAMENTAS_PESADAS = {"IA_MEDIADOR", "get_context"}
+
+# Ferramentas que usam o motor RAG: rodam em um worker próprio, uma por vez
+FERRAMENTAS_RAG = {"get_context"}
+
+# Campos de texto livre das respostas (get_context: regras, regras_rag e
+# soluções), truncados em max_conteudo caracteres; em listas de textos
+# (linhas das regras), o limite vale para a soma das linhas mantidas
+CAMPOS_TRUNCAVEIS = {"conteudo_completo", "conteudo", "descricao", "solucao", "erro", "regras"}
+
+def encode_json(value: Any, indent: bool = False) -> str:
+    """Serializa em JSON compacto (orjson quando instalado) ou indentado"""
+    if indent:
+        return json.dumps(value, ensure_ascii=False, indent=2, default=str)
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                value, default=str,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            ).decode("utf-8")
+        except TypeError:
+            pass  # Ex: inteiro acima de 64 bits; segue com o json padrão
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def truncate_content(value: Any, max_chars: int) -> Any:
+    """Cópia de value com os CAMPOS_TRUNCAVEIS limitados a max_chars
+    
+    Não altera o original (resultados podem vir do cache de contexto).
+    """
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if key in CAMPOS_TRUNCAVEIS and isinstance(item, str) and len(item) > max_chars:
+                item = f"{item[:max_chars]}... [+{len(item) - max_chars} caracteres]"
+            elif key in CAMPOS_TRUNCAVEIS and isinstance(item, list) and all(isinstance(i, str) for i in item):
+                item = truncate_lines(item, max_chars)
+            else:
+                item = truncate_content(item, max_chars)
+            result[key] = item
+        return result
+    if isinstance(value, (list, tuple)):
+        return [truncate_content(item, max_chars) for item in value]
+    return value
+
+def truncate_lines(lines: List[str], max_chars: int) -> List[str]:
+    """Primeiras linhas de lines que somam até max_chars caracteres
+    
+    A primeira linha é sempre mantida (truncada se preciso); as omitidas
+    são indicadas em uma linha final.
+    """
+    result = []
+    total = 0
+    for line in lines:
+        if result and total + len(line) > max_chars:
+            break
+        if len(line) > max_chars:
+            line = f"{line[:max_chars]}... [+{len(line) - max_chars} caracteres]"
+        result.append(line)
+        total += len(line)
+    if len(result) < len(lines):
+        result.append(f"... [+{len(lines) - len(result)} linhas]")
+    return result
 
 class MCPServer:
-    """Servidor MCP usando protocolo stdio"""
+    """Servidor MCP usando protocolo stdio
+    
+    Requisições são atendidas concorrentemente: chamadas leves (initialize,
+    tools/list, live, iarules) respondem no próprio loop asyncio e as
+    ferramentas pesadas rodam em um pool de threads. O motor RAG não é
+    seguro entre threads, então get_context roda em um worker exclusivo
+    (em fila), sem ocupar o pool das demais ferramentas. As respostas são
+    escritas à medida que ficam prontas, correlacionadas pelo `id` JSON-RPC,
+    e `notifications/cancelled` descarta a requisição pendente.
+    
+    Resultados de ferramentas são serializados sem indentação (modo
+    compacto; ELIS_MCP_COMPACT=0 volta ao JSON indentado) e get_context
+    aceita projeção de campos e limite para os campos de texto livre
+    (CAMPOS_TRUNCAVEIS).
+    
+    Cada chamada de ferramenta é medida (latência total e por etapa) e
+    consultável pela ferramenta `metrics`; ver mcp_metrics.
     
-    def __init__(self):
+    Com `preload` ativo (padrão; ELIS_MCP_PRELOAD=0 desativa), o motor RAG
+    começa a carregar em segundo plano já no `initialize`, enquanto o
+    cliente ainda negocia a sessão; a ferramenta `live` informa a prontidão.
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None, preload: Optional[bool] = None,
+                 compact: Optional[bool] = None, max_content: Optional[int] = None):
+        self.max_workers = max_workers or int(os.environ.get("ELIS_MCP_WORKERS", "4"))
+        if preload is None:
+            preload = os.environ.get("ELIS_MCP_PRELOAD", "1") != "0"
+        self.preload = preload
+        if compact is None:
+            compact = os.environ.get("ELIS_MCP_COMPACT", "1") != "0"
+        self.compact = compact
+        if max_content is None:
+            max_content = int(os.environ.get("ELIS_MCP_MAX_CONTEUDO", "2000")) if compact else 0
+        self.max_content = max_content  # 0 = sem truncamento
+        self.metrics = obter_metricas()
+        self.output = sys.stdout
+        self.executor = None
+        self.rag_executor = None
+        self.pending = {}  # id JSON-RPC -> future da ferramenta em execução
         self.tools = {
             "live": {
                 "name": "live",
-                "description": "Retorna número aleatório de 3 dígitos para validação do MCP",
+                "description": "Retorna número aleatório de 3 dígitos para validação do MCP e a prontidão do motor RAG",
                 "inputSchema": {
                     "type": "object",
                     "properties": {},
@@ -61,19 +171,64 @@ class MCPServer:
                         "session_id": {
                             "type": "string",
                             "description": "ID da sessão atual (opcional)"
+                        },
+                        "campos": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Campos do contexto a retornar, ex: [\"regras\", \"solucoes_relevantes\"] (opcional, padrão: todos)"
+                        },
+                        "max_conteudo": {
+                            "type": "integer",
+                            "description": "Máximo de caracteres de cada campo de texto (regras, descrições, soluções; opcional, 0 = sem limite)"
                         }
                     },
                     "required": []
                 }
+            },
+            "metrics": {
+                "name": "metrics",
+                "description": "Retorna métricas por ferramenta: chamadas, erros, latência (p50/p95/p99) e tempo por etapa",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {},
+                    "required": []
+                }
             }
         }
     
     def send_response(self, response: Dict[str, Any]):
         """Envia resposta via stdout"""
-        print(json.dumps(response), flush=True)
+        self.write_line(self.serialize(response))
+    
+    def serialize(self, response: Dict[str, Any]) -> str:
+        """Serializa uma resposta JSON-RPC em uma linha"""
+        return encode_json(response)
+    
+    def format_result(self, result: Any, arguments: Optional[Dict[str, Any]] = None) -> str:
+        """Texto do resultado de uma ferramenta, com projeção e truncamento opcionais"""
+        arguments = arguments or {}
+        
+        campos = arguments.get("campos")
+        if campos and isinstance(result, dict):
+            result = {campo: result[campo] for campo in campos if campo in result}
+        
+        with etapa("format"):
+            max_conteudo = arguments.get("max_conteudo", self.max_content)
+            if max_conteudo:
+                result = truncate_content(result, int(max_conteudo))
+            
+            return encode_json(result, indent=not self.compact)
+    
+    def write_line(self, line: str):
+        """Escreve uma linha já serializada (sempre a partir do loop asyncio)"""
+        self.output.write(line + "\n")
+        self.output.flush()
     
     def handle_initialize(self, request: Dict[str, Any]):
         """Responde à inicialização do MCP"""
+        if self.preload:
+            aquecer()
+        
         response = {
             "jsonrpc": "2.0",
             "id": request.get("id"),
@@ -90,10 +245,13 @@ class MCPServer:
                 }
             }
         }
-        self.send_response(response)
+        return response
     
     def handle_tools_list(self, request: Dict[str, Any]):
         """Lista as ferramentas disponíveis"""
+        if self.preload:
+            aquecer()
+        
         response = {
             "jsonrpc": "2.0",
             "id": request.get("id"),
@@ -101,7 +259,7 @@ class MCPServer:
                 "tools": list(self.tools.values())
             }
         }
-        self.send_response(response)
+        return response
     
     def handle_tools_call(self, request: Dict[str, Any]):
         """Executa uma ferramenta"""
@@ -111,6 +269,7 @@ class MCPServer:
         if tool_name == "live":
             try:
                 result = live()
+                motor = estado_aquecimento()['estado']
                 response = {
                     "jsonrpc": "2.0",
                     "id": request.get("id"),
@@ -118,7 +277,7 @@ class MCPServer:
                         "content": [
                             {
                                 "type": "text",
-                                "text": f"MCP Live: {result}"
+                                "text": f"MCP Live: {result} | motor: {motor}"
                             }
                         ]
                     }
@@ -179,7 +338,7 @@ class MCPServer:
                             "content": [
                                 {
                                     "type": "text",
-                                    "text": json.dumps(result, ensure_ascii=False, indent=2)
+                                    "text": self.format_result(result)
                                 }
                             ]
                         }
@@ -207,7 +366,7 @@ class MCPServer:
                         "content": [
                             {
                                 "type": "text",
-                                "text": json.dumps(result, ensure_ascii=False, indent=2)
+                                "text": self.format_result(result, arguments)
                             }
                         ]
                     }
@@ -221,6 +380,30 @@ class MCPServer:
                         "message": f"Erro ao executar get_context: {str(e)}"
                     }
                 }
+        elif tool_name == "metrics":
+            try:
+                result = self.metrics.resumo()
+                response = {
+                    "jsonrpc": "2.0",
+                    "id": request.get("id"),
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": self.format_result(result)
+                            }
+                        ]
+                    }
+                }
+            except Exception as e:
+                response = {
+                    "jsonrpc": "2.0",
+                    "id": request.get("id"),
+                    "error": {
+                        "code": -32603,
+                        "message": f"Erro ao executar metrics: {str(e)}"
+                    }
+                }
         else:
             response = {
                 "jsonrpc": "2.0",
@@ -231,21 +414,21 @@ class MCPServer:
                 }
             }
         
-        self.send_response(response)
+        return response
     
-    def handle_request(self, request: Dict[str, Any]):
-        """Processa requisições MCP"""
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Processa requisições MCP e retorna a resposta"""
         method = request.get("method")
         
         if method == "initialize":
-            self.handle_initialize(request)
+            return self.handle_initialize(request)
         elif method == "tools/list":
-            self.handle_tools_list(request)
+            return self.handle_tools_list(request)
         elif method == "tools/call":
-            self.handle_tools_call(request)
+            return self.handle_tools_call(request)
         else:
             # Método não suportado
-            response = {
+            return {
                 "jsonrpc": "2.0",
                 "id": request.get("id"),
                 "error": {
@@ -253,42 +436,162 @@ class MCPServer:
                     "message": f"Método não suportado: {method}"
                 }
             }
-            self.send_response(response)
     
-    def run(self):
-        """Executa o servidor MCP"""
+    def handle_notification(self, request: Dict[str, Any]):
+        """Processa notificações (sem id, nunca respondidas)"""
+        if request.get("method") == "notifications/cancelled":
+            request_id = request.get("params", {}).get("requestId")
+            future = self.pending.get(request_id)
+            if future is not None:
+                # Se ainda não começou, não chega a executar; se já está
+                # rodando, termina no worker mas a resposta é descartada
+                future.cancel()
+    
+    def is_heavy(self, request: Dict[str, Any]) -> bool:
+        """Indica se a requisição deve rodar no pool de workers"""
+        return (request.get("method") == "tools/call"
+                and request.get("params", {}).get("name") in FERRAMENTAS_PESADAS)
+    
+    def executor_for(self, request: Dict[str, Any]) -> ThreadPoolExecutor:
+        """Worker RAG exclusivo para as ferramentas do RAG, pool para as demais"""
+        if request.get("params", {}).get("name") in FERRAMENTAS_RAG:
+            return self.rag_executor
+        return self.executor
+    
+    def _process(self, request: Dict[str, Any]) -> str:
+        """Processa e serializa uma requisição (executado no worker)
+        
+        Chamadas de ferramentas conhecidas são registradas nas métricas, com
+        as etapas marcadas durante a execução (embed, search, format).
+        """
+        tool_name = request.get("params", {}).get("name")
+        if request.get("method") != "tools/call" or tool_name not in self.tools:
+            return self.serialize(self.handle_request(request))
+        
+        inicio = time.perf_counter()
+        with coletar_etapas() as etapas:
+            response = self.handle_request(request)
+            with etapa("format"):
+                line = self.serialize(response)
+        self.metrics.registrar(tool_name, time.perf_counter() - inicio, "error" in response, etapas)
+        return line
+    
+    async def dispatch(self, request: Dict[str, Any]):
+        """Atende uma requisição e escreve a resposta quando ficar pronta"""
+        request_id = request.get("id")
+        
         try:
-            for line in sys.stdin:
+            if self.is_heavy(request):
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(self.executor_for(request), self._process, request)
+                self.pending[request_id] = future
+                try:
+                    line = await future
+                except asyncio.CancelledError:
+                    # Requisição cancelada: o protocolo dispensa resposta
+                    return
+                finally:
+                    if self.pending.get(request_id) is future:
+                        del self.pending[request_id]
+            else:
+                line = self._process(request)
+        except Exception as e:
+            # Erro interno
+            line = self.serialize({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {
+                    "code": -32603,
+                    "message": f"Erro interno: {str(e)}"
+                }
+            })
+        
+        self.write_line(line)
+    
+    def handle_line(self, line: str) -> Optional[Dict[str, Any]]:
+        """Decodifica uma linha de entrada (None se já respondida com erro)"""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            # Erro de parsing JSON
+            self.send_response({
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {
+                    "code": -32700,
+                    "message": f"Erro de parsing JSON: {str(e)}"
+                }
+            })
+            return None
+        
+        if not isinstance(request, dict):
+            self.send_response({
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {
+                    "code": -32600,
+                    "message": "Requisição inválida"
+                }
+            })
+            return None
+        
+        return request
+    
+    async def serve(self):
+        """Loop principal: lê stdin sem bloquear e despacha cada requisição"""
+        loop = asyncio.get_running_loop()
+        # stdin é lido em uma thread própria (funciona também no Windows,
+        # onde pipes de stdin não podem ser registrados no loop)
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mcp-stdin")
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mcp-worker")
+        self.rag_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mcp-rag")
+        tasks = set()
+        
+        # O canal JSON-RPC é o stdout original; prints de bibliotecas (ex:
+        # carregamento do modelo durante o aquecimento) vão para stderr
+        self.output = sys.stdout
+        sys.stdout = sys.stderr
+        
+        # O protocolo é UTF-8 (respostas não escapam acentos)
+        for stream in (sys.stdin, self.output):
+            if hasattr(stream, "reconfigure"):
+                stream.reconfigure(encoding="utf-8")
+        
+        try:
+            while True:
+                line = await loop.run_in_executor(reader, sys.stdin.readline)
+                if not line:
+                    break
                 line = line.strip()
                 if not line:
                     continue
                 
-                try:
-                    request = json.loads(line)
-                    self.handle_request(request)
-                except json.JSONDecodeError as e:
-                    # Erro de parsing JSON
-                    error_response = {
-                        "jsonrpc": "2.0",
-                        "id": None,
-                        "error": {
-                            "code": -32700,
-                            "message": f"Erro de parsing JSON: {str(e)}"
-                        }
-                    }
-                    self.send_response(error_response)
-                except Exception as e:
-                    # Erro interno
-                    error_response = {
-                        "jsonrpc": "2.0",
-                        "id": None,
-                        "error": {
-                            "code": -32603,
-                            "message": f"Erro interno: {str(e)}"
-                        }
-                    }
-                    self.send_response(error_response)
-        
+                request = self.handle_line(line)
+                if request is None:
+                    continue
+                
+                if "id" not in request:
+                    self.handle_notification(request)
+                    continue
+                
+                task = asyncio.create_task(self.dispatch(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            
+            # Fim da entrada: conclui o que já foi recebido
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            sys.stdout = self.output
+            self.metrics.registrar_se_necessario(forcar=True)
+            reader.shutdown(wait=False)
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.rag_executor.shutdown(wait=False, cancel_futures=True)
+    
+    def run(self):
+        """Executa o servidor MCP"""
+        try:
+            asyncio.run(self.serve())
         except KeyboardInterrupt:
             pass
         except Exception as e:
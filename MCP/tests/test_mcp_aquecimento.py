@@ -0,0 +1,77 @@
+"""
+Testes do pré-carregamento do motor RAG e da prontidão informada por `live`
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Os módulos do MCP importam uns aos outros a partir da pasta MCP
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import mcp_rules
+from mcp_server_stdio import MCPServer
+
+
+class IntegradorLento:
+    """Integrador cujo aquecimento só termina quando liberado"""
+
+    def __init__(self, falha=None):
+        self.liberar = threading.Event()
+        self.falha = falha
+        self.aquecimentos = 0
+
+    def aquecer(self):
+        self.aquecimentos += 1
+        self.liberar.wait(5)
+        if self.falha:
+            raise self.falha
+
+
+def motor_informado_por_live(servidor):
+    resposta = servidor.handle_tools_call({'id': 1, 'params': {'name': 'live', 'arguments': {}}})
+    return resposta['result']['content'][0]['text'].split('motor: ')[1]
+
+
+def aguardar_fim_do_aquecimento():
+    limite = time.time() + 5
+    while mcp_rules.estado_aquecimento()['estado'] == 'aquecendo' and time.time() < limite:
+        time.sleep(0.01)
+
+
+def test_live_acompanha_o_aquecimento(monkeypatch):
+    integrador = IntegradorLento()
+    monkeypatch.setattr(mcp_rules, '_aquecimento', {'estado': 'inativo', 'inicio': None,
+                                                    'duracao_segundos': None, 'erro': None})
+    monkeypatch.setattr(mcp_rules, '_obter_integrador', lambda: integrador)
+    servidor = MCPServer(preload=False)
+
+    assert motor_informado_por_live(servidor) == 'inativo'
+
+    assert mcp_rules.aquecer()
+    assert motor_informado_por_live(servidor) == 'aquecendo'
+    assert not mcp_rules.aquecer()  # Já em andamento: não carrega de novo
+
+    integrador.liberar.set()
+    aguardar_fim_do_aquecimento()
+
+    assert motor_informado_por_live(servidor) == 'pronto'
+    assert mcp_rules.estado_aquecimento()['duracao_segundos'] is not None
+    assert not mcp_rules.aquecer() and integrador.aquecimentos == 1
+
+
+def test_falha_no_aquecimento_e_informada_e_pode_ser_repetida(monkeypatch):
+    integrador = IntegradorLento(falha=RuntimeError('modelo ausente'))
+    integrador.liberar.set()
+    monkeypatch.setattr(mcp_rules, '_aquecimento', {'estado': 'inativo', 'inicio': None,
+                                                    'duracao_segundos': None, 'erro': None})
+    monkeypatch.setattr(mcp_rules, '_obter_integrador', lambda: integrador)
+
+    mcp_rules.aquecer()
+    aguardar_fim_do_aquecimento()
+
+    estado = mcp_rules.estado_aquecimento()
+    assert (estado['estado'], estado['erro']) == ('erro', 'modelo ausente')
+    assert motor_informado_por_live(MCPServer(preload=False)) == 'erro'
+    assert mcp_rules.aquecer()  # Após erro, tenta de novo
+    aguardar_fim_do_aquecimento()
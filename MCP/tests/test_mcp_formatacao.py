@@ -0,0 +1,93 @@
+"""
+Testes da serialização compacta das respostas do servidor MCP
+"""
+
+import json
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Os módulos do MCP importam uns aos outros a partir da pasta MCP
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import mcp_rules
+from mcp_server_stdio import MCPServer, truncate_content, truncate_lines
+
+LONGO = 'ImportError numpy modulo ' * 200  # ~5000 caracteres
+
+
+class ModeloHash:
+    """Codificador determinístico (saco de palavras com hash) no lugar do SentenceTransformer"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_sentence_embedding_dimension(self):
+        return 384
+
+    def encode(self, textos, **kwargs):
+        unico = isinstance(textos, str)
+        lista = [textos] if unico else list(textos)
+        saida = np.zeros((len(lista), 384), dtype='float32')
+        for i, texto in enumerate(lista):
+            for palavra in texto.lower().split():
+                saida[i, zlib.crc32(palavra.encode()) % 384] += 1.0
+            norma = np.linalg.norm(saida[i])
+            if norma:
+                saida[i] /= norma
+        return saida[0] if unico else saida
+
+
+def test_truncamento_de_textos_e_listas_de_linhas():
+    original = {'solucao': 'x' * 50, 'score': 0.9, 'regras': ['a' * 10, 'b' * 10, 'c' * 10, 'd' * 10],
+                'outro': 'y' * 50}
+
+    truncado = truncate_content(original, 25)
+
+    assert truncado['solucao'] == 'x' * 25 + '... [+25 caracteres]'
+    assert truncado['regras'] == ['a' * 10, 'b' * 10, '... [+2 linhas]']
+    assert truncado['outro'] == original['outro'] and truncado['score'] == 0.9
+    assert original['solucao'] == 'x' * 50 and len(original['regras']) == 4  # Original intacto
+    assert truncate_lines(['z' * 40], 25) == ['z' * 25 + '... [+15 caracteres]']
+
+
+def test_format_result_limita_o_get_context_real(tmp_path, monkeypatch):
+    pytest.importorskip('sentence_transformers')
+    mcp_rules._caminho_ferramenta('RAG')
+    mcp_rules._caminho_ferramenta('GERENCIADOR_REGRAS')
+    import gerenciador_simples
+    from processing import document_processor
+    from integrador_mcp import IntegradorMCPRAG
+
+    monkeypatch.setattr(document_processor, 'SentenceTransformer', ModeloHash)
+    monkeypatch.chdir(tmp_path)  # O RAG do integrador usa ./rag_elis_storage
+    integrador = IntegradorMCPRAG()
+    integrador.rag.registrar_regra('Imports', LONGO)
+    integrador.rag.registrar_erro_solucao('ImportError numpy', LONGO)
+    monkeypatch.setattr(mcp_rules, '_obter_integrador', lambda: integrador)
+    monkeypatch.setattr(mcp_rules, '_cache_contexto', None)
+    monkeypatch.setattr(mcp_rules, '_cache_dono', None)
+    monkeypatch.setattr(gerenciador_simples, 'listar_regras', lambda: '\n'.join(f'{i}. {LONGO[:300]}' for i in range(40)))
+
+    try:
+        contexto = mcp_rules.get_context('ImportError numpy modulo', 's1')
+        assert contexto['regras_rag'][0]['descricao'] == LONGO
+        assert contexto['solucoes_relevantes'][0]['solucao'] == LONGO
+
+        servidor = MCPServer(preload=False, compact=True, max_content=500)
+        texto = servidor.format_result(contexto)
+        compacto = json.loads(texto)
+
+        assert len(texto) < 5000 < len(json.dumps(contexto, ensure_ascii=False))
+        assert compacto['regras_rag'][0]['descricao'].startswith(LONGO[:500] + '... [+')
+        assert compacto['solucoes_relevantes'][0]['solucao'].startswith(LONGO[:500] + '... [+')
+        assert sum(len(linha) for linha in compacto['regras'][:-1]) <= 500
+        assert compacto['regras'][-1].endswith('linhas]')
+
+        # max_conteudo=0 na chamada devolve o texto integral
+        integral = json.loads(servidor.format_result(contexto, {'max_conteudo': 0}))
+        assert integral['solucoes_relevantes'][0]['solucao'] == LONGO
+    finally:
+        integrador.rag.fechar()
@@ -0,0 +1,72 @@
+"""
+Testes da gravação das métricas do servidor MCP
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+# Os módulos do MCP importam uns aos outros a partir da pasta MCP
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import mcp_server_stdio
+from mcp_metrics import MetricasMCP, etapa
+from mcp_server_stdio import MCPServer
+
+
+def test_gravacao_rotaciona_por_tamanho(tmp_path):
+    arquivo = tmp_path / 'metricas.jsonl'
+    metricas = MetricasMCP(arquivo, intervalo_segundos=0, max_bytes=2000)
+
+    for i in range(200):
+        metricas.registrar('get_context', 0.01 * i)
+
+    rotacionado = tmp_path / 'metricas.jsonl.1'
+    assert rotacionado.exists()
+    assert arquivo.stat().st_size <= 2000 and rotacionado.stat().st_size <= 2000
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['metricas.jsonl', 'metricas.jsonl.1']
+
+    # Cada arquivo continua sendo JSONL válido e o mais recente tem o último resumo
+    for caminho in (arquivo, rotacionado):
+        linhas = caminho.read_text(encoding='utf-8').splitlines()
+        assert linhas and all(json.loads(linha)['pid'] for linha in linhas)
+    ultimo = json.loads(arquivo.read_text(encoding='utf-8').splitlines()[-1])
+    assert ultimo['ferramentas']['get_context']['chamadas'] == 200
+
+
+def test_sem_limite_nao_rotaciona(tmp_path):
+    arquivo = tmp_path / 'metricas.jsonl'
+    metricas = MetricasMCP(arquivo, intervalo_segundos=0, max_bytes=None)
+
+    for _ in range(50):
+        metricas.registrar('live', 0.001)
+
+    assert len(arquivo.read_text(encoding='utf-8').splitlines()) == 50
+    assert not (tmp_path / 'metricas.jsonl.1').exists()
+
+
+def test_ferramenta_metrics_informa_etapas_do_get_context(monkeypatch):
+    def get_context(query, session_id):
+        with etapa('embed'):
+            time.sleep(0.01)
+        with etapa('search'):
+            time.sleep(0.02)
+        return {'query': query, 'regras': []}
+
+    monkeypatch.setattr(mcp_server_stdio, 'get_context', get_context)
+    servidor = MCPServer(preload=False)
+    servidor.metrics = MetricasMCP(intervalo_segundos=0)
+
+    for i in range(3):
+        servidor._process({'jsonrpc': '2.0', 'id': i, 'method': 'tools/call',
+                           'params': {'name': 'get_context', 'arguments': {'query': 'erro'}}})
+    resposta = json.loads(servidor._process({'jsonrpc': '2.0', 'id': 9, 'method': 'tools/call',
+                                             'params': {'name': 'metrics', 'arguments': {}}}))
+
+    get_context_metricas = json.loads(resposta['result']['content'][0]['text'])['ferramentas']['get_context']
+    assert get_context_metricas['chamadas'] == 3 and get_context_metricas['erros'] == 0
+    etapas = get_context_metricas['etapas']
+    assert set(etapas) == {'embed', 'search', 'format'}
+    assert all(etapas[nome]['total'] == 3 for nome in etapas)
+    assert etapas['embed']['p50_ms'] >= 10 and etapas['search']['p50_ms'] >= 20
+    assert get_context_metricas['latencia']['p50_ms'] >= etapas['embed']['p50_ms'] + etapas['search']['p50_ms']
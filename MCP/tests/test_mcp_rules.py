@@ -0,0 +1,88 @@
+"""
+Testes do cache de get_context
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Os módulos do MCP importam uns aos outros a partir da pasta MCP
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import mcp_rules
+
+
+class IntegradorFalso:
+    """Integrador mínimo: conta as buscas e devolve um contexto aninhado"""
+
+    versao = 1
+
+    def __init__(self):
+        self.buscas = 0
+
+    def buscar_contexto_unificado(self, query, session_id):
+        self.buscas += 1
+        return {
+            'regras': [{'titulo': 'regra'}],
+            'historico_sessao': [],
+            'solucoes_relevantes': [{'erro': query, 'solucao': 'corrigir'}],
+            'metadados': {'fonte': 'falso'}
+        }
+
+
+def test_acerto_no_cache_devolve_copia_com_timestamp_novo(monkeypatch):
+    mcp_rules._caminho_ferramenta("RAG")
+    integrador = IntegradorFalso()
+    monkeypatch.setattr(mcp_rules, '_obter_integrador', lambda: integrador)
+    monkeypatch.setattr(mcp_rules, '_cache_contexto', None)
+    monkeypatch.setattr(mcp_rules, '_cache_dono', None)
+
+    primeiro = mcp_rules.get_context('erro X', 's1')
+    primeiro['solucoes_relevantes'][0]['solucao'] = 'alterada'  # Quem chamou altera a resposta
+    time.sleep(0.01)
+    segundo = mcp_rules.get_context('ERRO  x', 's1')
+
+    assert integrador.buscas == 1
+    assert segundo['solucoes_relevantes'][0]['solucao'] == 'corrigir'
+    assert segundo['query'] == 'ERRO  x'
+    assert segundo['timestamp'] > primeiro['timestamp']
+
+    segundo['metadados']['integrador']['fonte'] = 'alterada'
+    assert mcp_rules.get_context('erro X', 's1')['metadados']['integrador']['fonte'] == 'falso'
+
+
+def test_integrador_obtido_uma_vez_por_chamada(monkeypatch):
+    mcp_rules._caminho_ferramenta("RAG")
+    integrador = IntegradorFalso()
+    chamadas = []
+
+    def obter():
+        chamadas.append(1)
+        return integrador
+
+    monkeypatch.setattr(mcp_rules, '_obter_integrador', obter)
+    monkeypatch.setattr(mcp_rules, '_cache_contexto', None)
+    monkeypatch.setattr(mcp_rules, '_cache_dono', None)
+
+    mcp_rules.get_context('erro Y', 's1')
+    assert len(chamadas) == 1
+    mcp_rules.get_context('erro Y', 's1')  # Acerto no cache
+    assert len(chamadas) == 2 and integrador.buscas == 1
+
+
+def test_contexto_montado_em_outra_versao_nao_fica_no_cache(monkeypatch):
+    mcp_rules._caminho_ferramenta("RAG")
+    integrador = IntegradorFalso()
+    buscar = integrador.buscar_contexto_unificado
+
+    def buscar_e_registrar(query, session_id):
+        integrador.versao += 1  # Registro no RAG durante a montagem
+        return buscar(query, session_id)
+
+    monkeypatch.setattr(integrador, 'buscar_contexto_unificado', buscar_e_registrar)
+    monkeypatch.setattr(mcp_rules, '_obter_integrador', lambda: integrador)
+    monkeypatch.setattr(mcp_rules, '_cache_contexto', None)
+    monkeypatch.setattr(mcp_rules, '_cache_dono', None)
+
+    mcp_rules.get_context('erro Z', 's1')
+
+    assert len(mcp_rules._cache_contexto) == 0
@@ -0,0 +1,100 @@
+"""
+Testes do despacho de ferramentas do servidor MCP
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Os módulos do MCP importam uns aos outros a partir da pasta MCP
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mcp_server_stdio import MCPServer
+
+
+def chamada(request_id, ferramenta):
+    return {'jsonrpc': '2.0', 'id': request_id, 'method': 'tools/call',
+            'params': {'name': ferramenta, 'arguments': {}}}
+
+
+def test_get_context_roda_no_worker_rag_e_ia_mediador_no_pool(monkeypatch):
+    servidor = MCPServer(max_workers=4, preload=False)
+    ativos = {'get_context': 0, 'IA_MEDIADOR': 0}
+    maximo = {'get_context': 0, 'IA_MEDIADOR': 0}
+    threads = {'get_context': set(), 'IA_MEDIADOR': set()}
+    lock = threading.Lock()
+
+    def processar(request):
+        nome = request['params']['name']
+        with lock:
+            ativos[nome] += 1
+            maximo[nome] = max(maximo[nome], ativos[nome])
+            threads[nome].add(threading.current_thread().name)
+        time.sleep(0.05)
+        with lock:
+            ativos[nome] -= 1
+        return '{}'
+
+    monkeypatch.setattr(servidor, '_process', processar)
+    monkeypatch.setattr(servidor, 'write_line', lambda line: None)
+
+    async def executar():
+        servidor.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='mcp-worker')
+        servidor.rag_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mcp-rag')
+        try:
+            await asyncio.gather(*[
+                servidor.dispatch(chamada(i, 'get_context' if i % 2 else 'IA_MEDIADOR')) for i in range(12)
+            ])
+        finally:
+            servidor.executor.shutdown()
+            servidor.rag_executor.shutdown()
+
+    asyncio.run(executar())
+
+    # Buscas no RAG uma por vez, no worker exclusivo; o pool continua concorrente
+    assert maximo['get_context'] == 1
+    assert all(nome.startswith('mcp-rag') for nome in threads['get_context'])
+    assert maximo['IA_MEDIADOR'] > 1
+    assert all(nome.startswith('mcp-worker') for nome in threads['IA_MEDIADOR'])
+
+
+def test_requisicao_cancelada_nao_recebe_resposta(monkeypatch):
+    servidor = MCPServer(max_workers=2, preload=False)
+    liberar = threading.Event()
+    executadas = []
+    respostas = []
+
+    def processar(request):
+        executadas.append(request['id'])
+        liberar.wait(5)
+        return str(request['id'])
+
+    monkeypatch.setattr(servidor, '_process', processar)
+    monkeypatch.setattr(servidor, 'write_line', respostas.append)
+
+    async def executar():
+        servidor.executor = ThreadPoolExecutor(max_workers=2)
+        servidor.rag_executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            # 1 ocupa o worker RAG; 2 e 3 aguardam na fila
+            tarefas = [asyncio.create_task(servidor.dispatch(chamada(i, 'get_context'))) for i in (1, 2, 3)]
+            await asyncio.sleep(0.05)
+            for request_id in (1, 2):  # 1 já em execução, 2 ainda na fila
+                servidor.handle_notification({'jsonrpc': '2.0', 'method': 'notifications/cancelled',
+                                              'params': {'requestId': request_id}})
+            servidor.handle_notification({'jsonrpc': '2.0', 'method': 'notifications/cancelled',
+                                          'params': {'requestId': 99}})  # Id desconhecido é ignorado
+            await asyncio.sleep(0.05)  # O cancelamento chega ao future do worker no loop
+            liberar.set()
+            await asyncio.gather(*tarefas)
+        finally:
+            servidor.executor.shutdown()
+            servidor.rag_executor.shutdown()
+
+    asyncio.run(executar())
+
+    assert respostas == ['3']
+    assert 2 not in executadas  # Cancelada antes de começar: nem chega a rodar
+    assert servidor.pending == {}